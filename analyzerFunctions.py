@@ -5,493 +5,259 @@ Refactored on Mar 26, 2025
 @author: Efe Aydın
 """
 
-import subprocess
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
+import multiprocessing
 import os
-import tempfile
-import matplotlib
-import pyBigWig
-import shutil
-import requests
+import threading
+import uuid
+import pandas as pd
+import loopIndex
+import queryEngine
+import queryMetrics
+import renderJobs
+import resultExport
 
 # -------------------- Configuration --------------------
 
-DATA_DIR = os.path.join(os.getcwd(), "data")
-TRACKS_DIR = os.path.join(os.getcwd(), "tracks")
+# encoding of the genome track images sent to the browser: "png", "svg" or "webp"
+queryEngine.TRACK_IMAGE_FORMAT = "png"
 
-# -------------------- Load Required Data --------------------
+# port of the Prometheus /metrics endpoint, unset to not serve it
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0)) or None
+# show the metrics admin page in the sidebar
+ADMIN_PAGE = os.environ.get("ADMIN_PAGE", "") == "1"
+
+# rows per page of the result tables
+PAGE_ROWS = 50
 
-coding_genes_path = os.path.join(DATA_DIR, "coding_genes2")
-all_loops_path = os.path.join(DATA_DIR, "concat_loops_v2.tab")
+# seconds between checks of a track image still being rendered
+RENDER_POLL_SECONDS = 0.5
 
-if not os.path.exists(coding_genes_path) or not os.path.exists(all_loops_path):
+# -------------------- Load Required Data --------------------
+
+# queries and rendering live in queryEngine, this module only lays its results
+# out on the page; the engine loads its data on first use
+try:
+    queryEngine.check_data()
+except FileNotFoundError:
     st.error("Required input files not found. Please place 'coding_genes2' and 'concat_loops_v2.tab' in the 'data/' folder.")
     st.stop()
 
-coding_genes = pd.read_csv(coding_genes_path, sep="\t")
-all_loops = pd.read_csv(all_loops_path, sep="\t", header=0)
-all_loops.iloc[:, [1, 2, 4, 5]] = all_loops.iloc[:, [1, 2, 4, 5]].astype(int)
+# loop table and indexes are loaded in the background once per server process,
+# so the first page is shown right away; this process draws nothing itself
+@st.cache_resource
+def start_engine_warm_up():
+    thread = threading.Thread(target=queryEngine.warm_up, args=(False,), name="engine-warm-up", daemon=True)
+    thread.start()
+    return thread
 
+cache_stats = queryEngine.cache_stats
 
-# -------------------- Functions --------------------
-def fetch_bigwig_locally(url):
-    filename = os.path.basename(url)
-    cache_dir = "cached_bigwigs"
-    os.makedirs(cache_dir, exist_ok=True)
-    local_path = os.path.join(cache_dir, filename)
+# stage timings and cache counters for Prometheus, one endpoint per server process
+@st.cache_resource
+def start_metrics_server():
+    return queryMetrics.serve_metrics(METRICS_PORT, cache_stats) if METRICS_PORT else None
+
+# track images are drawn by render processes shared by all sessions, tables are
+# shown without waiting for them; the bigWigs are provisioned by this process for
+# them and popular genes are rendered ahead
+@st.cache_resource
+def start_render_jobs():
+    scheduler = renderJobs.RenderScheduler()
+    scheduler.warm(renderJobs.warm_up_jobs(), queryEngine.TRACK_IMAGE_FORMAT)
+    return scheduler
 
-    if not os.path.exists(local_path):
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_path, "wb") as f:
-                shutil.copyfileobj(r.raw, f)
+# streamlit runs app.py as __main__, so the render processes import this module
+# again; only the server process warms up and starts the servers
+if multiprocessing.current_process().name == "MainProcess":
+    start_engine_warm_up()
+    start_metrics_server()
+    start_render_jobs()
 
-    return local_path
 
-# bigwig loading
-@st.cache_resource
-def load_bigwig_tracks():
-    bw_files = {
-       # "h3k4me1": fetch_bigwig_locally("https://data.cyverse.org/dav-anon/iplant/home/efeaydin/h3k4me1.bigWig"),
-        #"h3k4me3": fetch_bigwig_locally("https://data.cyverse.org/dav-anon/iplant/home/efeaydin/h3k4me3.bigWig"),
-        #"h3k27ac": fetch_bigwig_locally("https://data.cyverse.org/dav-anon/iplant/home/efeaydin/h3k27ac.bigWig"),
-        #"h3k27me3": fetch_bigwig_locally("https://data.cyverse.org/dav-anon/iplant/home/efeaydin/h3k27me3.bigWig"),
-        #"dnase": fetch_bigwig_locally("https://data.cyverse.org/dav-anon/iplant/home/efeaydin/dnase.bigWig"),
-
-        # alternative links
-        "h3k4me1": fetch_bigwig_locally("https://www.encodeproject.org/files/ENCFF836XOQ/@@download/ENCFF836XOQ.bigWig"),
-        "h3k4me3": fetch_bigwig_locally("https://www.encodeproject.org/files/ENCFF321DZL/@@download/ENCFF321DZL.bigWig"),
-        "h3k27ac": fetch_bigwig_locally("https://www.encodeproject.org/files/ENCFF087YCU/@@download/ENCFF087YCU.bigWig"),
-        "h3k27me3": fetch_bigwig_locally("https://www.encodeproject.org/files/ENCFF211VQW/@@download/ENCFF211VQW.bigWig"),
-        "dnase": fetch_bigwig_locally("https://www.encodeproject.org/files/ENCFF743ULW/@@download/ENCFF743ULW.bigWig"),
-    }
-
-    return {key: pyBigWig.open(path) for key, path in bw_files.items()}
-
-bigwig_tracks = load_bigwig_tracks()
-h3k4me1 = bigwig_tracks["h3k4me1"]
-h3k4me3 = bigwig_tracks["h3k4me3"]
-h3k27ac = bigwig_tracks["h3k27ac"]
-h3k27me3 = bigwig_tracks["h3k27me3"]
-dnase = bigwig_tracks["dnase"]
-
-# function to write tempfiles from bigWigs
-def write_temp_bedgraph(track, chrom, start, end):
-    intervals = track.intervals(chrom, start, end)
-    temp_path = tempfile.NamedTemporaryFile(delete=False, suffix=".bedGraph").name
-    with open(temp_path, "w") as out:
-        for interval in intervals:
-            out.write(f"{chrom}\t{interval[0]}\t{interval[1]}\t{interval[2]}\n")
-    return temp_path
+# -------------------- Functions --------------------
+
+# sends an encoded track image straight to the browser
+def show_track_image(track_image):
+    if queryEngine.TRACK_IMAGE_FORMAT == "svg":
+        st.image(track_image.decode(), use_container_width=True)
+    else:
+        st.image(track_image, use_container_width=True)
+
+# the session's render jobs replace each other, a query left behind stops its pending render
+def session_owner():
+    if "render_owner" not in st.session_state:
+        st.session_state.render_owner = uuid.uuid4().hex
+    return st.session_state.render_owner
+
+# track image of a query, or a placeholder until its render job is done
+def show_render(kind, args):
+    job = start_render_jobs().submit(kind, args, queryEngine.TRACK_IMAGE_FORMAT, owner=session_owner())
+    if not job.done():
+        wait_for_render(job)
+        return
+    try:
+        track_image = job.result()
+    except Exception as e:
+        st.write(f"Error generating genome track: {e}")
+        return
+    if track_image is not None:
+        with queryMetrics.span("show"):
+            show_track_image(track_image)
+
+# only this placeholder reruns while the job is pending, the page reruns once when it is done
+@st.fragment(run_every=RENDER_POLL_SECONDS)
+def wait_for_render(job):
+    if job.done():
+        st.rerun()
+    st.caption("Rendering genome track...")
+
+# one page of a result table, with a page selector when it has more than PAGE_ROWS rows
+def show_table(table, key):
+    n_pages = max(1, -(-len(table) // PAGE_ROWS))
+    page = 1
+    if n_pages > 1:
+        page = int(st.number_input(f"Page (of {n_pages}, {len(table)} rows)", min_value=1, max_value=n_pages, value=1, step=1, key=key))
+    st.dataframe(table.iloc[(page - 1) * PAGE_ROWS:page * PAGE_ROWS], hide_index=True, use_container_width=True)
+
+# download of a result table in the chosen format, encoded chunk by chunk
+def download_table(label, table, file_stem, key):
+    fmt = st.selectbox("Download format:", resultExport.export_formats(table), format_func=str.upper, key=f"{key}_format")
+    st.download_button(
+        label=f"{label} as {fmt.upper()}",
+        data=resultExport.export_bytes(table, fmt),
+        file_name=f"{file_stem}.{fmt}",
+        mime=resultExport.EXPORT_FORMATS[fmt],
+        key=f"{key}_download"
+    )
 
 # function for gene targeted query
+@queryMetrics.timed_request("gene")
 def geneAnalyzer(subChoice, res, gene_of_interest, cre_index):
-    gene_index = 9 - cre_index
-    myTx = "allTX" if cre_index == 0 else "canonTX"
+    myTx = queryEngine.promoter_set(cre_index)
+    mySubtype = loopIndex.SUBTYPE_SOURCES.get(subChoice, f"merged_{res}")
 
-    if gene_of_interest not in coding_genes.iloc[:, 3].values:
+    try:
+        hits = queryEngine.gene_query(gene_of_interest, subChoice, res, cre_index)
+    except queryEngine.UnknownGeneError:
         st.write("No protein coding genes with the given name were found.")
         return
 
-    subtype_map = {
-        1: "HeH_10k",
-        2: "ER_10k",
-        3: "BA_10k",
-        4: "DUX4r_10k",
-        5: "TP_10k",
-        6: "KMT2Ar_10k",
-        7: "iAMP_10k",
-        8: "nearHaploid_10k",
-        0: f"merged_{res}"
-    }
-    mySubtype = subtype_map.get(subChoice, "unknown")
-
-    if res == "10k" and subChoice == 0:
-        df = all_loops[~all_loops['loopSource'].isin(["merged_1k"])].drop_duplicates()
-    else:
-        df = all_loops[all_loops['loopSource'] == mySubtype]
-
-    df.iloc[:, [1, 2, 4, 5]] = df.iloc[:, [1, 2, 4, 5]].astype(int)
-
-    myList, myList2 = [], []
-
-    for i in range(len(df)):
-        gene_list = str(df.iloc[i, gene_index]).split(",")
-        if gene_of_interest in gene_list:
-            myList.append([f"chr{df.iloc[i, 0]}:{int(df.iloc[i, 1])}-{int(df.iloc[i, 2])}"])
-            myList2.append([
-                df.iloc[i, 3], df.iloc[i, 4], df.iloc[i, 5],
-                df.iloc[i, 0], df.iloc[i, 1], df.iloc[i, 2], gene_of_interest
-            ])
-
-    myList = pd.DataFrame(myList, columns=['region'])
-    myDf = pd.DataFrame(myList2, columns=['chr', 'start', 'end', 'interChr', 'interStart', 'interEnd', 'target']).drop_duplicates()
-    myDf.iloc[:, [1, 2, 4, 5]] = myDf.iloc[:, [1, 2, 4, 5]].astype(int)
-    
-    if myDf.empty:
+    if hits.empty:
         st.write("No regulatory elements were identified for this gene")
         return
     else:
         st.write("Putative enhancers for this gene were found in the following regions:")
-        for region in myList['region'].drop_duplicates():
-            st.write(region)
+        show_table(pd.DataFrame({'region': hits.regions}), "gene_regions_page")
 
-    csv_data = myDf.to_csv(index=False)
-    st.download_button(
-        label="Download Enhancer Results as CSV",
-        data=csv_data,
-        file_name=f"{gene_of_interest}_{myTx}_{res}_{mySubtype}_enhancer_results.csv",
-        mime="text/csv"
-    )
-
-    extended_min_start, extended_max_end = get_genomic_range(myDf)
-    region = f"chr{myDf.iloc[0, 0]}:{int(extended_min_start)}-{int(extended_max_end)}"
-
-    temp_links_file = tempfile.NamedTemporaryFile(delete=False, mode='w', suffix='.tab')
-
-    for _, row in myDf.iterrows():
-        temp_links_file.write(
-        f"{row['chr']}\t"
-        f"{int(row['start'])}\t"
-        f"{int(row['end'])}\t"
-        f"{row['interChr']}\t"
-        f"{int(row['interStart'])}\t"
-        f"{int(row['interEnd'])}\t"
-        "1.0\n")
-
-    temp_links_file.close()
-
-    # fix genes
-    new_bed_file = coding_genes[coding_genes.iloc[:, 3] != gene_of_interest].copy()
-    new_bed_file.loc[new_bed_file.iloc[:, 3] == gene_of_interest, new_bed_file.columns[6]] = "255,0,0"
-    new_bed_file.insert(6, "thickStart", 1000)
-    new_bed_file.insert(7, "thickEnd", 2000)
-    new_bed_file.to_csv(os.path.join(TRACKS_DIR, "tempCodingGenes.bed"), index=False, sep="\t", header=False)
-
-    only_gene = coding_genes[coding_genes.iloc[:, 3] == gene_of_interest].copy()
-    only_gene = only_gene.iloc[:, [0, 1, 2, 3, 4, 5]]  # BED6
-    only_gene.to_csv("tracks/onlyTargetGene.bed", sep="\t", index=False, header=False)
-    # fix bigwig
-    # define regions of interest
-    chrom = f"chr{myDf.iloc[0, 0]}"
-    start = int(extended_min_start)
-    end = int(extended_max_end)
-    bw_region = f"{chrom}:{start}-{end}"
-
-    temp_h3k4me1_path = write_temp_bedgraph(h3k4me1, chrom, start, end)
-    temp_h3k4me3_path = write_temp_bedgraph(h3k4me3, chrom, start, end)
-    temp_h3k27ac_path = write_temp_bedgraph(h3k27ac, chrom, start, end)
-    temp_h3k27me3_path = write_temp_bedgraph(h3k27me3, chrom, start, end)
-    temp_dnase_path   = write_temp_bedgraph(dnase, chrom, start, end)
-    
-    temp_tracks_path = os.path.join(TRACKS_DIR, "temp_gene_tracks.ini")
-    with open(temp_tracks_path, "w") as temp_tracks_file:
-        # x-axis
-        temp_tracks_file.write("[x-axis]\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("fontsize = 14\n")
-        temp_tracks_file.write("title = hg38\n\n")
-        # enhancer links
-        temp_tracks_file.write("[enhancer_links]\n")
-        temp_tracks_file.write(f"file = {temp_links_file.name}\n")
-        temp_tracks_file.write("file_type = links\n")
-        temp_tracks_file.write("line_width = 3\n")
-        temp_tracks_file.write("color = red\n")
-        temp_tracks_file.write("title = Enhancer Links\n")
-        temp_tracks_file.write("height = 5\n\n")
-        # only gene
-        temp_tracks_file.write("[genes2]\n")
-        temp_tracks_file.write("file = tracks/onlyTargetGene.bed\n")
-        temp_tracks_file.write("file_type = bed\n")
-        temp_tracks_file.write("color = red\n")
-        temp_tracks_file.write("height = 2\n")
-        temp_tracks_file.write("title = \n")
-        temp_tracks_file.write("fontsize = 12\n")
-        temp_tracks_file.write("arrow_interval = 5\n")
-        temp_tracks_file.write("gene_rows = 1\n\n")
-        #  Genes
-        temp_tracks_file.write("[genes]\n")
-        temp_tracks_file.write("file = tracks/tempCodingGenes.bed\n")
-        temp_tracks_file.write("file_type = bed\n")
-        temp_tracks_file.write("color = red\n")
-        temp_tracks_file.write("height = 2\n")
-        temp_tracks_file.write("max_labels = 20\n")
-        temp_tracks_file.write("overlay_previous = no\n")
-        temp_tracks_file.write("title = Genes\n")
-        temp_tracks_file.write("fontsize = 12\n")
-        temp_tracks_file.write("arrow_interval = 5\n")
-        #temp_tracks_file.write("gene_rows = 10\n\n")
-        # Promoters
-        temp_tracks_file.write("[promoters]\n")
-        temp_tracks_file.write("file = data/promoters.bed\n")
-        temp_tracks_file.write("file_type = bed\n")
-        temp_tracks_file.write("color = red\n")
-        temp_tracks_file.write("height = 2\n")
-        temp_tracks_file.write("merge_overlapping_exons: true\n")
-        temp_tracks_file.write("title = Promoters\n")
-        temp_tracks_file.write("display = collapsed\n")
-        temp_tracks_file.write("labels: false\n")
-        temp_tracks_file.write("merge_transcripts: true\n")
-        # h3k4me1
-        temp_tracks_file.write("[h3k4me1]\n")
-        temp_tracks_file.write(f"file = {temp_h3k4me1_path}\n")
-        temp_tracks_file.write("file_type = bedgraph\n")
-        temp_tracks_file.write("color = green\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("title = H3K4me1\n")
-        temp_tracks_file.write("min_value = 0\n")
-        temp_tracks_file.write("max_value = 30\n\n")
-        # h3k4me3
-        temp_tracks_file.write("[h3k4me3]\n")
-        temp_tracks_file.write(f"file = {temp_h3k4me3_path}\n")
-        temp_tracks_file.write("file_type = bedgraph\n")
-        temp_tracks_file.write("color = green\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("title = H3K4me3\n")
-        temp_tracks_file.write("min_value = 0\n")
-        temp_tracks_file.write("max_value = 30\n\n")
-        # h3k27ac
-        temp_tracks_file.write("[h3k27ac]\n")
-        temp_tracks_file.write(f"file = {temp_h3k27ac_path}\n")
-        temp_tracks_file.write("file_type = bedgraph\n")
-        temp_tracks_file.write("color = green\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("title = H3K27ac\n")
-        temp_tracks_file.write("min_value = 0\n")
-        temp_tracks_file.write("max_value = 30\n\n")
-        # h3k27me3
-        temp_tracks_file.write("[h3k27me3]\n")
-        temp_tracks_file.write(f"file = {temp_h3k27me3_path}\n")
-        temp_tracks_file.write("file_type = bedgraph\n")
-        temp_tracks_file.write("color = green\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("title = H3K27me3\n")
-        temp_tracks_file.write("min_value = 0\n")
-        temp_tracks_file.write("max_value = 30\n\n")
-        # dnase
-        temp_tracks_file.write("[dnase]\n")
-        temp_tracks_file.write(f"file = {temp_dnase_path}\n")
-        temp_tracks_file.write("file_type = bedgraph\n")
-        temp_tracks_file.write("color = grey\n")
-        temp_tracks_file.write("height = 4\n")
-        temp_tracks_file.write("title = DNase\n")
-        temp_tracks_file.write("min_value = 0\n")
-        temp_tracks_file.write("max_value = 1\n\n")
-
-    temp_tracks_file.close()
-
-    output_file = "output_genome_track.png"
-    pyGenomeTracks_command = [
-        "pyGenomeTracks",
-        "--tracks", temp_tracks_path,
-        "--region", region,
-        "--dpi", "100",
-        "-o", output_file
-    ]
+    download_table("Download Enhancer Results", hits.links,
+                   f"{gene_of_interest}_{myTx}_{res}_{mySubtype}_enhancer_results", "gene_results")
 
-    try:
-        subprocess.run(pyGenomeTracks_command, check=True)
-        img = mpimg.imread(output_file)
-        plt.figure(figsize=(10, 5)) 
-        plt.imshow(img)
-        plt.axis('off')
-        st.pyplot(plt.gcf())
-
-        os.remove(output_file)
-        os.remove(temp_links_file.name)
-        os.remove(temp_tracks_file.name)
-        os.remove(os.path.join(TRACKS_DIR, "tempCodingGenes.bed"))
-        os.remove(os.path.join(TRACKS_DIR, "onlyTargetGene.bed"))
-        os.remove(temp_h3k4me1_path) 
-        os.remove(temp_h3k4me3_path) 
-        os.remove(temp_h3k27ac_path) 
-        os.remove(temp_h3k27me3_path) 
-        os.remove(temp_dnase_path) 
-    except subprocess.CalledProcessError as e:
-        st.write(f"Error generating genome track: {e}")
+    show_render("gene", (gene_of_interest, subChoice, res, cre_index))
 
 
+@queryMetrics.timed_request("region")
 def locAnalyzer(subChoice, res, myChr, myStart, myEnd, cre_index):
-    from collections import defaultdict
-    
-    subtype_labels = ["HeH", "ER", "BA", "DUX4r", "TP", "KMT2Ar", "iAMP21", "nearHaploid"]
-    subtype_keys = ["HeH_10k", "ER_10k", "BA_10k", "DUX4r_10k", "TP_10k", "KMT2Ar_10k", "iAMP_10k", "nearHaploid_10k"]
-    track_files = defaultdict(dict)
-
-    for i, label in enumerate(subtype_labels):
-        track_files[i+1]["allTX"] = os.path.join(TRACKS_DIR, f"tracks_{label.lower()}_all.ini")
-        track_files[i+1]["canonTX"] = os.path.join(TRACKS_DIR, f"tracks_{label.lower()}_canon.ini")
-
-    merged_tracks = {
-        "1k": {"allTX": "tracks_1k_all.ini", "canonTX": "tracks_1k_canon.ini"},
-        "10k": {"allTX": "tracks_10k_all.ini", "canonTX": "tracks_10k_canon.ini"},
-    }
-
-    gene_index = 9 - cre_index
-    annot_index = 7 - cre_index
-    myTx = "allTX" if cre_index == 0 else "canonTX"
-
-    if subChoice == 0:
-        if res == "10k":
-            df = all_loops[~all_loops['loopSource'].isin(["merged_1k"])].drop_duplicates()
-        else:
-            df = all_loops[all_loops['loopSource'] == f"merged_{res}"]
-        mySubtype = "merged"
-        myTrack = os.path.join(TRACKS_DIR, merged_tracks[res][myTx])
-    else:
-        df = all_loops[all_loops['loopSource'] == subtype_keys[subChoice - 1]]
-        mySubtype = subtype_labels[subChoice - 1]
-        myTrack = track_files[subChoice][myTx]
-
+    myTx = queryEngine.promoter_set(cre_index)
+    mySubtype = "merged" if subChoice == 0 else loopIndex.SUBTYPE_LABELS[subChoice]
     myStart, myEnd = int(myStart), int(myEnd)
-    myList = []
-
-    for i in range(len(df)):
-        cond1 = str(df.iloc[i, 0]) == str(myChr) and df.iloc[i, 1] >= myStart and df.iloc[i, 2] <= myEnd
-        cond2 = str(df.iloc[i, 3]) == str(myChr) and df.iloc[i, 4] >= myStart and df.iloc[i, 5] <= myEnd
-        if cond1 or cond2:
-            myList.append([
-                df.iloc[i, 0], df.iloc[i, 1], df.iloc[i, 2], df.iloc[i, gene_index],
-                df.iloc[i, 3], df.iloc[i, 4], df.iloc[i, 5], df.iloc[i, annot_index]
-            ])
-
-    myDf_all = pd.DataFrame(myList, columns=['chr', 'start', 'end', 'target', 'interChr', 'interStart', 'interEnd', 'type'])
-    myDf = myDf_all[(myDf_all['type'] == "CRE") & (myDf_all['target'] != "no")].iloc[:, :7].drop_duplicates()
-    #myDf_all = myDf_all[myDf_all['target'] == "no"]
-    myDf_all = myDf_all[(myDf_all['target'] == "no") & (myDf_all['type'] != "CRE")]
-
-    if myDf.empty:
+
+    result = queryEngine.region_query(myChr, myStart, myEnd, subChoice, res, cre_index)
+
+    if result.empty:
         st.write("No regulatory loops were found for this location")
         return
 
-    unique_enhancers = myDf[['chr', 'start', 'end']].drop_duplicates()
-    st.write(f"There are {len(unique_enhancers)} cis-regulatory elements found in this region")
+    st.write(f"There are {len(result.cres())} cis-regulatory elements found in this region")
+
+    cre_details(result, f"{myChr}_{myStart}_{myEnd}_{mySubtype}_{res}_{myTx}_cre_results")
+    show_render("region", (myChr, myStart, myEnd, subChoice, res, cre_index))
+    other_loops(result)
+
 
+# the toggled sections of locAnalyzer are fragments, a toggle or page change reruns only its section
+@st.fragment
+def cre_details(result, file_stem):
     if "show_enhancers" not in st.session_state:
         st.session_state.show_enhancers = False
-    if "show_loops" not in st.session_state:
-        st.session_state.show_loops = False
-    if "last_region" not in st.session_state:
-        st.session_state.last_region = None
 
     if st.button("Show/Hide CREs"):
         st.session_state.show_enhancers = not st.session_state.show_enhancers
 
-    enhancer_df = []
     if st.session_state.show_enhancers:
         st.write("CRE details:")
-        for _, row in unique_enhancers.iterrows():
-            chr_val, start_val, end_val = row
-            associated_genes = myDf[
-                (myDf['chr'] == chr_val) &
-                (myDf['start'] == start_val) &
-                (myDf['end'] == end_val)
-            ]['target'].unique()
-
-            unique_genes = set()
-            for gene_list in associated_genes:
-                if isinstance(gene_list, str):
-                    unique_genes.update(gene_list.split(", "))
-            genes_str = ", ".join(sorted(unique_genes))
-            st.write(f"CRE on {chr_val}:{start_val}-{end_val} regulates: {genes_str}")
-            enhancer_df.append([chr_val, start_val, end_val, genes_str])
-
-        enhancer_df = pd.DataFrame(enhancer_df, columns=['chr', 'start', 'end', 'target'])
-        st.download_button(
-            label="Download CRE Details as CSV",
-            data=enhancer_df.to_csv(index=False),
-            file_name=f"{myChr}_{myStart}_{myEnd}_{mySubtype}_{res}_{myTx}_cre_results.csv",
-            mime="text/csv"
-        )
-
-    extended_min_start, extended_max_end = get_genomic_range(myDf)
-    region = f"chr{myDf.iloc[0, 0]}:{extended_min_start}-{extended_max_end}"
-
-    chrom = f"chr{myDf.iloc[0, 0]}"
-    temp_h3k4me1_path = write_temp_bedgraph(h3k4me1, chrom, extended_min_start, extended_max_end)
-    temp_h3k4me3_path = write_temp_bedgraph(h3k4me3, chrom, extended_min_start, extended_max_end)
-    temp_h3k27ac_path = write_temp_bedgraph(h3k27ac, chrom, extended_min_start, extended_max_end)
-    temp_h3k27me3_path = write_temp_bedgraph(h3k27me3, chrom, extended_min_start, extended_max_end)
-    temp_dnase_path   = write_temp_bedgraph(dnase, chrom, extended_min_start, extended_max_end)
-
-    temp_track_path = os.path.join(TRACKS_DIR, f"temp_{mySubtype}_{res}_{myTx}.ini")
-
-    # Write base part of original .ini
-    with open(myTrack, "r") as infile, open(temp_track_path, "w") as outfile:
-        for line in infile:
-            outfile.write(line)
-    
-        # Function to append dynamically generated bigwig blocks
-        def write_bigwig_section(f, title, path, max_val, cCode):
-            f.write("[test bigwig]\n")
-            f.write(f"file = {path}\n")
-            f.write("file_type = bedgraph\n")
-            f.write("height = 4\n")
-            f.write(f"title = {title}\n")
-            if (cCode == 1):
-                f.write("color = green\n")
-            else:
-                f.write("color = grey\n")
-            f.write("min_value = 0\n")
-            f.write(f"max_value = {max_val}\n\n")
-    
-        write_bigwig_section(outfile, "H3K4me1", temp_h3k4me1_path, 30,1)
-        write_bigwig_section(outfile, "H3K4me3", temp_h3k4me3_path, 30,1)
-        write_bigwig_section(outfile, "H3K27ac", temp_h3k27ac_path, 30,1)
-        write_bigwig_section(outfile, "H3K27me3", temp_h3k27me3_path, 30,1)
-        write_bigwig_section(outfile, "DNase", temp_dnase_path, 1,10)
-
-    if st.session_state.last_region != region:
-        st.session_state.last_region = region
-        output_file = "output_genome_track.png"
-
-        pyGenomeTracks_command = [
-            "pyGenomeTracks", "--tracks", temp_track_path, "--region", region, "-o", output_file
-        ]
-        
-        try:
-            subprocess.run(pyGenomeTracks_command, check=True)
-            st.session_state.track_image = mpimg.imread(output_file)
-            if os.path.exists(output_file):
-                os.remove(output_file)
-                os.remove(temp_h3k4me1_path)
-                os.remove(temp_h3k4me3_path)
-                os.remove(temp_h3k27ac_path)
-                os.remove(temp_h3k27me3_path)
-                os.remove(temp_dnase_path)
-                os.remove(temp_track_path)
-        except subprocess.CalledProcessError as e:
-            st.write(f"Error generating genome track: {e}")
-    else:
-        st.session_state.track_image = st.session_state.track_image
+        enhancer_df = result.cre_targets()
+        show_table(enhancer_df.rename(columns={'target': 'regulates'}), "cre_details_page")
+
+        download_table("Download CRE Details", enhancer_df, file_stem, "cre_results")
 
-    plt.figure(figsize=(10, 5))
-    plt.imshow(st.session_state.track_image)
-    plt.axis('off')
-    st.pyplot(plt.gcf())
+
+@st.fragment
+def other_loops(result):
+    if "show_loops" not in st.session_state:
+        st.session_state.show_loops = False
 
     if st.button("Show/Hide Additional Loops"):
         st.session_state.show_loops = not st.session_state.show_loops
 
     if st.session_state.show_loops:
-        if myDf_all.empty:
+        pairs = result.other_loop_pairs()
+        if not pairs:
             st.write("No additional loops were found in this region")
         else:
             st.write("The following additional loop interactions were also found:")
-            seen = set()
-            for _, row in myDf_all.iterrows():
-                anchor1 = f"{row['chr']}:{row['start']}-{row['end']}"
-                anchor2 = f"{row['interChr']}:{row['interStart']}-{row['interEnd']}"
-                sorted_pair = tuple(sorted([anchor1, anchor2]))
-                if sorted_pair not in seen:
-                    seen.add(sorted_pair)
-                    st.write(f"{sorted_pair[0]}    {sorted_pair[1]}")
-
-
-def get_genomic_range(df):
-    min_start = min(df['start'].min(), df['interStart'].min())
-    max_end = max(df['end'].max(), df['interEnd'].max())
-    return min_start - 100_000, max_end + 100_000
+            show_table(pd.DataFrame(pairs, columns=['anchor 1', 'anchor 2']), "other_loops_page")
+
+
+# function for comparing the CREs of a gene or region across all subtypes (10k loops)
+@queryMetrics.timed_request("compare")
+def compareAnalyzer(focus, cre_index, gene_of_interest=None, myChr=None, myStart=None, myEnd=None):
+    myTx = queryEngine.promoter_set(cre_index)
+
+    try:
+        result = queryEngine.compare_query(focus, cre_index, gene_of_interest, myChr, myStart, myEnd)
+    except queryEngine.UnknownGeneError:
+        st.write("No protein coding genes with the given name were found.")
+        return
+    file_prefix = "_".join(str(part) for part in result.query)
+
+    if result.empty:
+        st.write("No regulatory elements were identified in any subtype")
+        return
+
+    st.write("Cis-regulatory elements found in each subtype:")
+    st.dataframe(result.presence())
+
+    download_table("Download Subtype Comparison", result.table,
+                   f"{file_prefix}_{myTx}_10k_subtype_comparison", "comparison")
+
+    show_render("compare", (focus, cre_index, gene_of_interest, myChr, myStart, myEnd))
+
+
+# sets the location inputs of app.py to a window of the overview
+def zoom_to(start, end):
+    st.session_state.whole_chromosome = False
+    st.session_state.start_input = str(start)
+    st.session_state.end_input = str(end)
+
+# function for windows wider than the region view, up to a whole chromosome
+@queryMetrics.timed_request("overview")
+def overviewAnalyzer(subChoice, res, myChr, myStart, myEnd, cre_index):
+    query = (myChr, int(myStart), int(myEnd), subChoice, res, cre_index)
+    result = queryEngine.overview_query(*query)
+
+    if result.empty:
+        st.write("No loops were found for this location")
+        return
+
+    st.write(f"Overview of chr{result.chrom}:{result.start:,}-{result.end:,}, {int(result.bins['cres'].sum())} CRE loops. "
+             "Zoom into a window of at most 1 Mb for the individual loops and CREs.")
+
+    show_render("overview", query)
+
+    windows = result.zoom_windows()
+    if not windows.empty:
+        st.write("Windows with the most CRE loops:")
+        for i, window in enumerate(windows.itertuples(index=False)):
+            st.button(f"chr{result.chrom}:{window.start:,}-{window.end:,} ({window.cres} CRE loops)",
+                      key=f"zoom_{i}", on_click=zoom_to, args=(window.start, window.end))
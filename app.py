@@ -9,8 +9,8 @@ Created on Tue May 14 11:21:28 2024
 import streamlit as st
 import pandas as pd
 from analyzerFunctions import *
-import base64
-import os
+import queryEngine
+import queryMetrics
 
 
 
@@ -27,12 +27,15 @@ def main_page():
     if st.sidebar.button("Get Info"):
         st.session_state.page = "info_page"
         st.rerun()
+    if ADMIN_PAGE and st.sidebar.button("Metrics"):
+        st.session_state.page = "metrics_page"
+        st.rerun()
     st.sidebar.markdown("---")
     
     st.title("Micro-C derived CREs in ALL")
     st.write("This database contains whole-genome interaction maps of pediatric ALL derived from MicroC experiments performed on 35 primary samples")
 
-    analysis_option = st.sidebar.selectbox("Choose your analysis option:", ["General (Including all BCP-ALL cases)", "Subtype specific"])
+    analysis_option = st.sidebar.selectbox("Choose your analysis option:", ["General (Including all BCP-ALL cases)", "Subtype specific", "Subtype comparison"])
     
     if analysis_option == "Subtype specific":
         subtype = st.sidebar.selectbox("Choose subtype:", ["High Hyperdiploidy", "ETV6::RUNX1", "BCR::ABL1", "DUX4r", "TCF3::PBX1", "KMT2Ar", "iAMP21", "nearHaploid"])
@@ -41,6 +44,10 @@ def main_page():
         subChoice = subtype_index_map[subtype]
         resolution = "10k"  # Only option for subtype specific
         st.sidebar.write(f"Resolution: {resolution} (fixed)")
+    elif analysis_option == "Subtype comparison":
+        subChoice = None  # all eight subtypes side by side
+        resolution = "10k"
+        st.sidebar.write(f"Resolution: {resolution} (fixed)")
     else:
         subChoice = 0
         resolution = st.sidebar.selectbox("Choose resolution:", ["1k", "10k"])
@@ -53,12 +60,19 @@ def main_page():
         gene_of_interest = st.text_input("Enter gene of interest in HGNC SYMBOL (Example: KRAS):")
         if gene_of_interest:
             gene_of_interest = gene_of_interest.strip().upper()
-            geneAnalyzer(subChoice, resolution, gene_of_interest, cre_index)
+            if subChoice is None:
+                compareAnalyzer("gene", cre_index, gene_of_interest=gene_of_interest)
+            else:
+                geneAnalyzer(subChoice, resolution, gene_of_interest, cre_index)
     elif focus_option == "Location":
         chr_input = st.selectbox("Choose chromosome of interest:", [str(i) for i in range(1, 23)] + ["X", "Y"])
-        start_input = st.text_input("Start Position")
-        end_input = st.text_input("End Position")
-        
+        whole_chromosome = subChoice is not None and st.checkbox("Whole chromosome", key="whole_chromosome")
+        if whole_chromosome:
+            overviewAnalyzer(subChoice, resolution, chr_input, 0, queryEngine.chromosome_end(chr_input), cre_index)
+            return
+        start_input = st.text_input("Start Position", key="start_input")
+        end_input = st.text_input("End Position", key="end_input")
+
         if chr_input and start_input and end_input:
             try:
                 start_input = int(start_input)
@@ -66,9 +80,16 @@ def main_page():
                 if start_input >= end_input:
                     st.error("Start position cannot be larger than or equal to the end position.")
                 elif end_input - start_input > 1_000_000:
-                    st.error("Maximum range allowed is 1 Mb.")
+                    # wider windows get the overview, comparisons keep the 1 Mb limit
+                    if subChoice is None:
+                        st.error("Maximum range allowed is 1 Mb.")
+                    else:
+                        overviewAnalyzer(subChoice, resolution, chr_input, start_input, end_input, cre_index)
                 else:
-                    locAnalyzer(subChoice, resolution, chr_input, start_input, end_input, cre_index)
+                    if subChoice is None:
+                        compareAnalyzer("region", cre_index, myChr=chr_input, myStart=start_input, myEnd=end_input)
+                    else:
+                        locAnalyzer(subChoice, resolution, chr_input, start_input, end_input, cre_index)
             except ValueError:
                 st.error("Only numeric values are allowed for start and end positions.")
 
@@ -117,6 +138,23 @@ def pdf_page():
         st.session_state.page = "info_page"
         st.rerun()
 
+def metrics_page():
+    st.title("Query metrics")
+    st.write("Stage latencies (seconds) and result sizes over the recent queries of this server process:")
+    st.dataframe(pd.DataFrame(queryMetrics.summary()), use_container_width=True)
+
+    st.write("Query caches:")
+    st.dataframe(pd.DataFrame(cache_stats()).T, use_container_width=True)
+
+    metrics_text = queryMetrics.prometheus_text(cache_stats())
+    st.download_button(label="Download Prometheus metrics", data=metrics_text, file_name="metrics.txt", mime="text/plain")
+    with st.expander("Prometheus text"):
+        st.code(metrics_text)
+
+    if st.button("Back to App"):
+        st.session_state.page = "main_page"
+        st.rerun()
+
 #def login():
  #   st.title("Login")
   #  password_input = st.text_input("Enter Password:", type="password")
@@ -145,6 +183,8 @@ def main():
         main_page()
     elif st.session_state.page == "pdf_page":
         pdf_page()
+    elif st.session_state.page == "metrics_page" and ADMIN_PAGE:
+        metrics_page()
 
 if __name__ == "__main__":
     main()
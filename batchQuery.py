@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Headless batch version of the gene query: CRE tables for a whole gene list
+in one pass over the loop table, written as one CSV/TSV/BEDPE/Parquet file
+in the schema of the app's download, with optional gene view plots drawn by
+a process pool.
+Run from the repository root:
+
+    python batchQuery.py genes.txt -o cres.csv
+    python batchQuery.py KRAS ETV6 -o cres.parquet --subtype 2 --promoters canonical --plot-dir plots
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import pyBigWig
+import bigwigStore
+import geneView
+import loopIndex
+import queryEngine
+import resultExport
+import signalTracks
+import trackRenderer
+
+# -------------------- Configuration --------------------
+
+DATA_DIR = os.path.join(os.getcwd(), "data")
+TRACKS_DIR = os.path.join(os.getcwd(), "tracks")
+
+coding_genes_path = os.path.join(DATA_DIR, "coding_genes2")
+all_loops_path = os.path.join(DATA_DIR, "concat_loops_v2.tab")
+loop_store_path = os.path.join(DATA_DIR, "loops_store")
+
+# columns of the app's "Download Enhancer Results as CSV"
+RESULT_COLUMNS = ['chr', 'start', 'end', 'interChr', 'interStart', 'interEnd', 'target']
+
+
+# -------------------- Tables --------------------
+
+def gene_cre_table(loops, genes, subChoice=0, res="10k", cre_index=0, gene_table=None):
+    """
+    Enhancer links of every gene in genes, same rows as geneAnalyzer gives per gene.
+    One merge of the gene list with the long loop -> gene table, so the cost
+    does not grow with the number of genes.
+    """
+    blocks = loopIndex.source_blocks(loops)
+    sources = loopIndex.query_sources(list(blocks), subChoice, res)
+    myTx = "allTX" if cre_index == 0 else "canonTX"
+    if gene_table is None:
+        gene_table = loopIndex.build_gene_table(loops)
+
+    genes = list(dict.fromkeys(genes))
+    gene_order = pd.DataFrame({"gene": genes, "order": np.arange(len(genes))})
+    in_sources = np.zeros(len(loops), dtype=bool)
+    in_sources[loopIndex.source_rows(blocks, sources)] = True
+    pairs = gene_table[(gene_table['promoter_set'] == myTx) & in_sources[gene_table['loop_id'].to_numpy()]]
+    pairs = pairs.astype({'gene': str}).merge(gene_order, on="gene").sort_values(["order", "loop_id"], kind="mergesort")
+
+    rows = loops.iloc[pairs["loop_id"].to_numpy()]
+    return pd.DataFrame({
+        'chr': rows.iloc[:, 3].to_numpy(), 'start': rows.iloc[:, 4].to_numpy(), 'end': rows.iloc[:, 5].to_numpy(),
+        'interChr': rows.iloc[:, 0].to_numpy(), 'interStart': rows.iloc[:, 1].to_numpy(), 'interEnd': rows.iloc[:, 2].to_numpy(),
+        'target': pairs["gene"].to_numpy(),
+    }).drop_duplicates().reset_index(drop=True)
+
+
+def write_table(table, path):
+    """Format from the extension of path: .tsv, .bedpe, .parquet (needs pyarrow), else CSV."""
+    resultExport.write_export(table, path)
+
+
+# -------------------- Plotting --------------------
+
+# per worker process: gene annotation, gene view loader, signal pyramids and bigwig handles
+_worker_state = {}
+
+
+def _init_plot_worker(bigwig_paths):
+    # pyGenomeTracks resets its loggers to DEBUG for every track it creates
+    logging.disable(logging.INFO)
+    _worker_state["gene_annotation"] = geneView.build_gene_annotation(pd.read_csv(coding_genes_path, sep="\t"))
+    gene_view_path = os.path.join(TRACKS_DIR, "tracks_gene.ini")
+    if trackRenderer.tracks_indexed(gene_view_path):
+        _worker_state["gene_view"] = lambda chrom, start, end: trackRenderer.load_window_tracks(gene_view_path, chrom, start, end)
+    else:
+        resident = trackRenderer.load_tracks(gene_view_path)
+        _worker_state["gene_view"] = lambda chrom, start, end: resident
+    _worker_state["pyramids"] = signalTracks.load_signal_pyramids(bigwigStore.read_manifest())
+    _worker_state["bigwigs"] = {
+        key: pyBigWig.open(path) for key, path in bigwig_paths.items() if key not in _worker_state["pyramids"]
+    }
+
+
+def _worker_signal_tracks(chrom, start, end, dpi):
+    n_bins = trackRenderer.plot_width_pixels(dpi)
+    tracks = []
+    for key, title, color, max_val in signalTracks.SIGNAL_TRACKS:
+        if key in _worker_state["pyramids"]:
+            region_end, scores = signalTracks.pyramid_signal(_worker_state["pyramids"][key], chrom, start, end, n_bins)
+        else:
+            region_end, scores = signalTracks.binned_signal(_worker_state["bigwigs"][key], chrom, start, end, n_bins)
+        tracks.append(trackRenderer.signal_track(title, color, max_val, region_end, scores))
+    return tracks
+
+
+def _plot_gene(gene, myDf, out_path, image_format):
+    track_image = geneView.render_gene_view(
+        myDf, gene, _worker_state["gene_annotation"], _worker_state["gene_view"],
+        _worker_signal_tracks, image_format=image_format
+    )
+    with open(out_path, "wb") as f:
+        f.write(track_image)
+    return out_path
+
+
+def plot_genes(table, out_dir, workers=None, image_format="png"):
+    """One gene view per target of table, drawn in parallel. Returns {gene: image path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    bigwig_paths = signalTracks.fetch_bigwigs()
+    written = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_plot_worker,
+        initargs=(bigwig_paths,),
+    ) as pool:
+        futures = {
+            pool.submit(_plot_gene, gene, myDf.reset_index(drop=True),
+                        os.path.join(out_dir, f"{gene}.{image_format}"), image_format): gene
+            for gene, myDf in table.groupby("target", sort=False)
+        }
+        for future in as_completed(futures):
+            gene = futures[future]
+            try:
+                written[gene] = future.result()
+            except Exception as e:
+                print(f"{gene}: error generating genome track: {e}", file=sys.stderr)
+    return written
+
+
+# -------------------- Command line --------------------
+
+def read_gene_list(args_genes):
+    """Gene symbols given directly or as files with one symbol per line."""
+    genes = []
+    for item in args_genes:
+        if os.path.isfile(item):
+            with open(item) as f:
+                genes.extend(line.strip() for line in f)
+        else:
+            genes.append(item)
+    return [gene.upper() for gene in genes if gene and not gene.startswith("#")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("genes", nargs="+", help="gene symbols or files with one symbol per line")
+    parser.add_argument("-o", "--output", required=True, help="combined table, .csv, .tsv, .bedpe or .parquet")
+    parser.add_argument("--subtype", type=int, default=0, choices=[0, *loopIndex.SUBTYPE_SOURCES],
+                        help="0 for all BCP-ALL cases, 1-8 for the subtypes in app order")
+    parser.add_argument("--res", default="10k", choices=["1k", "10k"])
+    parser.add_argument("--promoters", default="all", choices=list(queryEngine.PROMOTER_SETS))
+    parser.add_argument("--plot-dir", help="also draw one gene view per gene into this directory")
+    parser.add_argument("--workers", type=int, help="plotting processes, defaults to the CPU count")
+    parser.add_argument("--image-format", default="png", choices=trackRenderer.IMAGE_FORMATS)
+    args = parser.parse_args()
+
+    if args.subtype != 0 and args.res != "10k":
+        parser.error("subtype specific maps are only available at 10k")
+
+    genes = read_gene_list(args.genes)
+    coding_genes = pd.read_csv(coding_genes_path, sep="\t")
+    known = set(coding_genes.iloc[:, 3])
+    unknown = [gene for gene in genes if gene not in known]
+    if unknown:
+        print(f"{len(unknown)} genes are not protein coding genes and were skipped: {', '.join(unknown[:20])}",
+              file=sys.stderr)
+    genes = [gene for gene in genes if gene not in unknown]
+
+    query_start = time.perf_counter()
+    loops = loopIndex.load_loops(all_loops_path, loop_store_path)
+    table = gene_cre_table(loops, genes, args.subtype, args.res, queryEngine.PROMOTER_SETS[args.promoters])
+    write_table(table, args.output)
+    print(f"{table['target'].nunique()} of {len(genes)} genes have CREs, {len(table)} links -> {args.output} "
+          f"in {time.perf_counter() - query_start:.1f}s")
+
+    if args.plot_dir:
+        plot_start = time.perf_counter()
+        written = plot_genes(table, args.plot_dir, args.workers, args.image_format)
+        print(f"{len(written)} gene views -> {args.plot_dir} in {time.perf_counter() - plot_start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
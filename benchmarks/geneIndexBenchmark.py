@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Compares the gene -> loop index against the old per-row scan of geneAnalyzer
+for every protein coding gene in data/coding_genes2. Run from the repository root:
+
+    python benchmarks/geneIndexBenchmark.py --legacy-sample 200
+
+The old scan takes ~1 s per gene on the merged sets, so by default it is only
+timed on a random sample and the full-list time is extrapolated.
+Use --legacy-sample 0 to scan every gene (hours).
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import loopIndex
+
+DATA_DIR = os.path.join(os.getcwd(), "data")
+
+
+# the loop geneAnalyzer used before the index, kept verbatim for comparison
+def legacy_gene_scan(all_loops, subChoice, res, gene_of_interest, mySubtype, gene_index):
+    if res == "10k" and subChoice == 0:
+        df = all_loops[~all_loops['loopSource'].isin(["merged_1k"])].drop_duplicates()
+    else:
+        df = all_loops[all_loops['loopSource'] == mySubtype]
+
+    myList2 = []
+    for i in range(len(df)):
+        gene_list = str(df.iloc[i, gene_index]).split(",")
+        if gene_of_interest in gene_list:
+            myList2.append([df.iloc[i, 3], df.iloc[i, 4], df.iloc[i, 5], df.iloc[i, 0], df.iloc[i, 1], df.iloc[i, 2]])
+    return myList2
+
+
+# the lookup of queryEngine.gene_query: merged 10k reads the deduplicated union of the 10k sources
+def indexed_gene_scan(all_loops, index, loop_sources, subChoice, res, gene_of_interest, myTx):
+    sources = loopIndex.index_sources(loop_sources, subChoice, res)
+    hits = all_loops.iloc[loopIndex.gene_rows(index, sources, myTx, gene_of_interest)]
+    return hits.iloc[:, [3, 4, 5, 0, 1, 2]].values.tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subchoice", type=int, default=0, help="0 = merged, 1-8 = subtype (as in app.py)")
+    parser.add_argument("--res", default="10k", choices=["1k", "10k"])
+    parser.add_argument("--cre-index", type=int, default=0, choices=[0, 1])
+    parser.add_argument("--legacy-sample", type=int, default=200, help="genes to run the old scan on (0 = all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    subtype_keys = ["HeH_10k", "ER_10k", "BA_10k", "DUX4r_10k", "TP_10k", "KMT2Ar_10k", "iAMP_10k", "nearHaploid_10k"]
+    mySubtype = f"merged_{args.res}" if args.subchoice == 0 else subtype_keys[args.subchoice - 1]
+    myTx = "allTX" if args.cre_index == 0 else "canonTX"
+    gene_index = 9 - args.cre_index
+
+    coding_genes = pd.read_csv(os.path.join(DATA_DIR, "coding_genes2"), sep="\t")
+    all_loops = loopIndex.read_loop_table(os.path.join(DATA_DIR, "concat_loops_v2.tab"))
+    loop_sources = list(all_loops['loopSource'].unique())
+    genes = coding_genes.iloc[:, 3].dropna().astype(str).unique()
+    print(f"{len(all_loops)} loops, {len(genes)} genes, source {mySubtype}, {myTx}")
+
+    build_start = time.perf_counter()
+    union = loopIndex.build_loop_union(all_loops)
+    index = loopIndex.build_gene_index(all_loops, union=union)
+    build_time = time.perf_counter() - build_start
+    print(f"index build: {build_time:.2f}s ({len(index['keys'])} keys, {len(union['rows'])} loops in the merged 10k union)")
+
+    timings = np.empty(len(genes))
+    indexed_hits = {}
+    for i, gene in enumerate(genes):
+        query_start = time.perf_counter()
+        indexed_hits[gene] = indexed_gene_scan(all_loops, index, loop_sources, args.subchoice, args.res, gene, myTx)
+        timings[i] = time.perf_counter() - query_start
+    print(f"indexed: {timings.sum():.2f}s total, mean {timings.mean() * 1e3:.3f} ms, "
+          f"p95 {np.percentile(timings, 95) * 1e3:.3f} ms per gene")
+
+    rng = np.random.default_rng(args.seed)
+    sample = genes if args.legacy_sample <= 0 else rng.choice(genes, min(args.legacy_sample, len(genes)), replace=False)
+    legacy_timings = np.empty(len(sample))
+    mismatches = 0
+    for i, gene in enumerate(sample):
+        query_start = time.perf_counter()
+        legacy = legacy_gene_scan(all_loops, args.subchoice, args.res, gene, mySubtype, gene_index)
+        legacy_timings[i] = time.perf_counter() - query_start
+        # the old scan repeats a loop once per 10k source calling it, the app shows each link once
+        if set(map(tuple, legacy)) != set(map(tuple, indexed_hits[gene])):
+            mismatches += 1
+            print(f"  result mismatch for {gene}")
+
+    projected = legacy_timings.mean() * len(genes)
+    print(f"legacy scan: {len(sample)} genes, mean {legacy_timings.mean() * 1e3:.1f} ms per gene, "
+          f"{'total' if len(sample) == len(genes) else 'projected total'} {projected:.1f}s")
+    print(f"speed-up per query: {legacy_timings.mean() / timings.mean():.0f}x, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Per-worker memory footprint of the lookup data. Each measurement runs in a
+fresh process from the working directory (data/ as for the app):
+
+  default  the loop table as pandas parses it with default dtypes (int64
+           coordinates, object strings), what every worker used to hold
+  engine   every lookup resource of queryEngine (loop table, gene table,
+           gene and region indexes, overview aggregates), as a worker after
+           warm-up without rendering
+
+It reports the bytes of every resource and the RSS/PSS growth of loading
+them, and writes everything with the commit it ran on as JSON:
+
+    python benchmarks/memoryReport.py -o memory_before.json
+    python benchmarks/memoryReport.py -o memory_after.json --compare memory_before.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["default", "engine"]
+
+
+# -------------------- Measurements --------------------
+
+def measure(mode):
+    """Run in the measuring process: {"resources": {name: bytes}, "process": growth of rss/pss/peak_rss}."""
+    import queryMetrics
+    before = queryMetrics.process_memory()
+    if mode == "default":
+        import pandas as pd
+        import queryEngine
+        loops = pd.read_csv(queryEngine.all_loops_path, sep="\t")
+        resources = {"loops": int(loops.memory_usage(deep=True).sum())}
+    else:
+        import queryEngine
+        queryEngine.warm_up(render=False)
+        resources = queryEngine.memory_report()["resources"]
+    after = queryMetrics.process_memory()
+    growth = {key: after[key] - before[key] if after[key] is not None and before[key] is not None else None for key in after}
+    return {"resources": resources, "process": growth}
+
+
+def run_mode(mode):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", mode],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# -------------------- Reporting --------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def mb(value):
+    return "-" if value is None else f"{value / 2**20:9.1f}"
+
+
+def print_report(results):
+    for mode, report in results["modes"].items():
+        print(f"{mode}:")
+        for name, size in report["resources"].items():
+            print(f"  {name:>20} {mb(size)} MB")
+        print("  " + ", ".join(f"{key} +{mb(value).strip()} MB" for key, value in report["process"].items()))
+
+
+def compare(results, baseline):
+    """Print the engine resources and process growth against baseline."""
+    old, new = baseline["modes"]["engine"], results["modes"]["engine"]
+    rows = [(name, old["resources"].get(name), size) for name, size in new["resources"].items()]
+    rows += [(f"process {key}", old["process"].get(key), value) for key, value in new["process"].items()]
+    for name, before, after in rows:
+        change = f"({after / before - 1:+.0%})" if before and after is not None else ""
+        print(f"{name:>20}: {mb(before)} -> {mb(after)} MB {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="memory_report.json")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    results = {
+        "meta": {"commit": git_commit(), "date": datetime.datetime.now().isoformat(timespec="seconds")},
+        "modes": {mode: run_mode(mode) for mode in MODES},
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    print(f"-> {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Reproducible benchmark of the gene and region query paths, without streamlit
+and without network access. Workloads (all drawn from a fixed seed):
+
+  gene    random genes of data/coding_genes2
+  region  random 1 Mb windows, one set per chromosome
+
+each run for every loop set (merged 1k, merged 10k and the eight subtypes)
+with all and canonical promoters, through queryEngine's queries and
+renderers (the code the app and the API server run) with its caches off.
+Lookups run for every query, rendering (tracks, signal, draw) for a sample
+of those that found loops. Signal comes
+from synthetic bigWigs written once into --fixture-dir and provisioned
+offline through bigwigStore, optionally as signal pyramids.
+
+Per workload and stage it reports throughput, latency percentiles and peak
+RSS growth, and writes everything with the commit it ran on as JSON:
+
+    python benchmarks/querySuite.py -o bench_before.json
+    python benchmarks/querySuite.py -o bench_after.json --compare bench_before.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyBigWig
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bigwigStore
+import loopIndex
+import queryEngine
+import queryMetrics
+import signalTracks
+
+# -------------------- Configuration --------------------
+
+# chromosome sizes (hg38) of the synthetic bigwigs
+FIXTURE_CHROM_SIZES = {
+    "chr1": 248956422, "chr2": 242193529, "chr3": 198295559, "chr4": 190214555, "chr5": 181538259,
+    "chr6": 170805979, "chr7": 159345973, "chr8": 145138636, "chr9": 138394717, "chr10": 133797422,
+    "chr11": 135086622, "chr12": 133275309, "chr13": 114364328, "chr14": 107043718, "chr15": 101991189,
+    "chr16": 90338345, "chr17": 83257441, "chr18": 80373285, "chr19": 58617616, "chr20": 64444167,
+    "chr21": 46709983, "chr22": 50818468, "chrX": 156040895, "chrY": 57227415,
+}
+FIXTURE_STEP = 1_000
+
+# every loop set the app can query: (subChoice, res), each with all and canonical promoters
+LOOP_SETS = [(0, "1k"), (0, "10k")] + [(subChoice, "10k") for subChoice in loopIndex.SUBTYPE_SOURCES]
+PROMOTER_SETS = [0, 1]
+
+WINDOW_SIZE = 1_000_000
+
+
+# -------------------- Fixtures --------------------
+
+def write_fixture_bigwigs(fixture_dir, seed):
+    """One synthetic <key>.bigWig per signal track, random values in FIXTURE_STEP bins. Returns the directory."""
+    bigwig_dir = os.path.join(fixture_dir, f"bigwigs_seed{seed}")
+    os.makedirs(bigwig_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for key, __, __, max_value in signalTracks.SIGNAL_TRACKS:
+        path = os.path.join(bigwig_dir, f"{key}.bigWig")
+        if os.path.exists(path):
+            continue
+        temp_path = f"{path}.tmp"
+        bw = pyBigWig.open(temp_path, "w")
+        bw.addHeader(list(FIXTURE_CHROM_SIZES.items()))
+        for chrom, size in FIXTURE_CHROM_SIZES.items():
+            values = rng.gamma(2.0, max_value / 6, size // FIXTURE_STEP)
+            bw.addEntries(chrom, 0, values=values, span=FIXTURE_STEP, step=FIXTURE_STEP)
+        bw.close()
+        os.replace(temp_path, path)
+    return bigwig_dir
+
+
+def provision_fixtures(fixture_dir, seed, pyramids):
+    """
+    Provision the fixture bigwigs offline into a store of their own, where
+    queryEngine finds them, and with pyramids build their signal pyramids.
+    Returns the directory of the pyramids (an empty one without).
+    """
+    bigwig_dir = write_fixture_bigwigs(fixture_dir, seed)
+    bigwigStore.STORE_DIR = os.path.join(fixture_dir, f"store_seed{seed}")
+    manifest = [{**entry, "size": None, "sha256": None} for entry in bigwigStore.read_manifest()]
+    bigwig_paths = bigwigStore.provision_all(manifest, offline=True, seed_dir=bigwig_dir)
+
+    pyramid_dir = os.path.join(fixture_dir, f"pyramids_seed{seed}" if pyramids else "no_pyramids")
+    os.makedirs(pyramid_dir, exist_ok=True)
+    if pyramids:
+        for key, path in bigwig_paths.items():
+            if not os.path.exists(os.path.join(pyramid_dir, key, "meta.json")):
+                signalTracks.build_signal_pyramid(path, os.path.join(pyramid_dir, key))
+    return pyramid_dir
+
+
+# -------------------- Query paths --------------------
+
+def use_fixtures(pyramid_dir):
+    """
+    Point queryEngine at the provisioned fixture store and at pyramid_dir
+    (empty for none), and turn its query caches off so every query is
+    looked up and rendered.
+    """
+    signalTracks.PYRAMID_DIR = pyramid_dir
+    queryEngine.QUERY_CACHE_MAX_MB = 0
+    queryEngine.QUERY_CACHE_DIR = None
+
+
+def run_query(analyzer, args, should_render):
+    """The query of the app's analyzer through queryEngine, rendered if it found loops and should_render()."""
+    @queryMetrics.timed_request(analyzer)
+    def query():
+        result = queryEngine.QUERIES[analyzer](*args)
+        if not result.empty and should_render():
+            queryEngine.RENDERERS[analyzer](result)
+    query()
+
+
+# -------------------- Workloads --------------------
+
+def workloads(rng, n_genes, windows_per_chrom):
+    """(analyzer, query args) of every query of the run, in a fixed order."""
+    genes = rng.choice(queryEngine.coding_genes().iloc[:, 3].astype(str).unique(), n_genes, replace=False)
+    windows = []
+    for chrom, size in FIXTURE_CHROM_SIZES.items():
+        for start in rng.integers(0, size - WINDOW_SIZE, windows_per_chrom):
+            windows.append((chrom.removeprefix("chr"), int(start), int(start) + WINDOW_SIZE))
+
+    queries = []
+    for subChoice, res in LOOP_SETS:
+        for cre_index in PROMOTER_SETS:
+            queries.extend(("gene", (gene, subChoice, res, cre_index)) for gene in genes)
+            queries.extend(("region", (*window, subChoice, res, cre_index)) for window in windows)
+    return queries
+
+
+def run(queries, render_every):
+    """
+    Run every query, rendering every render_every-th of each analyzer that
+    found loops. Returns wall seconds per analyzer.
+    """
+    wall = {}
+    found = {}
+
+    def should_render(analyzer):
+        found[analyzer] = found.get(analyzer, 0) + 1
+        return render_every > 0 and found[analyzer] % render_every == 0
+
+    for analyzer, args in queries:
+        start = time.perf_counter()
+        run_query(analyzer, args, lambda: should_render(analyzer))
+        wall[analyzer] = wall.get(analyzer, 0.0) + time.perf_counter() - start
+    return wall
+
+
+# -------------------- Reporting --------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def results_table(summary):
+    """One row per analyzer and stage: count, throughput, latency percentiles (ms), peak RSS growth (MB)."""
+    rows = {}
+    for row in summary:
+        if "stage" not in row:
+            continue
+        entry = rows.setdefault((row["analyzer"], row["stage"]), {"analyzer": row["analyzer"], "stage": row["stage"]})
+        if row["metric"] == "query_stage_seconds":
+            entry.update({
+                "count": row["count"],
+                "per_s": 1 / row["mean"] if row["mean"] else None,
+                "mean_ms": row["mean"] * 1000, "p50_ms": row["p50"] * 1000,
+                "p95_ms": row["p95"] * 1000, "max_ms": row["max"] * 1000,
+            })
+        elif row["metric"] == "query_stage_peak_rss_growth_bytes":
+            entry["rss_growth_mb"] = row["max"] / 2**20
+    return list(rows.values())
+
+
+def compare(results, baseline, tolerance):
+    """Print p50/p95 of every stage against baseline. Returns the stages slower by more than tolerance."""
+    before = {(row["analyzer"], row["stage"]): row for row in baseline["stages"]}
+    slower = []
+    for row in results["stages"]:
+        old = before.get((row["analyzer"], row["stage"]))
+        if old is None:
+            continue
+        for statistic in ["p50_ms", "p95_ms"]:
+            change = row[statistic] / old[statistic] - 1 if old[statistic] else 0.0
+            flag = "REGRESSION" if change > tolerance else ""
+            print(f"{row['analyzer']:>7} {row['stage']:>7} {statistic}: {old[statistic]:9.2f} -> {row[statistic]:9.2f} ms "
+                  f"({change:+.0%}) {flag}")
+            if flag:
+                slower.append((row["analyzer"], row["stage"], statistic))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--genes", type=int, default=20, help="random genes per loop set")
+    parser.add_argument("--windows-per-chrom", type=int, default=1)
+    parser.add_argument("--render-every", type=int, default=50, help="render every n-th query with results of each workload, 0 for none")
+    parser.add_argument("--pyramids", action="store_true", help="read the signal from pyramids instead of the bigWigs")
+    parser.add_argument("--fixture-dir", default=os.path.join(tempfile.gettempdir(), "microc_benchmark_fixtures"))
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative growth of p50/p95")
+    args = parser.parse_args()
+
+    # pyGenomeTracks warns about every chromosome missing from a subtype's tracks
+    logging.disable(logging.WARNING)
+    setup_start = time.perf_counter()
+    use_fixtures(provision_fixtures(args.fixture_dir, args.seed, args.pyramids))
+    queryEngine.warm_up()
+    queries = workloads(np.random.default_rng(args.seed), args.genes, args.windows_per_chrom)
+    print(f"setup {time.perf_counter() - setup_start:.1f}s, {len(queries)} queries")
+
+    # warm-up: signal pool, track parsers and the page cache, not measured
+    queryEngine.build_signal_tracks("chr1", 1_000_000, 2_000_000)
+    run(queries[:2], 1)
+    queryMetrics.reset()
+    queryMetrics.TRACK_RSS = True
+    wall = run(queries, args.render_every)
+    queryEngine.signal_pool().shutdown()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "args": vars(args), "queries": len(queries),
+            "peak_rss_mb": queryMetrics.peak_rss_bytes() / 2**20,
+        },
+        "throughput_per_s": {analyzer: sum(1 for name, __ in queries if name == analyzer) / seconds
+                             for analyzer, seconds in wall.items()},
+        "stages": results_table(queryMetrics.summary()),
+        "metrics": queryMetrics.summary(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(pd.DataFrame(results["stages"]).to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    print("throughput: " + ", ".join(f"{analyzer} {rate:.1f}/s" for analyzer, rate in results["throughput_per_s"].items()))
+    print(f"peak RSS {results['meta']['peak_rss_mb']:.0f} MB -> {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
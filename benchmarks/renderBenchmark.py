@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Plot latency of the pyGenomeTracks CLI (one subprocess per query, as the
+analyzers used to do) against the resident in-process renderer.
+Run from the repository root:
+
+    python benchmarks/renderBenchmark.py --tracks tracks/tracks_10k_all.ini
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import trackRenderer
+
+DEFAULT_REGIONS = ["chr12:24700000-26000000", "chr7:50000000-51000000", "chr9:21500000-22500000", "chr1:44000000-45000000"]
+
+
+def parse_region(region):
+    chrom, span = region.split(":")
+    start, end = span.replace(",", "").split("-")
+    return chrom, int(start), int(end)
+
+
+def summarize(name, timings):
+    timings = np.asarray(timings)
+    print(f"{name}: mean {timings.mean():.2f}s, p50 {np.percentile(timings, 50):.2f}s, "
+          f"p95 {np.percentile(timings, 95):.2f}s over {len(timings)} plots")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", default=os.path.join("tracks", "tracks_10k_all.ini"))
+    parser.add_argument("--regions", nargs="+", default=DEFAULT_REGIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    output_file = os.path.join(tempfile.mkdtemp(), "benchmark_track.png")
+    regions = args.regions * args.repeat
+
+    cli_timings = []
+    for region in regions:
+        query_start = time.perf_counter()
+        subprocess.run(["pyGenomeTracks", "--tracks", args.tracks, "--region", region, "-o", output_file],
+                       check=True, capture_output=True)
+        cli_timings.append(time.perf_counter() - query_start)
+    summarize("pyGenomeTracks CLI", cli_timings)
+
+    load_start = time.perf_counter()
+    resident = trackRenderer.load_tracks(args.tracks)
+    print(f"resident tracks loaded once in {time.perf_counter() - load_start:.2f}s")
+
+    inprocess_timings = []
+    for region in regions:
+        chrom, start, end = parse_region(region)
+        query_start = time.perf_counter()
+        trackRenderer.render_tracks(resident, resident.track_obj_list, chrom, start, end)
+        inprocess_timings.append(time.perf_counter() - query_start)
+    summarize("in-process", inprocess_timings)
+
+    print(f"speed-up per plot: {np.mean(cli_timings) / np.mean(inprocess_timings):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Signal stage latency: the five bigWig tracks read one after another on
+shared handles against the worker pool of signalTracks, and against the
+precomputed signal pyramids if buildData.py has built them.
+Run from the repository root once the bigwigs are provisioned (bigwigStore.py):
+
+    python benchmarks/signalBenchmark.py
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import numpy as np
+import pyBigWig
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bigwigStore
+import signalTracks
+import trackRenderer
+
+DEFAULT_REGIONS = ["chr12:24700000-26000000", "chr7:50000000-51000000", "chr9:21500000-22500000", "chr1:44000000-45000000"]
+
+
+def parse_region(region):
+    chrom, span = region.split(":")
+    start, end = span.replace(",", "").split("-")
+    return chrom, int(start), int(end)
+
+
+def summarize(name, timings):
+    timings = np.asarray(timings) * 1000
+    print(f"{name}: mean {timings.mean():.1f}ms, p50 {np.percentile(timings, 50):.1f}ms, "
+          f"p95 {np.percentile(timings, 95):.1f}ms over {len(timings)} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bigwigs", nargs="+", default=sorted(glob.glob(os.path.join("cached_bigwigs", "sha256", "*.bigWig"))))
+    parser.add_argument("--regions", nargs="+", default=DEFAULT_REGIONS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bigwig_paths = {os.path.basename(path): path for path in args.bigwigs}
+    regions = [parse_region(region) for region in args.regions] * args.repeat
+    n_bins = trackRenderer.plot_width_pixels()
+
+    handles = {key: pyBigWig.open(path) for key, path in bigwig_paths.items()}
+    sequential_timings = []
+    for chrom, start, end in regions:
+        query_start = time.perf_counter()
+        for key in bigwig_paths:
+            signalTracks.binned_signal(handles[key], chrom, start, end, n_bins)
+        sequential_timings.append(time.perf_counter() - query_start)
+    summarize("sequential", sequential_timings)
+
+    pool = signalTracks.start_signal_pool(len(bigwig_paths))
+    # first query starts the workers and opens their handles
+    signalTracks.fetch_signals(pool, bigwig_paths, *regions[0], n_bins)
+    pool_timings = []
+    for chrom, start, end in regions:
+        query_start = time.perf_counter()
+        signalTracks.fetch_signals(pool, bigwig_paths, chrom, start, end, n_bins)
+        pool_timings.append(time.perf_counter() - query_start)
+    summarize("worker pool", pool_timings)
+    pool.shutdown()
+
+    pyramids = signalTracks.load_signal_pyramids(bigwigStore.read_manifest())
+    if pyramids:
+        pyramid_timings = []
+        for chrom, start, end in regions:
+            query_start = time.perf_counter()
+            for pyramid in pyramids.values():
+                signalTracks.pyramid_signal(pyramid, chrom, start, end, n_bins)
+            pyramid_timings.append(time.perf_counter() - query_start)
+        summarize(f"signal pyramids ({len(pyramids)} tracks)", pyramid_timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Per-stage latency of headless gene queries (lookup, tracks, signal, draw)
+through the same queryMetrics spans the app records. Save a run with --save
+and compare a later release against it with --baseline; stages whose p50 or
+p95 grew by more than --tolerance are reported and fail the run.
+Run from the repository root:
+
+    python benchmarks/stageBenchmark.py --save stages_before.json
+    python benchmarks/stageBenchmark.py --baseline stages_before.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import batchQuery
+import bigwigStore
+import geneView
+import loopIndex
+import queryMetrics
+import signalTracks
+import trackRenderer
+
+DEFAULT_GENES = ["KRAS", "ETV6", "RUNX1", "PAX5", "IKZF1", "CDKN2A", "MYC", "ARMH1"]
+
+
+@queryMetrics.timed_request("gene")
+def gene_query(loops, gene_table, gene, gene_annotation, gene_view, signal_tracks):
+    with queryMetrics.span("lookup"):
+        table = batchQuery.gene_cre_table(loops, [gene], gene_table=gene_table)
+    queryMetrics.observe("query_result_size", len(table), kind="rows")
+    if table.empty:
+        return
+    with queryMetrics.span("render"):
+        track_image = geneView.render_gene_view(table, gene, gene_annotation, gene_view, signal_tracks)
+    queryMetrics.observe("query_result_size", len(track_image), kind="image_bytes")
+
+
+def regressions(current, baseline, tolerance):
+    """(metric, stage, statistic, before, after) of every stage slower than baseline by more than tolerance."""
+    before = {row["stage"]: row for row in baseline if row["metric"] == "query_stage_seconds"}
+    slower = []
+    for row in current:
+        if row["metric"] != "query_stage_seconds":
+            continue
+        old = before.get(row["stage"])
+        for statistic in ["p50", "p95"]:
+            if old is not None and row[statistic] > old[statistic] * (1 + tolerance):
+                slower.append((row["metric"], row["stage"], statistic, old[statistic], row[statistic]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--genes", nargs="+", default=DEFAULT_GENES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write the stage summary of this run to a JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative growth of p50/p95")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    loops = loopIndex.load_loops(batchQuery.all_loops_path, batchQuery.loop_store_path)
+    gene_table = loopIndex.build_gene_table(loops)
+    gene_annotation = geneView.build_gene_annotation(pd.read_csv(batchQuery.coding_genes_path, sep="\t"))
+    gene_view_path = os.path.join(batchQuery.TRACKS_DIR, "tracks_gene.ini")
+    if trackRenderer.tracks_indexed(gene_view_path):
+        gene_view = lambda chrom, start, end: trackRenderer.load_window_tracks(gene_view_path, chrom, start, end)
+    else:
+        resident = trackRenderer.load_tracks(gene_view_path)
+        gene_view = lambda chrom, start, end: resident
+
+    pyramids = signalTracks.load_signal_pyramids(bigwigStore.read_manifest())
+    bigwig_paths = {} if len(pyramids) == len(signalTracks.SIGNAL_TRACKS) else signalTracks.fetch_bigwigs()
+    pool = signalTracks.start_signal_pool()
+
+    def signal_tracks(chrom, start, end, dpi):
+        n_bins = trackRenderer.plot_width_pixels(dpi)
+        signals = {key: signalTracks.pyramid_signal(pyramid, chrom, start, end, n_bins) for key, pyramid in pyramids.items()}
+        missing = {key: path for key, path in bigwig_paths.items() if key not in pyramids}
+        if missing:
+            signals.update(signalTracks.fetch_signals(pool, missing, chrom, start, end, n_bins))
+        return [trackRenderer.signal_track(title, color, max_val, *signals[key])
+                for key, title, color, max_val in signalTracks.SIGNAL_TRACKS]
+
+    # first query warms up the worker pool and the track parsers
+    gene_query(loops, gene_table, args.genes[0], gene_annotation, gene_view, signal_tracks)
+    queryMetrics.reset()
+    for __ in range(args.repeat):
+        for gene in args.genes:
+            gene_query(loops, gene_table, gene, gene_annotation, gene_view, signal_tracks)
+    pool.shutdown()
+
+    current = queryMetrics.summary()
+    print(pd.DataFrame(current).to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(current, json.load(f), args.tolerance)
+        for metric, stage, statistic, before, after in slower:
+            print(f"REGRESSION {stage} {statistic}: {before:.4f}s -> {after:.4f}s")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Provisioning of the epigenomic bigWigs listed in data/bigwig_manifest.json
+(track key, download sources, and the size and sha256 once pinned) into a
+content-addressed local store. Downloads run in parallel, resume from their
+partial file and only become visible by an atomic rename after they were
+verified. The app, its render processes and the API server can share one
+store: a key is provisioned by one process at a time, under a lock file.
+With BIGWIG_OFFLINE=1 nothing is downloaded and every track must already
+be in the store or in a pre-seeded directory (BIGWIG_SEED_DIR).
+Provision ahead of time, or pin the manifest to the files in the store, with:
+
+    python bigwigStore.py [--offline] [--seed-dir DIR] [--pin]
+"""
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyBigWig
+import requests
+
+# -------------------- Configuration --------------------
+
+MANIFEST_PATH = os.path.join(os.getcwd(), "data", "bigwig_manifest.json")
+STORE_DIR = "cached_bigwigs"
+
+# directory of bigwigs named as in their sources (or <key>.bigWig) used before downloading
+SEED_DIR = os.environ.get("BIGWIG_SEED_DIR")
+# never download, every track has to be in the store or the seed directory
+OFFLINE = os.environ.get("BIGWIG_OFFLINE", "") == "1"
+
+DOWNLOAD_WORKERS = 5
+DOWNLOAD_TIMEOUT = 60
+CHUNK_SIZE = 8 * 2**20
+
+# background downloads of the app, started once by start_provisioning
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# -------------------- Manifest --------------------
+
+def read_manifest(path=MANIFEST_PATH):
+    """Manifest entries: {"key", "sources", "size", "sha256"}, size and sha256 null until pinned."""
+    with open(path) as f:
+        return json.load(f)["tracks"]
+
+
+def write_json(path, data):
+    """Write data as JSON through a temporary file, so readers never see half of it."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(temp_path, path)
+
+
+def pin_manifest(paths, path=MANIFEST_PATH):
+    """Record the size and sha256 of the provisioned file of every track in the manifest."""
+    with open(path) as f:
+        manifest = json.load(f)
+    for entry in manifest["tracks"]:
+        if entry["key"] in paths:
+            # objects are named by their sha256
+            stored = paths[entry["key"]]
+            entry["size"], entry["sha256"] = os.path.getsize(stored), os.path.basename(stored).split(".")[0]
+    write_json(path, manifest)
+
+
+# -------------------- Store --------------------
+
+def object_path(digest):
+    return os.path.join(STORE_DIR, "sha256", f"{digest}.bigWig")
+
+
+def ref_path(key):
+    return os.path.join(STORE_DIR, "refs", f"{key}.json")
+
+
+def partial_path(key, source):
+    # one partial file per source, a resume never mixes bytes of two servers;
+    # only written under the lock of key, so every process resumes the same file
+    return os.path.join(STORE_DIR, "partial", f"{key}.{hashlib.sha1(source.encode()).hexdigest()[:12]}.part")
+
+
+@contextlib.contextmanager
+def key_lock(key):
+    """Hold the lock file of key, so one thread or process at a time imports or downloads it."""
+    path = os.path.join(STORE_DIR, "locks", f"{key}.lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # flock is per open file, threads of one process exclude each other too
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_ref(key):
+    try:
+        with open(ref_path(key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def readable_bigwig(path):
+    """
+    Cheap check for files the manifest does not pin yet: the header opens and
+    the zoom levels near the end of the file can be read, which a truncated
+    download fails.
+    """
+    try:
+        bw = pyBigWig.open(path)
+    except RuntimeError:
+        return False
+    if bw is None:
+        return False
+    try:
+        chroms = bw.chroms()
+        if not bw.isBigWig() or not chroms:
+            return False
+        chrom, size = list(chroms.items())[-1]
+        bw.stats(chrom, 0, size, type="max")
+        return True
+    except RuntimeError:
+        return False
+    finally:
+        bw.close()
+
+
+def verify(entry, path):
+    """sha256 of path, if it matches the size and hash pinned for entry. Raises ValueError otherwise."""
+    size = os.path.getsize(path)
+    if entry.get("size") is not None and size != entry["size"]:
+        raise ValueError(f"{entry['key']}: {path} has {size} bytes, the manifest pins {entry['size']}")
+    digest = file_digest(path)
+    if entry.get("sha256") is not None and digest != entry["sha256"]:
+        raise ValueError(f"{entry['key']}: sha256 of {path} does not match the manifest")
+    if entry.get("sha256") is None and not readable_bigwig(path):
+        raise ValueError(f"{entry['key']}: {path} is not a complete bigWig")
+    return digest
+
+
+def expected_digest(entry):
+    """sha256 the bigWig of entry has: pinned in the manifest, else that of its stored object, else None."""
+    if entry.get("sha256") is not None:
+        return entry["sha256"]
+    ref = read_ref(entry["key"])
+    if ref is not None and ref.get("sources") == entry["sources"]:
+        return ref["sha256"]
+    return None
+
+
+def resolve(entry):
+    """Path of the stored object of entry, or None if it has not been provisioned."""
+    digest = expected_digest(entry)
+    if digest is None:
+        return None
+    path = object_path(digest)
+    if not os.path.exists(path):
+        return None
+    if entry.get("size") is not None and os.path.getsize(path) != entry["size"]:
+        return None
+    return path
+
+
+def commit(entry, temp_path, digest):
+    """Atomically move a verified file into the store and point the key of entry at it."""
+    path = object_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.makedirs(os.path.dirname(ref_path(entry["key"])), exist_ok=True)
+    os.replace(temp_path, path)
+    write_json(ref_path(entry["key"]), {
+        "sha256": digest, "size": os.path.getsize(path), "sources": entry["sources"], "stored": time.time(),
+    })
+    return path
+
+
+# -------------------- Provisioning --------------------
+
+def seed_candidates(entry, seed_dir):
+    names = [os.path.basename(source) for source in entry["sources"]] + [f"{entry['key']}.bigWig"]
+    # STORE_DIR itself holds the files of the old flat cache layout
+    dirs = [directory for directory in (seed_dir, STORE_DIR) if directory]
+    return [os.path.join(directory, name) for directory in dirs for name in dict.fromkeys(names)]
+
+
+def import_seed(entry, seed_dir):
+    """Copy (or hard link) a matching pre-seeded file into the store. Returns its path or None."""
+    for candidate in seed_candidates(entry, seed_dir):
+        if not os.path.isfile(candidate):
+            continue
+        try:
+            digest = verify(entry, candidate)
+        except ValueError:
+            continue
+        temp_path = os.path.join(STORE_DIR, "partial", f"{entry['key']}.{os.getpid()}.seed")
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(candidate, temp_path)
+        except OSError:
+            shutil.copyfile(candidate, temp_path)
+        return commit(entry, temp_path, digest)
+    return None
+
+
+def response_size(r):
+    """Size of the whole file a download response is part of, None if the server does not say."""
+    content_range = r.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    if r.status_code == 200 and r.headers.get("Content-Length") and not r.headers.get("Content-Encoding"):
+        return int(r.headers["Content-Length"])
+    return None
+
+
+def download(entry, source):
+    """Fetch source into its partial file, resuming where an earlier attempt stopped."""
+    temp_path = partial_path(entry["key"], source)
+    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+    have = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+    if entry.get("size") is not None and have > entry["size"]:
+        os.remove(temp_path)
+        have = 0
+
+    headers = {"Range": f"bytes={have}-"} if have else {}
+    with requests.get(source, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        total = response_size(r)
+        # 416: nothing left to send, the partial file is already complete
+        if r.status_code != 416:
+            r.raise_for_status()
+            # a server without range support starts over from the first byte
+            mode = "ab" if r.status_code == 206 else "wb"
+            with open(temp_path, mode) as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+
+    # a dropped connection raises above and keeps the partial file for the next
+    # attempt, a finished download that does not verify is corrupt and starts over
+    size = os.path.getsize(temp_path)
+    if total is not None and size < total:
+        raise requests.RequestException(f"{entry['key']}: connection closed after {size} of {total} bytes")
+    try:
+        # an unpinned entry is at least checked against the size the server sent
+        digest = verify(entry if entry.get("size") is not None or total is None else {**entry, "size": total}, temp_path)
+    except ValueError:
+        os.remove(temp_path)
+        raise
+    return commit(entry, temp_path, digest)
+
+
+def provision(entry, offline=OFFLINE, seed_dir=SEED_DIR):
+    """Local path of the bigWig of entry: from the store, the seed directory or its sources, in that order."""
+    path = resolve(entry)
+    if path is not None:
+        return path
+    # processes provisioning the same key wait for the first and then find it in the store
+    with key_lock(entry["key"]):
+        path = resolve(entry) or import_seed(entry, seed_dir)
+        if path is not None:
+            return path
+        if offline:
+            raise FileNotFoundError(f"{entry['key']}: not in {STORE_DIR} or the seed directory, and downloads are off")
+        errors = []
+        for source in entry["sources"]:
+            try:
+                return download(entry, source)
+            except (requests.RequestException, ValueError) as e:
+                errors.append(f"{source}: {e}")
+        raise OSError(f"{entry['key']}: every source failed\n" + "\n".join(errors))
+
+
+def provision_all(manifest, offline=OFFLINE, seed_dir=SEED_DIR, workers=DOWNLOAD_WORKERS):
+    """{key: local path} of every manifest entry, provisioned in parallel."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {entry["key"]: executor.submit(provision, entry, offline, seed_dir) for entry in manifest}
+        return {key: future.result() for key, future in futures.items()}
+
+
+def start_provisioning(manifest, offline=OFFLINE, seed_dir=SEED_DIR):
+    """Provision every entry in the background. Returns {key: future of its local path} right away."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="bigwig-provision")
+    return {entry["key"]: _executor.submit(provision, entry, offline, seed_dir) for entry in manifest}
+
+
+# -------------------- Command line --------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--offline", action="store_true", default=OFFLINE, help="only use the store and the seed directory")
+    parser.add_argument("--seed-dir", default=SEED_DIR)
+    parser.add_argument("--pin", action="store_true", help="write the size and sha256 of the provisioned files into the manifest")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = provision_all(read_manifest(args.manifest), args.offline, args.seed_dir)
+    for key, path in paths.items():
+        print(f"{key}: {path}")
+    print(f"{len(paths)} tracks provisioned in {time.perf_counter() - start:.1f}s")
+    if args.pin:
+        pin_manifest(paths, args.manifest)
+        print(f"pinned -> {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Offline build of the lookup files the app loads at startup and of the
+tabix indexed copies of the track files. Run from the repository root after
+updating data/concat_loops_v2.tab or anything under tracks/:
+
+    python buildData.py
+"""
+
+import argparse
+import functools
+import glob
+import os
+import tempfile
+import time
+import pysam
+import loopIndex
+import overviewView
+import signalTracks
+import trackRenderer
+
+# -------------------- Configuration --------------------
+
+DATA_DIR = os.path.join(os.getcwd(), "data")
+TRACKS_DIR = os.path.join(os.getcwd(), "tracks")
+
+all_loops_path = os.path.join(DATA_DIR, "concat_loops_v2.tab")
+
+
+
+
+@functools.lru_cache(maxsize=None)
+def loop_table():
+    return loopIndex.read_loop_table(all_loops_path)
+
+
+# -------------------- Build steps --------------------
+
+def build_loop_store():
+    loops = loop_table()
+    store_path = os.path.join(DATA_DIR, "loops_store")
+    loopIndex.save_loop_store(loops, store_path)
+    print(f"loop store: {len(loops)} loops -> {store_path}")
+
+
+def build_gene_index():
+    # the merged 10k union is indexed as a source of its own, so it is stored next to the index
+    loops = loop_table()
+    union_path = os.path.join(DATA_DIR, "loop_union.npz")
+    union = loopIndex.build_loop_union(loops)
+    loopIndex.save_loop_union(union, union_path)
+    print(f"merged 10k union: {len(union['rows'])} distinct loops of {len(union['sources'])} sources -> {union_path}")
+    index_path = os.path.join(DATA_DIR, "gene_index.npz")
+    index = loopIndex.build_gene_index(loops, union=union)
+    loopIndex.save_gene_index(index, index_path)
+    print(f"gene index: {len(index['keys'])} keys -> {index_path}")
+
+
+def build_overview():
+    loops = loop_table()
+    overview_path = os.path.join(DATA_DIR, "overview_aggregates.npz")
+    # merged 10k is aggregated from the same union its queries read
+    aggregates = overviewView.build_overview(loops, loopIndex.build_gene_table(loops), loopIndex.build_loop_union(loops),
+                                             overviewView.read_chrom_sizes(os.path.join(DATA_DIR, "hg38.chrom.sizes")))
+    overviewView.save_overview(aggregates, overview_path)
+    print(f"overview: {len(aggregates) - 1} loop set/chromosome aggregates of {overviewView.OVERVIEW_BIN} bp bins -> {overview_path}")
+
+
+def sorted_track_lines(path, is_links):
+    """
+    Data lines of a track file sorted by chromosome and start, headers dropped.
+    Links get their left anchor first, so columns 2 and 6 span the whole arc.
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 3 or not fields[1].isdigit():
+                continue
+            if is_links and fields[0] == fields[3] and int(fields[4]) < int(fields[1]):
+                fields[0:3], fields[3:6] = fields[3:6], fields[0:3]
+            records.append((fields[0], int(fields[1]), "\t".join(fields)))
+    records.sort(key=lambda record: (record[0], record[1]))
+    return [line for __, __, line in records]
+
+
+def build_track_index():
+    # every file the .ini files read, where PlotTracks finds it (promoters.bed is in the repository root)
+    track_files = {}
+    ini_paths = sorted(glob.glob(os.path.join(TRACKS_DIR, "*.ini")))
+    for ini_path in ini_paths:
+        track_files.update(trackRenderer.window_track_files(ini_path))
+    for path, is_links in track_files.items():
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", dir=os.path.dirname(path) or ".", delete=False) as sorted_file:
+            sorted_file.writelines(f"{line}\n" for line in sorted_track_lines(path, is_links))
+        try:
+            pysam.tabix_compress(sorted_file.name, f"{path}.gz", force=True)
+        finally:
+            os.remove(sorted_file.name)
+        # links are indexed on start1..end2, beds on start..end
+        pysam.tabix_index(f"{path}.gz", seq_col=0, start_col=1, end_col=5 if is_links else 2,
+                          zerobased=True, force=True)
+        print(f"track index: {path}.gz")
+    not_indexed = [ini_path for ini_path in ini_paths if not trackRenderer.tracks_indexed(ini_path)]
+    if not_indexed:
+        raise RuntimeError(f"track files of {', '.join(not_indexed)} still have no up to date index")
+
+
+def build_signal_pyramids():
+    # provisions the bigwigs first, downloading them if they are not in the store yet
+    bigwig_paths = signalTracks.fetch_bigwigs()
+    for key, path in bigwig_paths.items():
+        pyramid_dir = os.path.join(signalTracks.PYRAMID_DIR, key)
+        signalTracks.build_signal_pyramid(path, pyramid_dir)
+        print(f"signal pyramid: {key} {signalTracks.PYRAMID_LEVELS} bp -> {pyramid_dir}")
+
+
+# the gene index holds row positions, so it is built after the store it points into
+BUILD_STEPS = {
+    "loop_store": build_loop_store,
+    "gene_index": build_gene_index,
+    "overview": build_overview,
+    "track_index": build_track_index,
+    "signal_pyramids": build_signal_pyramids,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed lookup files in data/")
+    parser.add_argument("--only", nargs="+", choices=list(BUILD_STEPS), help="run only these steps")
+    args = parser.parse_args()
+
+    for name in args.only or BUILD_STEPS:
+        step_start = time.perf_counter()
+        BUILD_STEPS[name]()
+        print(f"{name} done in {time.perf_counter() - step_start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Subtype comparison: the loops of a gene or region in all eight subtypes,
+pulled in one pass over the loop indexes, tabulated with a per-subtype
+presence matrix and drawn as stacked per-subtype arc tracks in one figure.
+Needs no streamlit, like geneView.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import geneView
+import loopIndex
+import queryMetrics
+import trackRenderer
+
+# -------------------- Configuration --------------------
+
+SUBTYPES = list(loopIndex.SUBTYPE_LABELS.values())
+
+# arc colour of every subtype, in SUBTYPES order
+SUBTYPE_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#17becf"]
+
+LINK_COLUMNS = ['chr', 'start', 'end', 'interChr', 'interStart', 'interEnd']
+
+
+# -------------------- Tables --------------------
+
+def subtype_rows(rows_by_source):
+    """Row positions of all subtypes concatenated, with the subtype label of every row."""
+    rows = [rows_by_source[source] for source in loopIndex.SUBTYPE_SOURCES.values()]
+    labels = np.repeat(SUBTYPES, [len(source_rows) for source_rows in rows])
+    return np.concatenate(rows).astype(np.int64), labels
+
+
+def compare_gene(loops, gene_index, gene, tx):
+    """
+    Enhancer links of gene in every subtype, as geneAnalyzer lays them out
+    (chr/start/end is the promoter side) plus a subtype column.
+    """
+    rows, labels = subtype_rows(loopIndex.gene_rows_by_source(
+        gene_index, list(loopIndex.SUBTYPE_SOURCES.values()), tx, gene))
+    hits = loops.iloc[rows]
+    return pd.DataFrame({
+        'chr': hits.iloc[:, 3].to_numpy(), 'start': hits.iloc[:, 4].to_numpy(), 'end': hits.iloc[:, 5].to_numpy(),
+        'interChr': hits.iloc[:, 0].to_numpy(), 'interStart': hits.iloc[:, 1].to_numpy(), 'interEnd': hits.iloc[:, 2].to_numpy(),
+        'target': gene, 'subtype': labels,
+    }).drop_duplicates(ignore_index=True)
+
+
+def compare_region(loops, region_index, gene_table, chrom, start, end, cre_index):
+    """
+    CRE loops of chrom:start-end with target genes in every subtype, as
+    locAnalyzer selects them, with their subtype and ", " joined targets.
+    """
+    annot_index = 7 - cre_index
+    tx = "allTX" if cre_index == 0 else "canonTX"
+    rows, labels = subtype_rows(loopIndex.region_rows_by_source(
+        region_index, list(loopIndex.SUBTYPE_SOURCES.values()), chrom, start, end))
+
+    links = loops.iloc[rows, [0, 1, 2, 3, 4, 5, annot_index]].set_axis([*LINK_COLUMNS, 'type'], axis=1).reset_index(drop=True)
+    links['loop_id'] = rows
+    links['subtype'] = labels
+    targets = loopIndex.loop_genes(gene_table, tx, rows)[['loop_id', 'gene']].astype({'gene': str})
+    targets = targets.sort_values('gene', kind="mergesort").groupby('loop_id', sort=False)['gene'].agg(", ".join)
+
+    links = links[(links['type'] == "CRE") & links['loop_id'].isin(targets.index)]
+    return links[[*LINK_COLUMNS, 'subtype']].assign(
+        target=links['loop_id'].map(targets).to_numpy()
+    ).drop_duplicates(ignore_index=True)
+
+
+def presence_matrix(table, anchor_cols):
+    """CRE (anchor_cols, as "chrN:start-end") by subtype table of whether it has a loop in that subtype."""
+    cre = "chr" + table[anchor_cols[0]].astype(str) + ":" + table[anchor_cols[1]].astype(str) \
+        + "-" + table[anchor_cols[2]].astype(str)
+    present = pd.DataFrame({'CRE': cre.to_numpy(), 'subtype': table['subtype'].to_numpy(), 'present': True})
+    present = present.drop_duplicates(['CRE', 'subtype'])
+    # keep the CREs in table order and every subtype as a column, even without loops
+    return present.pivot(index='CRE', columns='subtype', values='present') \
+        .reindex(index=cre.drop_duplicates(), columns=SUBTYPES).fillna(False).astype(bool)
+
+
+# -------------------- Functions --------------------
+
+def subtype_link_tracks(table):
+    """One arc track per subtype, in SUBTYPES order, empty for subtypes without links."""
+    return [
+        geneView.links_track(table[table['subtype'] == subtype], subtype, line_width=2.0, color=color, height=2.5)
+        for subtype, color in zip(SUBTYPES, SUBTYPE_COLORS)
+    ]
+
+
+def timed_signal(signal_tracks, chrom, start, end):
+    with queryMetrics.span("signal"):
+        return signal_tracks(chrom, start, end, geneView.GENE_VIEW_DPI)
+
+
+def render_compare_view(table, annotation, gene_view_tracks_of, signal_tracks, gene_of_interest=None, image_format="png"):
+    """
+    Encoded image of the stacked subtype arcs of table (from compare_gene or
+    compare_region) over the gene models, promoters and epigenomic signal.
+    gene_view_tracks_of and signal_tracks are as in geneView.render_gene_view.
+    """
+    chrom, start, end = geneView.gene_region(table)
+    # the signal is read on the worker pool while the subtype tracks are built here,
+    # in this query's context so its span is recorded for the same analyzer
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        signal_future = executor.submit(contextvars.copy_context().run, timed_signal, signal_tracks, chrom, start, end)
+        with queryMetrics.span("tracks"):
+            gene_view = gene_view_tracks_of(chrom, start, end)
+            x_axis, promoters = gene_view.track_obj_list
+            track_objs = [
+                x_axis,
+                *subtype_link_tracks(table),
+                *geneView.gene_model_tracks(annotation, chrom, start, end, gene_of_interest),
+                promoters,
+            ]
+        track_objs.extend(signal_future.result())
+    return trackRenderer.render_tracks(
+        gene_view, track_objs, chrom, start, end, dpi=geneView.GENE_VIEW_DPI, image_format=image_format
+    )
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Gene view plot: enhancer links of one gene over the gene models, promoters
+and epigenomic signal. Needs no streamlit, so the app and the batch CLI
+(batchQuery.py) draw it the same way. Per-query tracks are built in memory,
+nothing is written to disk.
+"""
+
+import numpy as np
+import queryMetrics
+import trackRenderer
+
+# -------------------- Configuration --------------------
+
+GENE_VIEW_DPI = 100
+
+
+# -------------------- Gene annotation --------------------
+
+def build_gene_annotation(coding_genes):
+    """
+    coding_genes prepared once for slicing: per chromosome, genes sorted by
+    start with their BED9 lines (thickStart/thickEnd added), plus the BED6
+    lines of every gene for the target layer.
+    """
+    bed = coding_genes.copy()
+    bed.insert(6, "thickStart", 1000)
+    bed.insert(7, "thickEnd", 2000)
+    chroms = bed.iloc[:, 0].astype(str).to_numpy()
+    starts = bed.iloc[:, 1].to_numpy(np.int64)
+    ends = bed.iloc[:, 2].to_numpy(np.int64)
+    genes = bed.iloc[:, 3].astype(str).to_numpy()
+    bed9_lines = np.array(bed.to_csv(sep="\t", index=False, header=False).splitlines(), dtype=object)
+    bed6_lines = coding_genes.iloc[:, :6].to_csv(sep="\t", index=False, header=False).splitlines()
+
+    by_chrom = {}
+    for chrom in dict.fromkeys(chroms):
+        rows = np.flatnonzero(chroms == chrom)
+        rows = rows[np.argsort(starts[rows], kind="stable")]
+        by_chrom[chrom] = {
+            "starts": starts[rows],
+            "ends": ends[rows],
+            "genes": genes[rows],
+            "lines": bed9_lines[rows],
+            # lets a window search start far enough left to catch long genes
+            "max_length": int((ends[rows] - starts[rows]).max()),
+        }
+    by_gene = {}
+    for gene, line in zip(genes, bed6_lines):
+        by_gene.setdefault(gene, []).append(line)
+    return {"by_chrom": by_chrom, "by_gene": by_gene}
+
+
+def genes_in_window(annotation, chrom, start, end):
+    """Genes overlapping chrom:start-end as (gene names, BED9 lines), in start order."""
+    entry = annotation["by_chrom"].get(str(chrom).removeprefix("chr"))
+    if entry is None:
+        return np.empty(0, dtype=object), np.empty(0, dtype=object)
+    lo = np.searchsorted(entry["starts"], start - entry["max_length"], side="left")
+    hi = np.searchsorted(entry["starts"], end, side="left")
+    overlapping = lo + np.flatnonzero(entry["ends"][lo:hi] > start)
+    return entry["genes"][overlapping], entry["lines"][overlapping]
+
+
+# -------------------- Functions --------------------
+
+def gene_region(myDf):
+    """Plotted chrom, start, end around the enhancer links of myDf."""
+    extended_min_start, extended_max_end = trackRenderer.get_genomic_range(myDf)
+    return f"chr{myDf.iloc[0, 0]}", int(extended_min_start), int(extended_max_end)
+
+
+def links_track(myDf, title, **properties):
+    """Links track of the anchor pairs of a links frame (chr/start/end, interChr/interStart/interEnd)."""
+    links = list(zip(
+        myDf['chr'].astype(str), myDf['start'].astype(int), myDf['end'].astype(int),
+        myDf['interChr'].astype(str), myDf['interStart'].astype(int), myDf['interEnd'].astype(int),
+        [1.0] * len(myDf),
+    ))
+    return trackRenderer.LinksFrameTrack(trackRenderer.memory_track_properties(
+        trackRenderer.LinksFrameTrack.TRACK_TYPE, title, **properties,
+    ), links)
+
+
+def gene_model_tracks(annotation, chrom, start, end, gene_of_interest=None):
+    """Gene models of the window, with gene_of_interest (if given) in its own layer on top."""
+    tracks = []
+    if gene_of_interest is not None:
+        # target gene, drawn in its own red layer above the other genes
+        tracks.append(trackRenderer.BedTextTrack(trackRenderer.memory_track_properties(
+            trackRenderer.BedTextTrack.TRACK_TYPE, "",
+            color="red", height=2.0, fontsize=12.0, arrow_interval=5, gene_rows=1,
+        ), "".join(f"{line}\n" for line in annotation["by_gene"].get(gene_of_interest, []))))
+
+    # genes in the plotted window only
+    genes, lines = genes_in_window(annotation, chrom, start, end)
+    tracks.append(trackRenderer.BedTextTrack(trackRenderer.memory_track_properties(
+        trackRenderer.BedTextTrack.TRACK_TYPE, "Genes",
+        color="red", height=2.0, max_labels=20, fontsize=12.0, arrow_interval=5,
+    ), "".join(f"{line}\n" for line in lines[genes != gene_of_interest])))
+    return tracks
+
+
+def gene_view_tracks(myDf, gene_of_interest, annotation, chrom, start, end):
+    """Enhancer links, target gene and other gene model tracks of one query."""
+    enhancer_links = links_track(myDf, "Enhancer Links", line_width=3.0, color="red", height=5.0)
+    return [enhancer_links, *gene_model_tracks(annotation, chrom, start, end, gene_of_interest)]
+
+
+def render_gene_view(myDf, gene_of_interest, annotation, gene_view_tracks_of, signal_tracks, image_format="png"):
+    """
+    Encoded gene view image. annotation comes from build_gene_annotation,
+    gene_view_tracks_of(chrom, start, end) returns tracks_gene.ini (x-axis,
+    promoters) loaded for the region and signal_tracks(chrom, start, end, dpi)
+    the epigenomic track objects of the region.
+    """
+    chrom, start, end = gene_region(myDf)
+    # x-axis and promoters come from the .ini, the rest is built for this query only
+    with queryMetrics.span("tracks"):
+        gene_view = gene_view_tracks_of(chrom, start, end)
+        x_axis, promoters = gene_view.track_obj_list
+        query_tracks = gene_view_tracks(myDf, gene_of_interest, annotation, chrom, start, end)
+    with queryMetrics.span("signal"):
+        signal = signal_tracks(chrom, start, end, GENE_VIEW_DPI)
+    return trackRenderer.render_tracks(
+        gene_view,
+        [x_axis, *query_tracks, promoters, *signal],
+        chrom, start, end, dpi=GENE_VIEW_DPI, image_format=image_format
+    )
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Lookup structures over the concatenated loop table (concat_loops_v2.tab).
+Everything in here is plain pandas/numpy so it can be used without streamlit.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# -------------------- Configuration --------------------
+
+# coordinate columns of concat_loops_v2.tab, everything else is stored as categorical
+INT_COLS = [1, 2, 4, 5]
+# coordinates and row positions fit in 32 bits (largest chromosome ~249 Mb)
+COORD_DTYPE = np.int32
+ROW_DTYPE = np.int32
+
+# bump when the layout of the loop store changes, older stores are rebuilt from the .tab
+LOOP_STORE_VERSION = 2
+# same for the gene index file
+GENE_INDEX_VERSION = 2
+
+# index key of the distinct loops of every 10k source, what the merged 10k map reads
+UNION_10K = "union_10k"
+
+# target gene columns of concat_loops_v2.tab per promoter set
+TX_GENE_COLS = {"allTX": 9, "canonTX": 8}
+
+# loopSource of each subtype choice of the app, 0 is the merged map
+SUBTYPE_SOURCES = {
+    1: "HeH_10k",
+    2: "ER_10k",
+    3: "BA_10k",
+    4: "DUX4r_10k",
+    5: "TP_10k",
+    6: "KMT2Ar_10k",
+    7: "iAMP_10k",
+    8: "nearHaploid_10k",
+}
+
+
+# subtype names in the order of SUBTYPE_SOURCES, as used by the track files
+SUBTYPE_LABELS = {
+    1: "HeH",
+    2: "ER",
+    3: "BA",
+    4: "DUX4r",
+    5: "TP",
+    6: "KMT2Ar",
+    7: "iAMP21",
+    8: "nearHaploid",
+}
+
+
+def query_sources(loop_sources, subChoice, res):
+    """loopSource values read for a subtype choice, the merged 10k map spans every 10k source."""
+    if subChoice != 0:
+        return [SUBTYPE_SOURCES[subChoice]]
+    if res == "10k":
+        return [source for source in loop_sources if source != "merged_1k"]
+    return [f"merged_{res}"]
+
+
+def index_sources(loop_sources, subChoice, res):
+    """Index keys a query of subChoice at res reads: UNION_10K for the merged 10k map, else its loopSource."""
+    if subChoice == 0 and res == "10k":
+        return [UNION_10K]
+    return query_sources(loop_sources, subChoice, res)
+
+
+# -------------------- Columnar loop store --------------------
+
+def read_loop_table(path):
+    """
+    Parse concat_loops_v2.tab into the typed frame the store holds: int32
+    coordinates, categoricals (int8/int16 codes) for everything else, rows
+    grouped by loopSource in order of first appearance (the order of the
+    concatenated .tab) so every source is one contiguous block.
+    """
+    loops = pd.read_csv(path, sep="\t", header=0)
+    coords = loops.iloc[:, INT_COLS]
+    if len(loops) and (coords.max().max() > np.iinfo(COORD_DTYPE).max or len(loops) > np.iinfo(ROW_DTYPE).max):
+        raise ValueError(f"{path}: coordinates or row count do not fit in {np.dtype(COORD_DTYPE).name}")
+    source_order = pd.factorize(loops['loopSource'])[0]
+    loops = loops.iloc[np.argsort(source_order, kind="stable")].reset_index(drop=True)
+    return pd.DataFrame({
+        name: loops[name].astype(COORD_DTYPE) if i in INT_COLS else loops[name].astype(str).astype("category")
+        for i, name in enumerate(loops.columns)
+    })
+
+
+def save_loop_store(loops, store_dir):
+    """
+    One .npy per column (codes for categoricals) plus meta.json with the
+    column order and category labels. Loaded memory-mapped by load_loop_store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    meta = {"version": LOOP_STORE_VERSION, "columns": [], "rows": len(loops)}
+    for i, name in enumerate(loops.columns):
+        column = loops[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.cat.codes.to_numpy()
+            categories = column.cat.categories.tolist()
+        else:
+            values = column.to_numpy()
+            categories = None
+        np.save(os.path.join(store_dir, f"col{i}.npy"), values)
+        meta["columns"].append({"name": name, "categories": categories})
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def loop_store_is_current(store_dir, tab_path):
+    """True if the store exists, is in the current layout and is not older than the .tab it was built from."""
+    meta_path = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        if json.load(f).get("version") != LOOP_STORE_VERSION:
+            return False
+    # without the .tab a store in the current layout is the only copy of the table
+    if not os.path.exists(tab_path):
+        return True
+    return os.path.getmtime(meta_path) >= os.path.getmtime(tab_path)
+
+
+def load_loops(tab_path, store_dir):
+    """The loop table, memory-mapped from the store if it is current, else parsed from the .tab."""
+    if loop_store_is_current(store_dir, tab_path):
+        return load_loop_store(store_dir)
+    if not os.path.exists(tab_path):
+        raise FileNotFoundError(f"{store_dir} was written in an older layout and {tab_path} to rebuild it from is missing")
+    return read_loop_table(tab_path)
+
+
+def load_loop_store(store_dir):
+    """
+    Memory-mapped, read-only view of a loop store. Pages are shared between
+    all worker processes that load the same store.
+    """
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    for i, column in enumerate(meta["columns"]):
+        values = np.load(os.path.join(store_dir, f"col{i}.npy"), mmap_mode="r")
+        if column["categories"] is not None:
+            values = pd.Categorical.from_codes(values, column["categories"])
+        columns[column["name"]] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+# -------------------- Loop sets --------------------
+
+def source_blocks(loops):
+    """{loopSource: (first row, end row)} of a loop table grouped by loopSource."""
+    codes = loops['loopSource'].cat.codes.to_numpy()
+    categories = loops['loopSource'].cat.categories
+    if len(codes) == 0:
+        return {}
+    edges = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], edges]).astype(np.int64)
+    ends = np.append(edges, len(codes)).astype(np.int64)
+    blocks = {str(categories[codes[lo]]): (int(lo), int(hi)) for lo, hi in zip(starts, ends)}
+    if len(blocks) != len(starts):
+        raise ValueError("loop table is not grouped by loopSource, rebuild it with read_loop_table")
+    return blocks
+
+
+def source_rows(blocks, sources):
+    """
+    Rows of the loops of sources: a slice when their blocks are adjacent (so
+    loops.iloc[...] is a view), else the row positions.
+    """
+    spans = sorted(blocks[source] for source in sources if source in blocks)
+    if not spans:
+        return slice(0, 0)
+    if all(spans[i][1] == spans[i + 1][0] for i in range(len(spans) - 1)):
+        return slice(spans[0][0], spans[-1][1])
+    return np.concatenate([np.arange(lo, hi, dtype=ROW_DTYPE) for lo, hi in spans])
+
+
+def build_loop_union(loops, blocks=None):
+    """
+    Distinct loops (equal in every column but loopSource) of every 10k source,
+    the rows the merged 10k map shows: {"rows": first row of each, in table
+    order, "provenance": uint16 bitmask per row with bit i set if
+    "sources"[i] has that loop, "sources"}.
+    """
+    blocks = blocks or source_blocks(loops)
+    sources = query_sources(list(blocks), 0, "10k")
+    if len(sources) > 16:
+        raise ValueError(f"{len(sources)} 10k loop sources do not fit in a 16 bit provenance mask")
+    rows = np.arange(len(loops), dtype=ROW_DTYPE)[source_rows(blocks, sources)]
+    # bit of the source of every row, rows come block by block in table order
+    row_bits = np.concatenate([np.empty(0, np.uint16)] + [
+        np.full(hi - lo, 1 << bit, dtype=np.uint16) for (lo, hi), bit in sorted((blocks[source], bit) for bit, source in enumerate(sources))
+    ])
+
+    members = loops.iloc[rows].drop(columns='loopSource')
+    values = pd.DataFrame({
+        name: column.cat.codes if isinstance(column.dtype, pd.CategoricalDtype) else column
+        for name, column in members.items()
+    })
+    # group numbers follow first appearance
+    loop_ids = values.groupby(list(values.columns), sort=False).ngroup().to_numpy()
+    first = np.unique(loop_ids, return_index=True)[1]
+    provenance = np.zeros(len(first), dtype=np.uint16)
+    np.bitwise_or.at(provenance, loop_ids, row_bits)
+    return {"rows": rows[first], "provenance": provenance, "sources": np.array(sources, dtype=str)}
+
+
+def save_loop_union(union, path):
+    np.savez(path, **union)
+
+
+def load_loop_union(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def loop_provenance(union, rows):
+    """The 10k loopSources having each of rows (rows of union), one list per row."""
+    masks = union["provenance"][np.searchsorted(union["rows"], rows)]
+    return [[str(source) for bit, source in enumerate(union["sources"]) if mask >> bit & 1] for mask in masks]
+
+
+# -------------------- Gene table --------------------
+
+def build_gene_table(loops):
+    """
+    Long format loop -> target gene table (loop_id, gene, promoter_set), one row
+    per gene of the comma separated gene columns, "no" dropped. loop_id is the
+    row position in loops. Sorted by promoter_set, loop_id, gene.
+    """
+    frames = []
+    for tx, col in TX_GENE_COLS.items():
+        column = loops.iloc[:, col]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(str).astype("category")
+        # split each distinct label once, rows are joined to it by category code
+        label_genes = pd.Series(column.cat.categories).str.split(",").explode().str.strip()
+        label_genes = label_genes[(label_genes != "") & (label_genes != "no")]
+        codes = pd.DataFrame({"code": label_genes.index.to_numpy(), "gene": label_genes.to_numpy()})
+        rows = pd.DataFrame({"loop_id": np.arange(len(loops), dtype=ROW_DTYPE), "code": column.cat.codes.to_numpy()})
+        pairs = rows.merge(codes, on="code")[["loop_id", "gene"]]
+        pairs["promoter_set"] = tx
+        frames.append(pairs)
+
+    genes = pd.concat(frames, ignore_index=True).drop_duplicates()
+    genes["gene"] = genes["gene"].astype("category")
+    genes["promoter_set"] = pd.Categorical(genes["promoter_set"], categories=list(TX_GENE_COLS))
+    return genes.sort_values(["promoter_set", "loop_id", "gene"], kind="mergesort").reset_index(drop=True)
+
+
+def loop_genes(gene_table, promoter_set, loop_ids):
+    """Rows of gene_table for loop_ids, found by binary search on its sort order."""
+    codes = gene_table["promoter_set"].cat.codes.to_numpy()
+    code = gene_table["promoter_set"].cat.categories.get_loc(promoter_set)
+    lo, hi = np.searchsorted(codes, [code, code + 1])
+    block_ids = gene_table["loop_id"].to_numpy()[lo:hi]
+
+    loop_ids = np.unique(np.asarray(loop_ids))
+    starts = np.searchsorted(block_ids, loop_ids, side="left")
+    counts = np.searchsorted(block_ids, loop_ids, side="right") - starts
+    # start + 0..count-1 for every loop, without a python loop
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return gene_table.iloc[lo + positions]
+
+
+# -------------------- Gene index --------------------
+
+def sorted_labels(column):
+    """Sorted distinct labels of a categorical column and every row's position among them."""
+    categories = np.asarray(column.cat.categories, dtype=str)
+    order = np.argsort(categories, kind="stable")
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    return categories[order], positions[column.cat.codes.to_numpy()]
+
+
+def build_gene_index(loops, gene_table=None, union=None):
+    """
+    Inverted index (loopSource, allTX/canonTX, gene) -> row positions in loops,
+    as flat arrays: the sorted labels of each key part ("sources",
+    "promoter_sets", "genes", every gene name stored once), one int64 "keys"
+    entry per key combining their positions, "offsets" of each key's block in
+    "rows". Row positions are sorted, so hits come back in table order.
+    The rows of union (build_loop_union) are indexed as source UNION_10K.
+    """
+    if gene_table is None:
+        gene_table = build_gene_table(loops)
+    if union is None:
+        union = build_loop_union(loops)
+    loop_ids = gene_table["loop_id"].to_numpy()
+    loop_sources, source_ids = sorted_labels(loops['loopSource'])
+    sources = np.sort(np.append(loop_sources, UNION_10K))
+    source_ids = np.searchsorted(sources, loop_sources)[source_ids][loop_ids]
+    promoter_sets, tx_ids = sorted_labels(gene_table["promoter_set"])
+    genes, gene_ids = sorted_labels(gene_table["gene"])
+
+    # gene table rows of the union loops once more, under UNION_10K
+    in_union = np.zeros(len(loops), dtype=bool)
+    in_union[union["rows"]] = True
+    union_pairs = np.flatnonzero(in_union[loop_ids])
+    loop_ids = np.concatenate([loop_ids, loop_ids[union_pairs]])
+    source_ids = np.concatenate([source_ids, np.full(len(union_pairs), np.searchsorted(sources, UNION_10K))])
+    tx_ids = np.concatenate([tx_ids, tx_ids[union_pairs]])
+    gene_ids = np.concatenate([gene_ids, gene_ids[union_pairs]])
+
+    keys = (source_ids * len(promoter_sets) + tx_ids) * len(genes) + gene_ids
+    order = np.lexsort((loop_ids, keys))
+    keys, rows = keys[order], loop_ids[order].astype(ROW_DTYPE)
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = keys[1:] != keys[:-1]
+    return {
+        "version": np.array(GENE_INDEX_VERSION), "sources": sources, "promoter_sets": promoter_sets, "genes": genes,
+        "keys": keys[new_key], "offsets": np.append(np.flatnonzero(new_key), len(keys)).astype(np.int64), "rows": rows,
+    }
+
+
+def save_gene_index(index, path):
+    np.savez_compressed(path, **index)
+
+
+def load_gene_index(path):
+    with np.load(path) as data:
+        if "version" not in data.files or int(data["version"]) != GENE_INDEX_VERSION:
+            raise ValueError(f"{path} is in an older layout, rebuild it with buildData.py")
+        return {name: data[name] for name in data.files}
+
+
+def label_position(labels, label):
+    # position of label in sorted labels, None if it is not one of them
+    i = np.searchsorted(labels, label)
+    return int(i) if i < len(labels) and labels[i] == label else None
+
+
+def gene_rows_by_source(index, sources, tx, gene):
+    """{source: sorted row positions of its loops that target gene} for every source in sources."""
+    hits = {source: np.empty(0, ROW_DTYPE) for source in sources}
+    tx_id, gene_id = label_position(index["promoter_sets"], tx), label_position(index["genes"], gene)
+    if tx_id is None or gene_id is None:
+        return hits
+    for source in sources:
+        source_id = label_position(index["sources"], source)
+        if source_id is None:
+            continue
+        key = (source_id * len(index["promoter_sets"]) + tx_id) * len(index["genes"]) + gene_id
+        i = np.searchsorted(index["keys"], key)
+        if i < len(index["keys"]) and index["keys"][i] == key:
+            # a view into the shared rows array
+            hits[source] = index["rows"][index["offsets"][i]:index["offsets"][i + 1]]
+    return hits
+
+
+def gene_rows(index, sources, tx, gene):
+    """Sorted row positions of loops from any of sources that target gene."""
+    hits = [rows for rows in gene_rows_by_source(index, sources, tx, gene).values() if len(rows)]
+    if not hits:
+        return np.empty(0, ROW_DTYPE)
+    if len(hits) == 1:
+        return hits[0]
+    return np.unique(np.concatenate(hits))
+
+
+# -------------------- Region index --------------------
+
+def build_region_index(loops, union=None):
+    """
+    Spatial index (loopSource, chrom) -> (starts, ends, rows) over both loop anchors,
+    sorted by anchor start so a window is two binary searches away. The rows
+    of union (build_loop_union) are indexed as source UNION_10K.
+    """
+    if union is None:
+        union = build_loop_union(loops)
+    rows = np.concatenate([np.arange(len(loops), dtype=ROW_DTYPE), union["rows"].astype(ROW_DTYPE)])
+    sources = np.concatenate([loops['loopSource'].astype(str).to_numpy(), np.full(len(union["rows"]), UNION_10K)])
+    anchors = pd.DataFrame({
+        "source": np.concatenate([sources, sources]),
+        "chrom": np.concatenate([loops.iloc[rows, 0].astype(str).to_numpy(), loops.iloc[rows, 3].astype(str).to_numpy()]),
+        "start": np.concatenate([loops.iloc[rows, 1].to_numpy(), loops.iloc[rows, 4].to_numpy()]).astype(COORD_DTYPE),
+        "end": np.concatenate([loops.iloc[rows, 2].to_numpy(), loops.iloc[rows, 5].to_numpy()]).astype(COORD_DTYPE),
+        "row": np.concatenate([rows, rows]),
+    }).sort_values(["source", "chrom", "start", "row"], kind="mergesort")
+
+    starts = anchors["start"].to_numpy()
+    ends = anchors["end"].to_numpy()
+    rows = anchors["row"].to_numpy()
+    index = {}
+    for key, positions in anchors.groupby(["source", "chrom"], sort=False).indices.items():
+        block = slice(positions[0], positions[-1] + 1)
+        index[key] = (starts[block], ends[block], rows[block])
+    return index
+
+
+def region_rows_by_source(index, sources, chrom, start, end):
+    """{source: sorted row positions of its loops with an anchor fully inside chrom:[start, end]}."""
+    hits = {}
+    for source in sources:
+        entry = index.get((source, str(chrom)))
+        if entry is None:
+            hits[source] = np.empty(0, ROW_DTYPE)
+            continue
+        starts, ends, rows = entry
+        lo = np.searchsorted(starts, start, side="left")
+        hi = np.searchsorted(starts, end, side="right")
+        hits[source] = np.unique(rows[lo:hi][ends[lo:hi] <= end])
+    return hits
+
+
+def region_rows(index, sources, chrom, start, end):
+    """Sorted row positions of loops from any of sources with an anchor fully inside chrom:[start, end]."""
+    hits = [rows for rows in region_rows_by_source(index, sources, chrom, start, end).values() if len(rows)]
+    if not hits:
+        return np.empty(0, ROW_DTYPE)
+    return np.unique(np.concatenate(hits))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Overview of windows wider than the detailed region view, up to a whole
+chromosome. Loops are aggregated ahead of time (buildData.py) into
+OVERVIEW_BIN sized density bins and bin-to-bin arc counts per loop set,
+chromosome and promoter set, so a query only sums a few thousand bins and
+draws at most MAX_OVERVIEW_ARCS arcs, whatever the window size. Signal comes
+from the coarse levels of the signal pyramids; without them every overview
+reads its window from the bigWigs, about a second more per view, so
+interactive overviews need the pyramids built. Needs no streamlit.
+"""
+
+import numpy as np
+import pandas as pd
+import loopIndex
+
+# -------------------- Configuration --------------------
+
+OVERVIEW_BIN = 100_000
+# bins drawn across the plot, neighbouring aggregate bins are summed down to this
+OVERVIEW_DISPLAY_BINS = 500
+# strongest arcs drawn, weaker ones only count towards the density
+MAX_OVERVIEW_ARCS = 200
+# width of the windows suggested for zooming into the detailed view
+ZOOM_WINDOW = 1_000_000
+# layout of the saved aggregates, bumped when they change so older files are built anew
+OVERVIEW_VERSION = 3
+
+LOOP_SETS = ["merged_1k", "merged_10k", *loopIndex.SUBTYPE_SOURCES.values()]
+
+
+def loop_set(subChoice, res):
+    """Name of the loop set of a subtype choice, as the aggregates are keyed."""
+    return loopIndex.SUBTYPE_SOURCES[subChoice] if subChoice != 0 else f"merged_{res}"
+
+
+# -------------------- Aggregates --------------------
+
+def read_chrom_sizes(path):
+    """{chrom (without "chr"): length} of a UCSC chrom.sizes file."""
+    sizes = pd.read_csv(path, sep="\t", header=None, usecols=[0, 1], names=["chrom", "size"], dtype={"chrom": str})
+    return dict(zip(sizes["chrom"].str.removeprefix("chr"), sizes["size"].astype(int)))
+
+
+def bin_counts(bins, n_bins):
+    return np.bincount(bins, minlength=n_bins).astype(np.int32)
+
+
+def build_overview(loops, gene_table, union=None, chrom_sizes=None):
+    """
+    Aggregates of every loop set: {"chrom_sizes": {chrom: length}, and per
+    "<set>/<chrom>" key "loops" (anchors of the loops per bin) and per
+    promoter set "cres/<tx>" (CRE loops with a target, by CRE bin) and
+    "arcs/<tx>" (bin1, bin2, count of the cis CRE loops, bin1 <= bin2)}.
+    Every set counts the rows its region queries read: merged 10k the loop
+    union (loopIndex.build_loop_union), the others the rows of their source.
+    Chromosomes are as long as in chrom_sizes (read_chrom_sizes), or as
+    their last loop where that reaches further.
+    """
+    chroms1 = loops.iloc[:, 0].astype(str).to_numpy()
+    chroms2 = loops.iloc[:, 3].astype(str).to_numpy()
+    bins1 = loops.iloc[:, 1].to_numpy(np.int64) // OVERVIEW_BIN
+    bins2 = loops.iloc[:, 4].to_numpy(np.int64) // OVERVIEW_BIN
+    last_ends = np.maximum(loops.iloc[:, 2].to_numpy(np.int64), loops.iloc[:, 5].to_numpy(np.int64))
+    loop_ends = pd.concat([pd.Series(last_ends).groupby(chroms1).max(), pd.Series(last_ends).groupby(chroms2).max()])
+    chrom_sizes = {**(chrom_sizes or {})}
+    for chrom, loop_end in loop_ends.groupby(level=0).max().items():
+        chrom_sizes[chrom] = max(chrom_sizes.get(chrom, 0), int(loop_end))
+
+    blocks = loopIndex.source_blocks(loops)
+    union = union if union is not None else loopIndex.build_loop_union(loops, blocks)
+    all_rows = np.arange(len(loops))
+    # CRE loops with a target gene per promoter set, annotated as in locAnalyzer (annotAll/annotCanon)
+    cre_loops = {}
+    for tx, annot_col in [("allTX", 7), ("canonTX", 6)]:
+        targeted = np.zeros(len(loops), dtype=bool)
+        targeted[gene_table.loc[gene_table['promoter_set'] == tx, 'loop_id'].to_numpy()] = True
+        cre_loops[tx] = targeted & (loops.iloc[:, annot_col].astype(str).to_numpy() == "CRE")
+
+    aggregates = {"chrom_sizes": chrom_sizes}
+    for name in LOOP_SETS:
+        subChoice = next((choice for choice, source in loopIndex.SUBTYPE_SOURCES.items() if source == name), 0)
+        res = name.removeprefix("merged_") if subChoice == 0 else "10k"
+        if loopIndex.index_sources(list(blocks), subChoice, res) == [loopIndex.UNION_10K]:
+            rows = union["rows"]
+        else:
+            rows = all_rows[loopIndex.source_rows(blocks, loopIndex.query_sources(list(blocks), subChoice, res))]
+        c1, c2, b1, b2 = chroms1[rows], chroms2[rows], bins1[rows], bins2[rows]
+
+        for chrom, size in chrom_sizes.items():
+            n_bins = -(-size // OVERVIEW_BIN)
+            on1, on2 = c1 == chrom, c2 == chrom
+            entry = {"loops": bin_counts(b1[on1], n_bins) + bin_counts(b2[on2], n_bins)}
+            for tx, is_cre in cre_loops.items():
+                cre = on1 & is_cre[rows]
+                entry[f"cres/{tx}"] = bin_counts(b1[cre], n_bins)
+                cis = cre & on2
+                pairs = pd.DataFrame({"bin1": np.minimum(b1[cis], b2[cis]), "bin2": np.maximum(b1[cis], b2[cis])})
+                entry[f"arcs/{tx}"] = pairs.value_counts(sort=False).reset_index().to_numpy(np.int32).reshape(-1, 3)
+            aggregates[f"{name}/{chrom}"] = entry
+    return aggregates
+
+
+def save_overview(aggregates, path):
+    arrays = {
+        "version": np.array(OVERVIEW_VERSION),
+        "chroms": np.array(list(aggregates["chrom_sizes"])), "chrom_sizes": np.array(list(aggregates["chrom_sizes"].values())),
+    }
+    for key, entry in aggregates.items():
+        if key != "chrom_sizes":
+            arrays.update({f"{key}/{name}": values for name, values in entry.items()})
+    np.savez(path, **arrays)
+
+
+def load_overview(path):
+    """Aggregates written by save_overview, loaded in full (a few MB). Raises ValueError for an older layout."""
+    with np.load(path) as npz:
+        if "version" not in npz.files or int(npz["version"]) != OVERVIEW_VERSION:
+            raise ValueError(f"{path} is in an older layout, rebuild it with buildData.py")
+        aggregates = {"chrom_sizes": dict(zip(npz["chroms"].tolist(), npz["chrom_sizes"].tolist()))}
+        for name in npz.files:
+            if name.count("/") >= 2:
+                loop_set_name, chrom, field = name.split("/", 2)
+                aggregates.setdefault(f"{loop_set_name}/{chrom}", {})[field] = npz[name]
+    return aggregates
+
+
+def chromosome_end(aggregates, chrom):
+    """Length of chrom, 0 for chromosomes neither in the reference nor in the loops."""
+    return aggregates["chrom_sizes"].get(str(chrom), 0)
+
+
+# -------------------- Tables --------------------
+
+def overview_window(start, end):
+    """start, end widened to whole aggregate bins."""
+    return int(start) // OVERVIEW_BIN * OVERVIEW_BIN, -(-int(end) // OVERVIEW_BIN) * OVERVIEW_BIN
+
+
+def overview_tables(aggregates, name, chrom, start, end, tx):
+    """
+    Display bins (start, end, loops, cres) of chrom:start-end, summed from the
+    aggregates of loop set name down to at most OVERVIEW_DISPLAY_BINS, and the
+    strongest arcs between them (start1, end1, start2, end2, count).
+    start and end must lie on aggregate bin edges (overview_window).
+    """
+    first, last = start // OVERVIEW_BIN, end // OVERVIEW_BIN
+    factor = max(1, -(-(last - first) // OVERVIEW_DISPLAY_BINS))
+    edges = np.arange(first, last, factor)
+    bin_starts = edges * OVERVIEW_BIN
+    bin_ends = np.minimum(edges + factor, last) * OVERVIEW_BIN
+
+    entry = aggregates.get(f"{name}/{chrom}")
+    if entry is None:
+        loops = cres = np.zeros(len(edges), dtype=np.int64)
+        arcs = np.empty((0, 3), dtype=np.int64)
+    else:
+        n_bins = len(entry["loops"])
+        # bins past the last loop of the chromosome are empty
+        window = lambda values: np.pad(values[first:min(last, n_bins)], (0, max(0, last - max(first, n_bins))))
+        loops = np.add.reduceat(window(entry["loops"]), edges - first).astype(np.int64)
+        cres = np.add.reduceat(window(entry[f"cres/{tx}"]), edges - first).astype(np.int64)
+        arcs = entry[f"arcs/{tx}"].astype(np.int64)
+        arcs = arcs[(arcs[:, 0] >= first) & (arcs[:, 1] < last)]
+
+    bins = pd.DataFrame({"start": bin_starts, "end": bin_ends, "loops": loops, "cres": cres})
+    # arcs between display bins, arcs within one display bin have no length to draw
+    display_pairs = pd.DataFrame({
+        "bin1": (arcs[:, 0] - first) // factor, "bin2": (arcs[:, 1] - first) // factor, "count": arcs[:, 2],
+    })
+    display_pairs = display_pairs[display_pairs["bin1"] != display_pairs["bin2"]]
+    display_pairs = display_pairs.groupby(["bin1", "bin2"], as_index=False)["count"].sum() \
+        .nlargest(MAX_OVERVIEW_ARCS, "count", keep="first")
+    arc_table = pd.DataFrame({
+        "start1": bin_starts[display_pairs["bin1"]], "end1": bin_ends[display_pairs["bin1"]],
+        "start2": bin_starts[display_pairs["bin2"]], "end2": bin_ends[display_pairs["bin2"]],
+        "count": display_pairs["count"].to_numpy(),
+    })
+    return bins, arc_table
+
+
+def zoom_windows(bins, n=10):
+    """
+    The n ZOOM_WINDOW wide windows (start, end, cres) with the most CRE loops,
+    non-overlapping, for opening in the detailed region view.
+    """
+    if bins.empty or bins["cres"].sum() == 0:
+        return pd.DataFrame(columns=["start", "end", "cres"])
+    centers = ((bins["start"] + bins["end"]) // 2).to_numpy()
+    starts = np.maximum(0, centers - ZOOM_WINDOW // 2) // OVERVIEW_BIN * OVERVIEW_BIN
+    cumulative = np.concatenate([[0], np.cumsum(bins["cres"].to_numpy())])
+    # CRE loops of the bins inside each candidate window
+    lo = np.searchsorted(bins["start"].to_numpy(), starts, side="left")
+    hi = np.searchsorted(bins["end"].to_numpy(), starts + ZOOM_WINDOW, side="right")
+    totals = cumulative[hi] - cumulative[lo]
+    chosen = []
+    for i in np.argsort(-totals, kind="stable"):
+        if totals[i] == 0 or len(chosen) == n:
+            break
+        if all(abs(starts[i] - starts[j]) >= ZOOM_WINDOW for j in chosen):
+            chosen.append(i)
+    return pd.DataFrame({"start": starts[chosen], "end": starts[chosen] + ZOOM_WINDOW, "cres": totals[chosen]})
+
+
+# -------------------- Functions --------------------
+
+def density_track(title, color, counts, region_end):
+    """Counts per display bin, drawn like a signal track scaled to its maximum."""
+    import trackRenderer
+    values = counts.to_numpy(np.float32)
+    return trackRenderer.signal_track(title, color, max(1.0, float(values.max(initial=0))), region_end, values)
+
+
+def arcs_track(chrom, arc_table):
+    """Arcs between display bins, coloured and widened by their number of CRE loops."""
+    import trackRenderer
+    links = list(zip(
+        [chrom] * len(arc_table), arc_table["start1"], arc_table["end1"],
+        [chrom] * len(arc_table), arc_table["start2"], arc_table["end2"], arc_table["count"].astype(float),
+    ))
+    return trackRenderer.LinksFrameTrack(trackRenderer.memory_track_properties(
+        trackRenderer.LinksFrameTrack.TRACK_TYPE, "CRE loops (arcs)",
+        # the colormap needs scores to scale to
+        color="YlOrRd" if links else "red", height=5.0, use_middle=True,
+    ), links)
+
+
+def render_overview(bins, arc_table, chrom, start, end, base, signal_tracks, image_format="png"):
+    """
+    Encoded overview image: arcs, loop and CRE density and the epigenomic
+    signal of chrom:start-end ("chr" prefixed), laid out like base (a
+    PlotTracks whose first track is an x-axis). signal_tracks is as in
+    geneView.render_gene_view.
+    """
+    import queryMetrics
+    import trackRenderer
+    with queryMetrics.span("tracks"):
+        x_axis = base.track_obj_list[0]
+        tracks = [
+            x_axis,
+            arcs_track(chrom, arc_table),
+            density_track("Loop anchors", "#555555", bins["loops"], end),
+            density_track("CRE loops", "red", bins["cres"], end),
+        ]
+    with queryMetrics.span("signal"):
+        tracks.extend(signal_tracks(chrom, start, end, trackRenderer.DEFAULT_DPI))
+    return trackRenderer.render_tracks(base, tracks, chrom, start, end, image_format=image_format)
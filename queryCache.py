@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Size-bounded LRU cache shared by all sessions of a server process, with an
+optional on-disk tier that survives restarts.
+"""
+
+import dataclasses
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# disk writes between two scans of the disk tier, which other processes may share;
+# in between its size is tracked from this process's own writes
+DISK_RESCAN_WRITES = 256
+# share of max_disk_bytes a full disk tier is pruned down to, so the next scan is some writes away
+DISK_PRUNE_TO = 0.9
+
+
+def value_size(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, tuple):
+        return sum(value_size(item) for item in value)
+    if dataclasses.is_dataclass(value):
+        # query results of queryEngine
+        return sum(value_size(getattr(value, field.name)) for field in dataclasses.fields(value))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Keeps at most max_bytes of values in memory, evicting the least recently
+    used entry first. With disk_dir set, every value is also pickled to disk
+    (bounded by max_disk_bytes, oldest files removed first) and memory misses
+    fall back to it.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, max_disk_bytes=0, version=""):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        # part of every disk file name, so rebuilt data never hits stale files
+        self.version = str(version)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        # bytes of the disk tier as of the last scan plus the writes since, None before the first scan
+        self.disk_bytes = None
+        self.disk_writes = 0
+        self.disk_lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return self.entries[key][0]
+
+        value = self._read_disk(key)
+        with self.lock:
+            if value is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._insert(key, value)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._insert(key, value)
+        self._write_disk(key, value)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
+
+    def _insert(self, key, value):
+        size = value_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            __, (__, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.counters["evictions"] += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr((self.version, key)).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+        except Exception:
+            # cut short, or pickled by other pandas/numpy versions (AttributeError, ModuleNotFoundError, ...):
+            # never readable here, so a miss that is written anew
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        # the disk tier is shared by the app, its render processes and the API server
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(temp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(temp_path, path)
+        with self.disk_lock:
+            self.disk_writes += 1
+            if self.disk_bytes is not None:
+                self.disk_bytes += size - replaced
+            if self.disk_bytes is None or self.disk_bytes > self.max_disk_bytes or self.disk_writes >= DISK_RESCAN_WRITES:
+                self.disk_bytes = self._prune_disk()
+                self.disk_writes = 0
+
+    def _prune_disk(self):
+        # remove the oldest files of an overfull disk tier down to DISK_PRUNE_TO, returns the bytes left
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for __, size, __ in files)
+        if total <= self.max_disk_bytes:
+            return total
+        for __, size, path in sorted(files):
+            if total <= self.max_disk_bytes * DISK_PRUNE_TO:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        return total
@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Query engine behind the app, without streamlit: gene, region and subtype
+comparison queries returning result objects, and the track images of those
+results. The loop table, indexes, caches and signal readers are loaded on
+first use, once per process and shared by all threads, so importing the
+engine reads nothing and it can be driven from the app, worker pools, batch
+jobs or tests alike:
+
+    import queryEngine
+    hits = queryEngine.gene_query("KRAS")
+    image = queryEngine.render_gene(hits)
+"""
+
+import functools
+import os
+import sys
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import loopIndex
+import queryCache
+import queryMetrics
+
+# rendering modules (pyGenomeTracks, matplotlib, pyBigWig) are imported on first
+# render, not with the engine
+
+# -------------------- Configuration --------------------
+
+DATA_DIR = os.path.join(os.getcwd(), "data")
+TRACKS_DIR = os.path.join(os.getcwd(), "tracks")
+
+coding_genes_path = os.path.join(DATA_DIR, "coding_genes2")
+all_loops_path = os.path.join(DATA_DIR, "concat_loops_v2.tab")
+loop_store_path = os.path.join(DATA_DIR, "loops_store")
+gene_index_path = os.path.join(DATA_DIR, "gene_index.npz")
+loop_union_path = os.path.join(DATA_DIR, "loop_union.npz")
+overview_path = os.path.join(DATA_DIR, "overview_aggregates.npz")
+chrom_sizes_path = os.path.join(DATA_DIR, "hg38.chrom.sizes")
+
+# rendered track images and result tables, cached across sessions
+QUERY_CACHE_MAX_MB = 256
+# on-disk tier of the query cache, set to None to keep it in memory only
+QUERY_CACHE_DIR = os.path.join(os.getcwd(), "cached_queries")
+QUERY_CACHE_DISK_MAX_MB = 2048
+# layout of the cached results, bumped when it changes so old disk entries are not read
+QUERY_CACHE_LAYOUT = 3
+
+# encoding of the genome track images: "png", "svg" or "webp"
+TRACK_IMAGE_FORMAT = "png"
+
+GENE_VIEW_TRACKS = "tracks_gene.ini"
+OVERVIEW_TRACKS = "tracks_overview.ini"
+MERGED_TRACKS = {
+    "1k": {"allTX": "tracks_1k_all.ini", "canonTX": "tracks_1k_canon.ini"},
+    "10k": {"allTX": "tracks_10k_all.ini", "canonTX": "tracks_10k_canon.ini"},
+}
+
+LINK_COLUMNS = ['chr', 'start', 'end', 'interChr', 'interStart', 'interEnd']
+
+# cre_index of the promoter sets, as named on the command line and in the API
+PROMOTER_SETS = {"all": 0, "canonical": 1}
+
+# chromosomes that can be queried, without "chr"
+CHROMOSOMES = [str(i) for i in range(1, 23)] + ["X", "Y"]
+
+
+class UnknownGeneError(ValueError):
+    """The queried gene is not in the protein coding gene list."""
+
+
+def promoter_set(cre_index):
+    return "allTX" if cre_index == 0 else "canonTX"
+
+
+# -------------------- Results --------------------
+
+@dataclass(frozen=True)
+class GeneHits:
+    """
+    Enhancer links of one gene, in the layout of the app's CSV download:
+    chr/start/end is the promoter side, interChr/interStart/interEnd the
+    enhancer. regions are the enhancers as "chrN:start-end", in lookup order.
+    """
+    gene: str
+    subChoice: int
+    res: str
+    cre_index: int
+    regions: tuple
+    links: pd.DataFrame
+
+    @property
+    def empty(self):
+        return self.links.empty
+
+
+@dataclass(frozen=True)
+class RegionCREs:
+    """
+    Loops of chrom:start-end. links are the anchor pairs of the CRE loops with
+    a target gene (what is drawn), cre_loops the same loops with their loop_id,
+    targets their loop_id/gene pairs, and other_loops the loops that are
+    neither CREs nor reach a promoter.
+    """
+    chrom: str
+    start: int
+    end: int
+    subChoice: int
+    res: str
+    cre_index: int
+    links: pd.DataFrame
+    cre_loops: pd.DataFrame
+    targets: pd.DataFrame
+    other_loops: pd.DataFrame
+
+    @property
+    def empty(self):
+        return self.links.empty
+
+    def cres(self):
+        """Unique CREs (chr, start, end) of links."""
+        return self.links[['chr', 'start', 'end']].drop_duplicates()
+
+    def cre_targets(self):
+        """Every CRE with the ", " joined target genes over all its loops."""
+        cre_genes = self.cre_loops[['chr', 'start', 'end', 'loop_id']].merge(self.targets, on='loop_id')
+        cre_genes = cre_genes.astype({'gene': str}).drop_duplicates(['chr', 'start', 'end', 'gene']).sort_values('gene', kind="mergesort")
+        genes_by_cre = cre_genes.groupby(['chr', 'start', 'end'], sort=False, observed=True)['gene'].agg(", ".join)
+        return self.cres().merge(genes_by_cre.rename('target').reset_index(), on=['chr', 'start', 'end'], how='left')
+
+    def other_loop_pairs(self):
+        """Anchor pairs of other_loops as sorted ("chr:start-end", "chr:start-end"), each pair once."""
+        loops = self.other_loops
+        anchor1 = loops['chr'].astype(str) + ":" + loops['start'].astype(str) + "-" + loops['end'].astype(str)
+        anchor2 = loops['interChr'].astype(str) + ":" + loops['interStart'].astype(str) + "-" + loops['interEnd'].astype(str)
+        first = anchor1.where(anchor1 <= anchor2, anchor2)
+        second = anchor2.where(anchor1 <= anchor2, anchor1)
+        pairs = pd.DataFrame({'first': first.to_numpy(), 'second': second.to_numpy()}).drop_duplicates()
+        return list(pairs.itertuples(index=False, name=None))
+
+
+@dataclass(frozen=True)
+class SubtypeComparison:
+    """
+    Loops of a gene (focus "gene", query (gene,)) or region (focus "region",
+    query (chrom, start, end)) in all eight subtypes at 10k, one row per link
+    and subtype (compareView.compare_gene / compare_region).
+    """
+    focus: str
+    query: tuple
+    cre_index: int
+    table: pd.DataFrame
+
+    @property
+    def empty(self):
+        return self.table.empty
+
+    @property
+    def gene(self):
+        return self.query[0] if self.focus == "gene" else None
+
+    @property
+    def anchor_cols(self):
+        # enhancers are the far anchors of a gene's loops, the near anchors of a region's
+        return ['interChr', 'interStart', 'interEnd'] if self.focus == "gene" else ['chr', 'start', 'end']
+
+    def presence(self):
+        """CRE by subtype presence matrix."""
+        import compareView
+        return compareView.presence_matrix(self.table, self.anchor_cols)
+
+
+@dataclass(frozen=True)
+class RegionOverview:
+    """
+    Aggregated loops of a window of any size, up to a whole chromosome, widened
+    to whole aggregate bins: bins are the display bins (start, end, loops,
+    cres), arcs the strongest bin-to-bin CRE loop counts (start1, end1,
+    start2, end2, count), see overviewView.
+    """
+    chrom: str
+    start: int
+    end: int
+    subChoice: int
+    res: str
+    cre_index: int
+    bins: pd.DataFrame
+    arcs: pd.DataFrame
+
+    @property
+    def empty(self):
+        return int(self.bins['loops'].sum()) == 0
+
+    def zoom_windows(self, n=10):
+        """Windows with the most CRE loops, sized for region_query."""
+        import overviewView
+        return overviewView.zoom_windows(self.bins, n)
+
+
+# -------------------- Resources --------------------
+
+def lazy_resource(loader):
+    """
+    Decorator: loader(*args) runs on the first call with those args, every
+    later call and thread gets the same value. Threads asking for a value
+    still being loaded wait for it instead of loading it again.
+    """
+    values = {}
+    lock = threading.Lock()
+
+    @functools.wraps(loader)
+    def get(*args):
+        if args in values:
+            return values[args]
+        with lock:
+            if args not in values:
+                values[args] = loader(*args)
+            return values[args]
+
+    def discard(value, *args):
+        # drop a value that went bad (a broken pool), unless another thread replaced it already
+        with lock:
+            if values.get(args) is value:
+                del values[args]
+
+    get.clear = values.clear
+    get.discard = discard
+    get.is_loaded = lambda *args: args in values
+    return get
+
+
+def check_data():
+    """Raise FileNotFoundError unless the gene list and the loop table (or its store) are in DATA_DIR."""
+    if not os.path.exists(coding_genes_path) or not (os.path.exists(all_loops_path) or os.path.exists(loop_store_path)):
+        raise FileNotFoundError(
+            f"Required input files not found. Please place 'coding_genes2' and 'concat_loops_v2.tab' in the '{DATA_DIR}' folder."
+        )
+
+
+# the loop table is read memory-mapped from the store written by buildData.py,
+# the .tab is only parsed when the store is missing or older than it
+def loop_store_is_current():
+    return loopIndex.loop_store_is_current(loop_store_path, all_loops_path)
+
+
+def is_prebuilt(path):
+    # a lookup file of buildData.py, usable if written after the current store it points into
+    return os.path.exists(path) and loop_store_is_current() and os.path.getmtime(path) >= os.path.getmtime(os.path.join(loop_store_path, "meta.json"))
+
+
+@lazy_resource
+def coding_genes():
+    check_data()
+    return pd.read_csv(coding_genes_path, sep="\t")
+
+
+@lazy_resource
+def known_genes():
+    return frozenset(coding_genes().iloc[:, 3])
+
+
+@lazy_resource
+def loops():
+    check_data()
+    return loopIndex.load_loops(all_loops_path, loop_store_path)
+
+
+# row block of every loopSource, the loop table is grouped by source
+@lazy_resource
+def loop_blocks():
+    return loopIndex.source_blocks(loops())
+
+
+@lazy_resource
+def loop_sources():
+    return list(loop_blocks())
+
+
+# the loops of subChoice at res, a view of the loop table (no copy)
+@lazy_resource
+def loop_set(subChoice=0, res="10k"):
+    return loops().iloc[loopIndex.source_rows(loop_blocks(), loopIndex.query_sources(loop_sources(), subChoice, res))]
+
+
+# coding genes sorted and indexed per chromosome, sliced to each gene view
+@lazy_resource
+def gene_annotation():
+    import geneView
+    return geneView.build_gene_annotation(coding_genes())
+
+
+# long format loop_id/gene/promoter_set table, the only place gene lists are split
+@lazy_resource
+def gene_table():
+    return loopIndex.build_gene_table(loops())
+
+
+# distinct loops of all 10k sources (the merged 10k map) with a provenance bitmask,
+# prebuilt by buildData.py or built once per process
+@lazy_resource
+def loop_union():
+    if is_prebuilt(loop_union_path):
+        return loopIndex.load_loop_union(loop_union_path)
+    return loopIndex.build_loop_union(loops(), loop_blocks())
+
+
+def loop_provenance(loop_ids):
+    """The 10k loopSources having each loop of a merged 10k result (its loop_id), one list per loop."""
+    return loopIndex.loop_provenance(loop_union(), loop_ids)
+
+
+# gene -> loop index, prebuilt by buildData.py or built once per process
+@lazy_resource
+def gene_loop_index():
+    if is_prebuilt(gene_index_path):
+        try:
+            return loopIndex.load_gene_index(gene_index_path)
+        except ValueError:
+            # written in an older layout, built anew below
+            pass
+    return loopIndex.build_gene_index(loops(), gene_table(), loop_union())
+
+
+# per loopSource/chromosome anchor index for region queries
+@lazy_resource
+def region_loop_index():
+    return loopIndex.build_region_index(loops(), loop_union())
+
+
+@lazy_resource
+def query_caches():
+    # bump the cache version whenever the loop table is rebuilt or the cached layout changes
+    version = (QUERY_CACHE_LAYOUT, os.path.getmtime(os.path.join(loop_store_path, "meta.json") if loop_store_is_current() else all_loops_path))
+    return {
+        name: queryCache.LRUCache(
+            QUERY_CACHE_MAX_MB * 2**20 // 2,
+            os.path.join(QUERY_CACHE_DIR, name) if QUERY_CACHE_DIR else None,
+            QUERY_CACHE_DISK_MAX_MB * 2**20 // 2,
+            version,
+        )
+        for name in ["images", "tables"]
+    }
+
+
+# hit/miss counters of the query caches
+def cache_stats():
+    return {name: cache.stats() for name, cache in query_caches().items()}
+
+
+# loop density and arc counts per loop set and chromosome, prebuilt by buildData.py
+# or aggregated once per process
+@lazy_resource
+def overview_aggregates():
+    import overviewView
+    if is_prebuilt(overview_path):
+        try:
+            return overviewView.load_overview(overview_path)
+        except ValueError:
+            # written in an older layout, built anew below
+            pass
+    return overviewView.build_overview(loops(), gene_table(), loop_union(), overviewView.read_chrom_sizes(chrom_sizes_path))
+
+
+def chromosome_end(chrom):
+    """Length of chrom (without "chr"), the end of its whole-chromosome overview."""
+    import overviewView
+    return overviewView.chromosome_end(overview_aggregates(), chrom)
+
+
+# bigwig readers, each worker process holds its own handles
+@lazy_resource
+def signal_pool():
+    import signalTracks
+    return signalTracks.start_signal_pool()
+
+
+# local bigwigs, provisioned in the background so a query never waits on startup;
+# render workers are given the paths instead of provisioning the store again
+@lazy_resource
+def bigwig_futures():
+    import bigwigStore
+    return bigwigStore.start_provisioning(bigwigStore.read_manifest())
+
+
+def bigwig_sources():
+    """{key: future of its local bigWig} of the signal tracks without a pyramid, read from their bigWig."""
+    import signalTracks
+    pyramids = signal_pyramids()
+    futures = bigwig_futures()
+    return {key: futures[key] for key, __, __, __ in signalTracks.SIGNAL_TRACKS if key not in pyramids}
+
+
+# {key: local bigWig} given by the scheduler to the job a render worker runs,
+# None outside render workers
+_job_bigwig_paths = None
+# whether a render worker is running a job, whose image the scheduler caches under its job key
+_rendering_job = False
+
+
+# precomputed signal pyramids from buildData.py, memory-mapped
+@lazy_resource
+def signal_pyramids():
+    import bigwigStore
+    import signalTracks
+    return signalTracks.load_signal_pyramids(bigwigStore.read_manifest(), signalTracks.PYRAMID_DIR)
+
+
+# static .ini tracks are parsed once per process and reused by every query
+@lazy_resource
+def resident_tracks(tracks_path):
+    import trackRenderer
+    return trackRenderer.load_tracks(tracks_path)
+
+
+# whether every track file of an .ini has a tabix index from buildData.py
+@lazy_resource
+def tracks_are_indexed(tracks_path):
+    import trackRenderer
+    return trackRenderer.tracks_indexed(tracks_path)
+
+
+def warm_up(render=True):
+    """
+    Load every resource a query needs, and with render those of the track
+    images too, e.g. from a background thread at server start.
+    """
+    if render:
+        bigwig_futures()
+    for load in [coding_genes, known_genes, loops, loop_blocks, loop_sources, loop_union, gene_table, gene_loop_index,
+                 region_loop_index, overview_aggregates, query_caches]:
+        load()
+    if render:
+        for load in [gene_annotation, signal_pyramids, signal_pool]:
+            load()
+
+
+def resource_bytes(value):
+    """Bytes held by a loaded resource: arrays, frames and the dicts and tuples of them the indexes are made of."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, dict):
+        return sum(resource_bytes(key) + resource_bytes(item) for key, item in value.items())
+    if isinstance(value, (tuple, list, frozenset)):
+        return sys.getsizeof(value) + sum(resource_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def memory_report():
+    """
+    Bytes held by every loaded lookup resource (the loop table counted in
+    full, although its memory-mapped columns are shared between processes)
+    and the process memory, see queryMetrics.process_memory.
+    """
+    report = {
+        load.__name__: resource_bytes(load())
+        for load in [loops, loop_union, gene_table, gene_loop_index, region_loop_index, overview_aggregates, coding_genes, known_genes]
+        if load.is_loaded()
+    }
+    return {"resources": report, "process": queryMetrics.process_memory()}
+
+
+# -------------------- Queries --------------------
+
+def check_gene(gene):
+    if gene not in known_genes():
+        raise UnknownGeneError(f"{gene} is not a protein coding gene")
+
+
+def cached_result(key, lookup):
+    """Result of key from the table cache, else from lookup() (timed as "lookup") and cached."""
+    table_cache = query_caches()["tables"]
+    result = table_cache.get(key)
+    if result is None:
+        with queryMetrics.span("lookup"):
+            result = lookup()
+        table_cache.put(key, result)
+    return result
+
+
+def gene_query(gene, subChoice=0, res="10k", cre_index=0):
+    """
+    Enhancer links of gene in the loops of subChoice (0 for merged at res,
+    1-8 for the subtypes) with all (cre_index 0) or canonical promoters.
+    Raises UnknownGeneError for genes that are not protein coding.
+    """
+    check_gene(gene)
+
+    def lookup():
+        # the merged 10k map reads its deduplicated union, every key is one index entry
+        sources = loopIndex.index_sources(loop_sources(), subChoice, res)
+        hits = loops().iloc[loopIndex.gene_rows(gene_loop_index(), sources, promoter_set(cre_index), gene)]
+        regions = "chr" + hits.iloc[:, 0].astype(str) + ":" + hits.iloc[:, 1].astype(str) + "-" + hits.iloc[:, 2].astype(str)
+        links = pd.DataFrame({
+            'chr': hits.iloc[:, 3].to_numpy(), 'start': hits.iloc[:, 4].to_numpy(), 'end': hits.iloc[:, 5].to_numpy(),
+            'interChr': hits.iloc[:, 0].to_numpy(), 'interStart': hits.iloc[:, 1].to_numpy(), 'interEnd': hits.iloc[:, 2].to_numpy(),
+            'target': gene
+        }).drop_duplicates()
+        return GeneHits(gene, subChoice, res, cre_index, tuple(regions.drop_duplicates()), links)
+
+    hits = cached_result(("gene", gene, subChoice, res, cre_index), lookup)
+    queryMetrics.observe("query_result_size", len(hits.links), kind="rows")
+    return hits
+
+
+def region_query(chrom, start, end, subChoice=0, res="10k", cre_index=0):
+    """Loops with an anchor in chrom:start-end (chrom without "chr") in the loops of subChoice, see gene_query."""
+    chrom, start, end = str(chrom), int(start), int(end)
+    annot_index = 7 - cre_index
+
+    def lookup():
+        sources = loopIndex.index_sources(loop_sources(), subChoice, res)
+        rows = loopIndex.region_rows(region_loop_index(), sources, chrom, start, end)
+        all_links = loops().iloc[rows, [0, 1, 2, 3, 4, 5, annot_index]].set_axis([*LINK_COLUMNS, 'type'], axis=1).reset_index(drop=True)
+        all_links['loop_id'] = rows
+        targets = loopIndex.loop_genes(gene_table(), promoter_set(cre_index), rows)[['loop_id', 'gene']].reset_index(drop=True)
+
+        has_target = all_links['loop_id'].isin(targets['loop_id'])
+        cre_loops = all_links[(all_links['type'] == "CRE") & has_target]
+        return RegionCREs(
+            chrom, start, end, subChoice, res, cre_index,
+            links=cre_loops.iloc[:, :6].drop_duplicates(),
+            cre_loops=cre_loops,
+            targets=targets,
+            other_loops=all_links[~has_target & (all_links['type'] != "CRE")],
+        )
+
+    result = cached_result(("region", chrom, start, end, subChoice, res, cre_index), lookup)
+    queryMetrics.observe("query_result_size", len(result.links), kind="rows")
+    return result
+
+
+def compare_query(focus, cre_index=0, gene=None, chrom=None, start=None, end=None):
+    """Loops of gene (focus "gene") or chrom:start-end (focus "region") in all eight subtypes at 10k."""
+    import compareView
+    if focus == "gene":
+        check_gene(gene)
+        query = (gene,)
+    else:
+        query = (str(chrom), int(start), int(end))
+
+    # all eight subtypes in one pass over the index instead of one query per subtype
+    def lookup():
+        if focus == "gene":
+            table = compareView.compare_gene(loops(), gene_loop_index(), gene, promoter_set(cre_index))
+        else:
+            table = compareView.compare_region(loops(), region_loop_index(), gene_table(), *query, cre_index)
+        return SubtypeComparison(focus, query, cre_index, table)
+
+    result = cached_result(("compare", focus, *query, cre_index), lookup)
+    queryMetrics.observe("query_result_size", len(result.table), kind="rows")
+    return result
+
+
+def overview_query(chrom, start=0, end=None, subChoice=0, res="10k", cre_index=0):
+    """
+    Loop density and arcs of chrom:start-end of any size (end None for the
+    end of the chromosome), in the loops of subChoice, see gene_query.
+    """
+    import overviewView
+    chrom = str(chrom)
+    chrom_end = max(chromosome_end(chrom), int(start) + 1)
+    start, end = overviewView.overview_window(start, chrom_end if end is None else min(int(end), chrom_end))
+
+    def lookup():
+        bins, arcs = overviewView.overview_tables(
+            overview_aggregates(), overviewView.loop_set(subChoice, res), chrom, start, end, promoter_set(cre_index)
+        )
+        return RegionOverview(chrom, start, end, subChoice, res, cre_index, bins, arcs)
+
+    result = cached_result(("overview", chrom, start, end, subChoice, res, cre_index), lookup)
+    queryMetrics.observe("query_result_size", len(result.bins), kind="rows")
+    return result
+
+
+# -------------------- Rendering --------------------
+
+# epigenomic tracks of chrom:start-end, binned to the plot width
+def build_signal_tracks(chrom, start, end, dpi=None):
+    import signalTracks
+    import trackRenderer
+    n_bins = trackRenderer.plot_width_pixels(dpi or trackRenderer.DEFAULT_DPI)
+    pyramids = signal_pyramids()
+    keys = [key for key, __, __, __ in signalTracks.SIGNAL_TRACKS]
+    signals = {
+        key: signalTracks.pyramid_signal(pyramids[key], chrom, start, end, n_bins)
+        for key in keys if key in pyramids
+    }
+    # tracks without a pyramid are read from their bigwig, in parallel on the signal pool of this process;
+    # the first plot waits for those still being provisioned, a render worker is given the paths of its job
+    if _job_bigwig_paths is not None:
+        bigwig_paths = {key: _job_bigwig_paths[key] for key in keys if key not in pyramids}
+    else:
+        futures = bigwig_futures()
+        bigwig_paths = {key: futures[key].result() for key in keys if key not in pyramids}
+    if bigwig_paths:
+        pool = signal_pool()
+        try:
+            signals.update(signalTracks.fetch_signals(pool, bigwig_paths, chrom, start, end, n_bins))
+        except BrokenProcessPool:
+            # a signal worker died and took the pool with it, the read runs again on a new one
+            signal_pool.discard(pool)
+            pool.shutdown(wait=False)
+            signals.update(signalTracks.fetch_signals(signal_pool(), bigwig_paths, chrom, start, end, n_bins))
+    return [
+        trackRenderer.signal_track(title, color, max_val, *signals[key])
+        for key, title, color, max_val in signalTracks.SIGNAL_TRACKS
+    ]
+
+
+# tracks of an .ini for one view: only the plotted window is read from the tabix
+# indexed files, without indexes the whole genome is parsed once and kept resident
+def load_view_tracks(tracks_path, chrom, start, end):
+    import trackRenderer
+    if tracks_are_indexed(tracks_path):
+        return trackRenderer.load_window_tracks(tracks_path, chrom, start, end)
+    return resident_tracks(tracks_path)
+
+
+def gene_view_tracks(chrom, start, end):
+    return load_view_tracks(os.path.join(TRACKS_DIR, GENE_VIEW_TRACKS), chrom, start, end)
+
+
+def region_tracks_path(subChoice, res, cre_index):
+    """.ini of the loops, genes and promoters drawn for a region query."""
+    if subChoice == 0:
+        return os.path.join(TRACKS_DIR, MERGED_TRACKS[res][promoter_set(cre_index)])
+    label = loopIndex.SUBTYPE_LABELS[subChoice].lower()
+    return os.path.join(TRACKS_DIR, f"tracks_{label}_{'all' if cre_index == 0 else 'canon'}.ini")
+
+
+def cached_image(key, render):
+    """
+    Image of key from the image cache, else from render() (timed as "render")
+    and cached. Render jobs always render, their images are cached by the
+    scheduler.
+    """
+    image_cache = None if _rendering_job else query_caches()["images"]
+    track_image = None if image_cache is None else image_cache.get(key)
+    if track_image is None:
+        with queryMetrics.span("render"):
+            track_image = render()
+        if image_cache is not None:
+            image_cache.put(key, track_image)
+        queryMetrics.observe("query_result_size", len(track_image), kind="image_bytes")
+    return track_image
+
+
+def render_gene(hits, image_format=None):
+    """Encoded gene view of a non-empty GeneHits."""
+    import geneView
+    image_format = image_format or TRACK_IMAGE_FORMAT
+    return cached_image(
+        ("gene", hits.gene, hits.subChoice, hits.res, hits.cre_index, image_format),
+        lambda: geneView.render_gene_view(
+            hits.links, hits.gene, gene_annotation(), gene_view_tracks, build_signal_tracks, image_format=image_format
+        ),
+    )
+
+
+def render_region(result, image_format=None):
+    """Encoded loop view of a non-empty RegionCREs: the subtype .ini around its CREs plus the signal."""
+    import trackRenderer
+    image_format = image_format or TRACK_IMAGE_FORMAT
+
+    def render():
+        extended_min_start, extended_max_end = trackRenderer.get_genomic_range(result.links)
+        chrom = f"chr{result.links.iloc[0, 0]}"
+        # loops, genes and promoters of the subtype .ini
+        with queryMetrics.span("tracks"):
+            loop_view = load_view_tracks(region_tracks_path(result.subChoice, result.res, result.cre_index),
+                                         chrom, extended_min_start, extended_max_end)
+        with queryMetrics.span("signal"):
+            signal_tracks = build_signal_tracks(chrom, extended_min_start, extended_max_end)
+        return trackRenderer.render_tracks(
+            loop_view,
+            [*loop_view.track_obj_list, *signal_tracks],
+            chrom, extended_min_start, extended_max_end, image_format=image_format
+        )
+
+    return cached_image(
+        ("region", result.chrom, result.start, result.end, result.subChoice, result.res, result.cre_index, image_format),
+        render,
+    )
+
+
+def render_overview(result, image_format=None):
+    """Encoded overview of a RegionOverview: arcs, loop and CRE density and low resolution signal."""
+    import overviewView
+    image_format = image_format or TRACK_IMAGE_FORMAT
+    chrom = f"chr{result.chrom}"
+    return cached_image(
+        ("overview", result.chrom, result.start, result.end, result.subChoice, result.res, result.cre_index, image_format),
+        lambda: overviewView.render_overview(
+            result.bins, result.arcs, chrom, result.start, result.end,
+            load_view_tracks(os.path.join(TRACKS_DIR, OVERVIEW_TRACKS), chrom, result.start, result.end),
+            build_signal_tracks, image_format=image_format
+        ),
+    )
+
+
+def render_comparison(result, image_format=None):
+    """Encoded stacked subtype view of a non-empty SubtypeComparison."""
+    import compareView
+    image_format = image_format or TRACK_IMAGE_FORMAT
+    return cached_image(
+        ("compare", result.focus, *result.query, result.cre_index, image_format),
+        lambda: compareView.render_compare_view(
+            result.table, gene_annotation(), gene_view_tracks, build_signal_tracks, result.gene, image_format=image_format
+        ),
+    )
+
+
+# -------------------- Jobs --------------------
+
+# queries and their renderers by kind, a job is a kind and the arguments of its query
+QUERIES = {
+    "gene": gene_query,
+    "region": region_query,
+    "compare": compare_query,
+    "overview": overview_query,
+}
+
+RENDERERS = {
+    "gene": render_gene,
+    "region": render_region,
+    "compare": render_comparison,
+    "overview": render_overview,
+}
+
+
+def render_query(kind, args, image_format=None, bigwig_paths=None):
+    """
+    What render workers run: the image of the kind query with args (None if
+    it found nothing to draw) and the observations of its render stages (see
+    queryMetrics.recording), for the process that submitted the job. The
+    signal of tracks without a pyramid is read from bigwig_paths ({key: local
+    bigWig}) by the signal pool of this process, started on the first read.
+    """
+    global _job_bigwig_paths, _rendering_job
+    result = QUERIES[kind](*args)
+    if result.empty:
+        return None, []
+    _job_bigwig_paths, _rendering_job = bigwig_paths, True
+    try:
+        with queryMetrics.recording() as recorded:
+            track_image = RENDERERS[kind](result, image_format)
+    finally:
+        _job_bigwig_paths, _rendering_job = None, False
+    return track_image, recorded
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Process-wide latency and size histograms of the query stages, shared by the
+app, the batch CLI and the benchmarks. Stages are timed with span(), the
+analyzer a span belongs to is set once per query by timed_request().
+Exposed as Prometheus text (prometheus_text, serve_metrics) and as
+p50/p95 summaries (summary).
+"""
+
+import contextlib
+import contextvars
+import functools
+import http.server
+import resource
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# -------------------- Configuration --------------------
+
+# upper bounds of the histogram buckets, seconds for stages and counts/bytes for sizes
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+SIZE_BUCKETS = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000]
+
+# recent observations kept per series for the percentiles
+RECENT_SAMPLES = 2048
+
+# also record how much each stage raised the peak RSS of the process (benchmarks)
+TRACK_RSS = False
+
+HELP = {
+    "query_stage_seconds": "Time spent in each stage of a query.",
+    "query_result_size": "Rows of result tables and bytes of rendered images.",
+    "query_stage_peak_rss_growth_bytes": "Growth of the process peak RSS during each stage of a query.",
+}
+
+# analyzer of the query running in the current thread
+_analyzer = contextvars.ContextVar("analyzer", default="none")
+# observations of the current thread collected by recording(), None when not recording
+_recording = contextvars.ContextVar("recording", default=None)
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a window of recent values for percentiles."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[np.searchsorted(self.buckets, value, side="left")] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+
+# -------------------- Recording --------------------
+
+def observe(name, value, buckets=SIZE_BUCKETS, **labels):
+    """Record value in the histogram name of the current analyzer and labels."""
+    recorded = _recording.get()
+    if recorded is not None:
+        recorded.append((name, value, buckets, labels))
+    key = (name, tuple(sorted({"analyzer": _analyzer.get(), **labels}.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time the enclosed block as stage of the current query."""
+    peak_rss = peak_rss_bytes() if TRACK_RSS else 0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("query_stage_seconds", time.perf_counter() - start, LATENCY_BUCKETS, stage=stage)
+        if TRACK_RSS:
+            observe("query_stage_peak_rss_growth_bytes", peak_rss_bytes() - peak_rss, SIZE_BUCKETS, stage=stage)
+
+
+@contextlib.contextmanager
+def recording():
+    """
+    Collect the observations of the enclosed block as (name, value, buckets,
+    labels) in the yielded list, e.g. to replay them in another process.
+    """
+    recorded = []
+    token = _recording.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _recording.reset(token)
+
+
+def replay(recorded, **labels):
+    """Observe the observations of recording() again in this process, with labels added."""
+    for name, value, buckets, recorded_labels in recorded:
+        observe(name, value, buckets, **{**recorded_labels, **labels})
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory():
+    """
+    Current RSS and PSS (memory-mapped pages shared with other processes
+    counted in part) of this process in bytes, None where /proc does not
+    report them, and the peak RSS.
+    """
+    memory = {"rss": None, "pss": None, "peak_rss": peak_rss_bytes()}
+    for field, path, key in [("rss", "/proc/self/status", "VmRSS:"), ("pss", "/proc/self/smaps_rollup", "Pss:")]:
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(key):
+                        memory[field] = int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return memory
+
+
+def timed_request(analyzer):
+    """Decorator: spans inside the function belong to analyzer, the whole call is its "total" stage."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = _analyzer.set(analyzer)
+            try:
+                with span("total"):
+                    return function(*args, **kwargs)
+            finally:
+                _analyzer.reset(token)
+        return wrapper
+    return decorator
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+# -------------------- Reporting --------------------
+
+def summary():
+    """[{"metric", labels..., "count", "mean", "p50", "p95", "max"}] over the recent values of every series."""
+    with _lock:
+        series = [(name, labels, np.array(histogram.recent), histogram.count)
+                  for (name, labels), histogram in sorted(_histograms.items())]
+    return [
+        {
+            "metric": name, **dict(labels), "count": count,
+            "mean": float(values.mean()), "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)), "max": float(values.max()),
+        }
+        for name, labels, values, count in series if len(values)
+    ]
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{str(value)}"' for name, value in labels)
+
+
+def prometheus_text(cache_stats=None):
+    """
+    Every histogram in the Prometheus text exposition format, followed by the
+    counters of the query caches (cache_stats: {cache name: LRUCache.stats()}).
+    """
+    lines = []
+    with _lock:
+        by_name = {}
+        for (name, labels), histogram in sorted(_histograms.items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                cumulative = np.cumsum(histogram.counts)
+                for bound, count in zip([*histogram.buckets, "+Inf"], cumulative):
+                    lines.append(f'{name}_bucket{{{format_labels([*labels, ("le", bound)])}}} {count}')
+                lines.append(f"{name}_sum{{{format_labels(labels)}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{format_labels(labels)}}} {histogram.count}")
+
+    if cache_stats:
+        lines.append("# HELP query_cache_lookups_total Lookups of the query caches by result.")
+        lines.append("# TYPE query_cache_lookups_total counter")
+        for cache, stats in cache_stats.items():
+            for result in ["hits", "disk_hits", "misses"]:
+                lines.append(f'query_cache_lookups_total{{cache="{cache}",result="{result}"}} {stats[result]}')
+        lines.append("# HELP query_cache_evictions_total Entries evicted from memory.")
+        lines.append("# TYPE query_cache_evictions_total counter")
+        for cache, stats in cache_stats.items():
+            lines.append(f'query_cache_evictions_total{{cache="{cache}"}} {stats["evictions"]}')
+        lines.append("# HELP query_cache_bytes Bytes held in memory by the query caches.")
+        lines.append("# TYPE query_cache_bytes gauge")
+        for cache, stats in cache_stats.items():
+            lines.append(f'query_cache_bytes{{cache="{cache}"}} {stats["bytes"]}')
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port, cache_stats=None):
+    """
+    Serve prometheus_text on http://0.0.0.0:port/metrics from a daemon thread.
+    cache_stats is called on every scrape.
+    """
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text(cache_stats() if cache_stats else None).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+HTTP/JSON API over queryEngine for other tools, one warm process serving
+many clients. Lookups run on a thread pool, track images on the render
+processes of renderJobs; identical requests in flight at the same time share
+one lookup or render, and result tables are streamed in chunks as JSON or
+CSV. Run from the repository root:
+
+    python queryServer.py --port 8600
+
+    GET /gene?gene=KRAS&subtype=0&res=10k&promoters=all[&format=csv|tsv|bedpe|parquet]
+    GET /region?chrom=12&start=25000000&end=25500000[&table=cres|links|other]
+    GET /compare?gene=KRAS  or  /compare?chrom=12&start=...&end=...[&table=rows|presence]
+    GET /overview?chrom=12[&start=...&end=...][&table=bins|arcs|windows]  (any size, whole chromosome by default)
+    GET /render/gene?gene=KRAS[&image_format=png|svg|webp]  (also /render/region, /render/compare, /render/overview)
+    GET /health, GET /metrics
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import tornado.web
+import loopIndex
+import queryEngine
+import queryMetrics
+import renderJobs
+import resultExport
+
+# -------------------- Configuration --------------------
+
+PORT = 8600
+LOOKUP_WORKERS = 4
+
+# rows per chunk of a streamed table
+STREAM_ROWS = 5000
+# largest region a query may cover, as in the app
+MAX_REGION = 1_000_000
+
+IMAGE_TYPES = {"png": "image/png", "svg": "image/svg+xml", "webp": "image/webp"}
+
+
+# -------------------- Queries --------------------
+
+# lookups are recorded as their own analyzers, apart from the app's
+TIMED_QUERIES = {kind: queryMetrics.timed_request(f"api_{kind}")(query) for kind, query in queryEngine.QUERIES.items()}
+
+
+def lookup(kind, args):
+    return TIMED_QUERIES[kind](*args)
+
+
+class QueryService:
+    """Worker pools and the requests in flight of one server process."""
+
+    def __init__(self, lookup_workers=LOOKUP_WORKERS, render_workers=renderJobs.RENDER_WORKERS):
+        self.lookup_pool = ThreadPoolExecutor(max_workers=lookup_workers, thread_name_prefix="api-lookup")
+        # renders are shared by identical requests in the scheduler
+        self.renders = renderJobs.RenderScheduler(render_workers)
+        # (request kind, arguments) -> lookup future shared by every identical request in flight
+        self.in_flight = {}
+
+    async def coalesced(self, key, pool, function, *args):
+        """
+        Result of function(*args) on pool, shared with every identical request
+        (same key) already running. A client that disconnects does not cancel
+        the work of the others.
+        """
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.wrap_future(pool.submit(function, *args))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda __: self.in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def lookup(self, kind, args):
+        return await self.coalesced(("lookup", kind, args), self.lookup_pool, lookup, kind, args)
+
+    async def render(self, kind, args, image_format):
+        # no owner: a client that disconnects does not cancel the render of the others
+        return await asyncio.shield(asyncio.wrap_future(self.renders.submit(kind, args, image_format)))
+
+    def shutdown(self):
+        self.lookup_pool.shutdown(wait=False, cancel_futures=True)
+        self.renders.shutdown()
+
+
+# -------------------- Handlers --------------------
+
+class BaseHandler(tornado.web.RequestHandler):
+
+    def initialize(self, service):
+        self.service = service
+
+    def write_error(self, status_code, **kwargs):
+        error = self._reason
+        if "exc_info" in kwargs and not isinstance(kwargs["exc_info"][1], tornado.web.HTTPError):
+            error = f"{error}: {kwargs['exc_info'][1]}"
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": error}))
+
+    def fail(self, status_code, message):
+        raise tornado.web.HTTPError(status_code, reason=message)
+
+    def int_argument(self, name, default=None):
+        value = self.get_argument(name, None)
+        if value is None:
+            if default is None:
+                self.fail(400, f"missing parameter {name}")
+            return default
+        try:
+            return int(value.replace(",", ""))
+        except ValueError:
+            self.fail(400, f"{name} must be an integer")
+
+    def choice_argument(self, name, choices, default):
+        value = self.get_argument(name, default)
+        if value not in choices:
+            self.fail(400, f"{name} must be one of {', '.join(map(str, choices))}")
+        return value
+
+    def cre_index(self):
+        return queryEngine.PROMOTER_SETS[self.choice_argument("promoters", list(queryEngine.PROMOTER_SETS), "all")]
+
+    def loop_set(self):
+        """subChoice and res: 0 for all BCP-ALL cases at 1k or 10k, 1-8 for the subtypes at 10k."""
+        subChoice = self.int_argument("subtype", 0)
+        if subChoice != 0 and subChoice not in loopIndex.SUBTYPE_SOURCES:
+            self.fail(400, "subtype must be 0 (all cases) or 1-8")
+        res = self.choice_argument("res", ["1k", "10k"], "10k")
+        if subChoice != 0 and res != "10k":
+            self.fail(400, "subtype specific maps are only available at 10k")
+        return subChoice, res
+
+    def gene(self):
+        return self.get_argument("gene").strip().upper()
+
+    def region(self, max_size=MAX_REGION):
+        """chrom, start, end of the request; without max_size start and end are optional, end None for the chromosome end."""
+        chrom = self.get_argument("chrom").removeprefix("chr")
+        if chrom not in queryEngine.CHROMOSOMES:
+            self.fail(400, "chrom must be one of 1-22, X and Y")
+        start = self.int_argument("start", 0 if max_size is None else None)
+        if max_size is None and self.get_argument("end", None) is None:
+            # looked up by the query on the lookup pool, not on the event loop
+            return chrom, start, None
+        end = self.int_argument("end")
+        if start >= end:
+            self.fail(400, "start must be smaller than end")
+        if max_size is not None and end - start > max_size:
+            self.fail(400, f"regions are limited to {MAX_REGION:,} bp")
+        return chrom, start, end
+
+    def query_args(self, kind):
+        """Arguments of queryEngine.QUERIES[kind] from the request parameters."""
+        if kind == "gene":
+            subChoice, res = self.loop_set()
+            return (self.gene(), subChoice, res, self.cre_index())
+        if kind == "region":
+            subChoice, res = self.loop_set()
+            return (*self.region(), subChoice, res, self.cre_index())
+        if kind == "overview":
+            subChoice, res = self.loop_set()
+            return (*self.region(max_size=None), subChoice, res, self.cre_index())
+        if self.get_argument("gene", None) is not None:
+            return ("gene", self.cre_index(), self.gene())
+        return ("region", self.cre_index(), None, *self.region())
+
+    async def run_lookup(self, kind):
+        args = self.query_args(kind)
+        try:
+            return await self.service.lookup(kind, args)
+        except queryEngine.UnknownGeneError as e:
+            self.fail(404, str(e))
+
+    async def stream_table(self, query, table):
+        """
+        Write table in chunks of STREAM_ROWS rows, as a JSON object
+        {"query": ..., "count": ..., "rows": [...]} or in one of the formats
+        of resultExport (format=csv, tsv, bedpe or parquet).
+        """
+        fmt = self.choice_argument("format", ["json", *resultExport.export_formats(table)], "json")
+        if fmt != "json":
+            self.set_header("Content-Type", resultExport.EXPORT_FORMATS[fmt])
+            for data in resultExport.iter_export(table, fmt, STREAM_ROWS):
+                self.write(data)
+                await self.flush()
+            self.finish()
+            return
+
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({"query": query, "count": len(table)})[:-1] + ', "rows": [')
+        for offset in range(0, len(table), STREAM_ROWS):
+            chunk = table.iloc[offset:offset + STREAM_ROWS]
+            self.write(("," if offset else "") + chunk.to_json(orient="records")[1:-1])
+            await self.flush()
+        self.finish("]}")
+
+
+class GeneHandler(BaseHandler):
+    async def get(self):
+        hits = await self.run_lookup("gene")
+        query = {"gene": hits.gene, "subtype": hits.subChoice, "res": hits.res,
+                 "promoters": queryEngine.promoter_set(hits.cre_index), "regions": list(hits.regions)}
+        await self.stream_table(query, hits.links)
+
+
+class RegionHandler(BaseHandler):
+    async def get(self):
+        result = await self.run_lookup("region")
+        query = {"chrom": result.chrom, "start": result.start, "end": result.end, "subtype": result.subChoice,
+                 "res": result.res, "promoters": queryEngine.promoter_set(result.cre_index)}
+        table_name = self.choice_argument("table", ["cres", "links", "other"], "cres")
+        if table_name == "cres":
+            table = result.cre_targets()
+        elif table_name == "links":
+            table = result.links
+        else:
+            table = pd.DataFrame(result.other_loop_pairs(), columns=["anchor1", "anchor2"])
+        await self.stream_table({**query, "table": table_name}, table)
+
+
+class CompareHandler(BaseHandler):
+    async def get(self):
+        result = await self.run_lookup("compare")
+        query = {"focus": result.focus, "query": list(result.query), "promoters": queryEngine.promoter_set(result.cre_index)}
+        table_name = self.choice_argument("table", ["rows", "presence"], "rows")
+        table = result.table if table_name == "rows" else result.presence().rename_axis("CRE").reset_index()
+        await self.stream_table({**query, "table": table_name}, table)
+
+
+class OverviewHandler(BaseHandler):
+    async def get(self):
+        result = await self.run_lookup("overview")
+        query = {"chrom": result.chrom, "start": result.start, "end": result.end, "subtype": result.subChoice,
+                 "res": result.res, "promoters": queryEngine.promoter_set(result.cre_index)}
+        table_name = self.choice_argument("table", ["bins", "arcs", "windows"], "bins")
+        table = {"bins": result.bins, "arcs": result.arcs}.get(table_name)
+        if table is None:
+            table = result.zoom_windows()
+        await self.stream_table({**query, "table": table_name}, table)
+
+
+class RenderHandler(BaseHandler):
+    async def get(self, kind):
+        args = self.query_args(kind)
+        image_format = self.choice_argument("image_format", list(IMAGE_TYPES), queryEngine.TRACK_IMAGE_FORMAT)
+        try:
+            track_image = await self.service.render(kind, args, image_format)
+        except queryEngine.UnknownGeneError as e:
+            self.fail(404, str(e))
+        if track_image is None:
+            self.fail(404, "no loops to draw for this query")
+        self.set_header("Content-Type", IMAGE_TYPES[image_format])
+        self.finish(track_image)
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.finish({"status": "ok", "in_flight": len(self.service.in_flight), "renders_in_flight": self.service.renders.in_flight()})
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(queryMetrics.prometheus_text(queryEngine.cache_stats()))
+
+
+def make_app(service):
+    handler_args = {"service": service}
+    return tornado.web.Application([
+        (r"/gene", GeneHandler, handler_args),
+        (r"/region", RegionHandler, handler_args),
+        (r"/compare", CompareHandler, handler_args),
+        (r"/overview", OverviewHandler, handler_args),
+        (r"/render/(gene|region|compare|overview)", RenderHandler, handler_args),
+        (r"/health", HealthHandler, handler_args),
+        (r"/metrics", MetricsHandler, handler_args),
+    ])
+
+
+# -------------------- Command line --------------------
+
+async def serve(port, lookup_workers, render_workers):
+    queryEngine.check_data()
+    service = QueryService(lookup_workers, render_workers)
+    app = make_app(service)
+    app.listen(port)
+    print(f"serving on http://0.0.0.0:{port}")
+    # lookup resources load in the background, requests arriving before wait for them
+    asyncio.get_running_loop().run_in_executor(service.lookup_pool, queryEngine.warm_up, False)
+    service.renders.warm(renderJobs.warm_up_jobs(), queryEngine.TRACK_IMAGE_FORMAT)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--lookup-workers", type=int, default=LOOKUP_WORKERS)
+    parser.add_argument("--render-workers", type=int, default=renderJobs.RENDER_WORKERS)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.lookup_workers, args.render_workers))
+
+
+if __name__ == "__main__":
+    main()
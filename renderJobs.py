@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Background rendering of track images. Render jobs of a server process run
+on a pool of render processes (pyGenomeTracks draws through pyplot, which
+is not thread safe), so pages show their tables as soon as the lookup is
+done and fill the image in when it is ready. Identical jobs pending at the
+same time run once, a job nobody waits for any more is cancelled before it
+starts, and finished images are kept in queryEngine's image cache, where
+popular genes are rendered ahead at startup. The bigWigs are provisioned by
+the scheduler's process only, render workers are given their paths and read
+the tracks of a job in parallel on a signal pool of their own, started when
+a track without a signal pyramid is first read. Needs no streamlit.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import queryEngine
+import queryMetrics
+
+# -------------------- Configuration --------------------
+
+# render processes, each with its own matplotlib, track parsers and signal readers
+RENDER_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# genes rendered (merged 10k, all promoters) at startup so their first view is a cache hit,
+# WARM_GENES="" to skip
+WARM_GENES = [gene for gene in os.environ.get(
+    "WARM_GENES", "KRAS,NRAS,ETV6,RUNX1,PAX5,IKZF1,CDKN2A,MYC,CRLF2,TCF3,PBX1,KMT2A,ABL1,BCR,ERG,DUX4"
+).split(",") if gene]
+
+# failed jobs remembered for FAILED_JOB_SECONDS, so a page waiting for one does not
+# submit it again on every rerun but a failure that was transient is retried
+MAX_FAILED_JOBS = 256
+FAILED_JOB_SECONDS = 30
+
+
+def _init_render_worker():
+    # pyGenomeTracks resets its loggers to DEBUG for every track it creates
+    logging.disable(logging.INFO)
+    # results are kept in memory by the scheduler's process, workers share its disk tier only
+    queryEngine.QUERY_CACHE_MAX_MB = 0
+    # lookup data loaded before the first job, missing data is reported by the jobs themselves
+    try:
+        queryEngine.warm_up(render=False)
+    except Exception:
+        pass
+
+
+def job_key(kind, args, image_format):
+    return ("job", kind, tuple(args), image_format)
+
+
+def warm_up_jobs(genes=None):
+    """(kind, args) of the jobs rendered ahead at startup."""
+    return [("gene", (gene, 0, "10k", 0)) for gene in (WARM_GENES if genes is None else genes)]
+
+
+# -------------------- Scheduler --------------------
+
+class RenderScheduler:
+    """
+    Render jobs of one server process. A job's future gives the encoded
+    image of its query, or None if the query found nothing to draw.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS):
+        self.workers = workers
+        self.pool = self.start_pool()
+        self.lock = threading.RLock()
+        # job key -> future of the job pending or running, and who waits for it
+        # (None for callers that never give up on a job)
+        self.pending = {}
+        self.owners = {}
+        # job key -> future of the job in the render pool, once its bigWigs are provisioned
+        self.queued = {}
+        # owner -> key of the job it waits for
+        self.waiting = {}
+        # job key -> (error, time it failed)
+        self.failed = OrderedDict()
+        # the bigWigs of tracks without a pyramid, provisioned in this process only
+        self.bigwigs = queryEngine.bigwig_sources()
+
+    def start_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+        )
+
+    def submit(self, kind, args, image_format, owner=None):
+        """
+        Future of the job (already done if its image is cached). With owner
+        (e.g. a browser session) the job replaces the one the owner waited
+        for before, which is cancelled unless someone else waits for it or
+        it already started.
+        """
+        key = job_key(kind, args, image_format)
+        with self.lock:
+            if owner is not None:
+                self.release(owner, keep=key)
+            future = self.pending.get(key) or self.finished(key)
+            if future is None:
+                future = self.start(key, kind, args, image_format)
+            if key in self.owners:
+                self.owners[key].add(owner)
+                if owner is not None:
+                    self.waiting[owner] = key
+            return future
+
+    def start(self, key, kind, args, image_format):
+        # the job is queued once the bigWigs it may read are provisioned, without blocking the caller
+        future = Future()
+        self.pending[key] = future
+        self.owners[key] = set()
+        future.add_done_callback(lambda done: self.finish(key, done))
+        started = time.perf_counter()
+        waiting = list(self.bigwigs.values())
+        if not waiting:
+            self.queue(key, future, kind, args, image_format, started)
+            return future
+        remaining = [len(waiting)]
+
+        def provisioned(__):
+            with self.lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self.queue(key, future, kind, args, image_format, started)
+
+        for bigwig in waiting:
+            bigwig.add_done_callback(provisioned)
+        return future
+
+    def queue(self, key, future, kind, args, image_format, started):
+        # submit the job of future to the render pool, unless it was cancelled while its bigWigs were
+        # provisioned; a job of the same key submitted since is queued by its own callbacks
+        if self.pending.get(key) is not future or future.done():
+            return
+        try:
+            bigwig_paths = {track: bigwig.result() for track, bigwig in self.bigwigs.items()}
+        except Exception as e:
+            future.set_exception(e)
+            return
+        job_args = (queryEngine.render_query, kind, args, image_format, bigwig_paths)
+        try:
+            rendering = self.pool.submit(*job_args)
+        except BrokenProcessPool:
+            # a render process died, the jobs it took down have failed already
+            self.pool = self.start_pool()
+            rendering = self.pool.submit(*job_args)
+        self.queued[key] = rendering
+        rendering.add_done_callback(lambda done: self.rendered(future, kind, started, done))
+
+    def rendered(self, future, kind, started, rendering):
+        # pass the outcome of the render pool on to the job, cancelled with it while still queued
+        if rendering.cancelled():
+            return
+        error = rendering.exception()
+        if error is not None:
+            future.set_exception(error)
+            return
+        track_image, recorded = rendering.result()
+        # the render stages timed in the worker, and the time from submission
+        # with the wait for the bigWigs and a free render process included
+        queryMetrics.replay(recorded, analyzer=kind)
+        queryMetrics.observe("query_stage_seconds", time.perf_counter() - started,
+                             queryMetrics.LATENCY_BUCKETS, analyzer=kind, stage="job")
+        future.set_result(track_image)
+
+    def finished(self, key):
+        # done future of a cached image or a recent failure, None for neither
+        track_image = queryEngine.query_caches()["images"].get(key)
+        error = None
+        with self.lock:
+            if key in self.failed:
+                error, failed_at = self.failed[key]
+                if time.monotonic() - failed_at > FAILED_JOB_SECONDS:
+                    del self.failed[key]
+                    error = None
+        if track_image is None and error is None:
+            return None
+        future = Future()
+        if track_image is not None:
+            future.set_result(track_image)
+        else:
+            future.set_exception(error)
+        return future
+
+    def finish(self, key, future):
+        # runs when a job is done or cancelled, results are stored before the job stops being pending
+        if not future.cancelled():
+            error = future.exception()
+            if error is not None:
+                # a crashed render process is not the job's fault, the next submission runs it again
+                if not isinstance(error, BrokenProcessPool):
+                    with self.lock:
+                        self.failed[key] = (error, time.monotonic())
+                        while len(self.failed) > MAX_FAILED_JOBS:
+                            self.failed.popitem(last=False)
+            elif future.result() is not None:
+                queryEngine.query_caches()["images"].put(key, future.result())
+        with self.lock:
+            self.pending.pop(key, None)
+            self.queued.pop(key, None)
+            for owner in self.owners.pop(key, ()):
+                if self.waiting.get(owner) == key:
+                    del self.waiting[owner]
+
+    def release(self, owner, keep=None):
+        """Stop waiting for the job of owner, cancelled if nobody else waits for it and it has not started."""
+        with self.lock:
+            key = self.waiting.pop(owner, None)
+            if key is None or key == keep or key not in self.owners:
+                return
+            self.owners[key].discard(owner)
+            if not self.owners[key]:
+                # only succeeds while the job waits for its bigWigs or a render process, finish() then drops it
+                rendering = self.queued.get(key)
+                if rendering is None or rendering.cancel():
+                    self.pending[key].cancel()
+
+    def warm(self, jobs, image_format):
+        """Render jobs one at a time in the background, leaving the other render processes to the users."""
+        def run():
+            for kind, args in jobs:
+                try:
+                    self.submit(kind, args, image_format).result()
+                except Exception:
+                    pass
+
+        thread = threading.Thread(target=run, name="render-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.pending)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Chunked export of result tables as CSV, TSV, BEDPE or Parquet. Tables are
+serialized EXPORT_CHUNK_ROWS rows at a time into a stream of bytes, so a
+large result is never held as one text or file image on top of its table;
+the app, the API server and the batch CLI all export through here.
+"""
+
+import io
+import os
+
+# -------------------- Configuration --------------------
+
+EXPORT_CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "tsv": "text/tab-separated-values",
+    "bedpe": "text/plain",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# anchor columns of link tables, the two sides of a BEDPE line
+PAIR_COLUMNS = ['chr', 'start', 'end', 'interChr', 'interStart', 'interEnd']
+
+
+# -------------------- Formats --------------------
+
+def export_formats(table):
+    """Formats table can be written in: BEDPE only for tables with both anchors of every loop."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "bedpe" or set(PAIR_COLUMNS) <= set(table.columns)]
+
+
+def format_of_path(path):
+    """Export format named by the extension of path, CSV for unknown ones."""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in EXPORT_FORMATS else "csv"
+
+
+def row_chunks(table, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Consecutive row slices of table, at least one (empty) slice for an empty table."""
+    for offset in range(0, max(len(table), 1), chunk_rows):
+        yield table.iloc[offset:offset + chunk_rows]
+
+
+def bedpe_lines(chunk):
+    """
+    BEDPE text of a slice of a link table: both anchors with a "chr" prefix,
+    the target gene (or subtype) as name, no score or strands.
+    """
+    name = chunk['target'] if 'target' in chunk else chunk['subtype'] if 'subtype' in chunk else "."
+    chrom1 = "chr" + chunk['chr'].astype(str).str.removeprefix("chr")
+    chrom2 = "chr" + chunk['interChr'].astype(str).str.removeprefix("chr")
+    return chunk[PAIR_COLUMNS].assign(chr=chrom1, interChr=chrom2, name=name, score=".") \
+        .to_csv(sep="\t", index=False, header=False)
+
+
+# -------------------- Export --------------------
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until it is taken with drain()."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_parquet(table, chunk_rows):
+    # one row group per chunk, sent as soon as it is encoded
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.Schema.from_pandas(table.iloc[:0], preserve_index=False)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in row_chunks(table, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_export(table, fmt="csv", chunk_rows=EXPORT_CHUNK_ROWS):
+    """Bytes of table in fmt (one of EXPORT_FORMATS), chunk by chunk. Parquet needs pyarrow."""
+    if fmt not in export_formats(table):
+        raise ValueError(f"a table with columns {list(table.columns)} cannot be exported as {fmt}")
+    if fmt == "parquet":
+        yield from iter_parquet(table, chunk_rows)
+        return
+    for i, chunk in enumerate(row_chunks(table, chunk_rows)):
+        if fmt == "bedpe":
+            yield bedpe_lines(chunk).encode()
+        else:
+            yield chunk.to_csv(sep="\t" if fmt == "tsv" else ",", index=False, header=i == 0).encode()
+
+
+def export_bytes(table, fmt="csv"):
+    """The whole export of table in fmt, for downloads that take their data in one piece."""
+    return b"".join(iter_export(table, fmt))
+
+
+def write_export(table, path, fmt=None):
+    """Write table to path chunk by chunk, in fmt or the format of its extension."""
+    with open(path, "wb") as f:
+        for data in iter_export(table, fmt or format_of_path(path)):
+            f.write(data)
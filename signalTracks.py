@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Epigenomic signal (bigWig) extraction for the genome track plots.
+Plots read precomputed, memory-mapped signal pyramids when buildData.py has
+built them. Otherwise the bigWigs are read directly: pyBigWig holds the GIL
+while it reads, so the tracks of a query are read in parallel by a pool of
+worker processes, each with its own open handles.
+"""
+
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyBigWig
+import bigwigStore
+
+# -------------------- Configuration --------------------
+
+# bigwig key, title, color, max value of the tracks below the loops
+SIGNAL_TRACKS = [
+    ("h3k4me1", "H3K4me1", "green", 30),
+    ("h3k4me3", "H3K4me3", "green", 30),
+    ("h3k27ac", "H3K27ac", "green", 30),
+    ("h3k27me3", "H3K27me3", "green", 30),
+    ("dnase", "DNase", "grey", 1),
+]
+
+PYRAMID_DIR = os.path.join(os.getcwd(), "data", "signal_pyramids")
+# bin sizes (bp) of the precomputed signal pyramids, finest first, each a multiple of the previous
+PYRAMID_LEVELS = [100, 1_000, 10_000, 100_000]
+# level bins per plot bin at least, so plot bin edges snap to within a quarter of a bin
+PYRAMID_BINS_PER_PIXEL = 4
+# bases read from the bigWig per step while building, a multiple of every level
+PYRAMID_CHUNK = 10_000_000
+
+
+# -------------------- Functions --------------------
+
+def fetch_bigwigs():
+    """Local path of every track of the bigwig manifest, provisioned by bigwigStore if missing."""
+    return bigwigStore.provision_all(bigwigStore.read_manifest())
+
+
+def binned_signal(bw, chrom, start, end, n_bins, summary="max"):
+    """
+    Signal of chrom:start-end summarised into n_bins float32 bins with pyBigWig's
+    own zoom levels. Returns (end, scores), end clipped to the chromosome size.
+    Bins without data are NaN.
+    """
+    chrom_size = bw.chroms(chrom)
+    start = max(0, int(start))
+    if chrom_size is None or start >= chrom_size:
+        return end, np.full(n_bins, np.nan, dtype=np.float32)
+    end = min(int(end), chrom_size)
+    n_bins = max(1, min(n_bins, end - start))
+    scores = bw.stats(chrom, start, end, nBins=n_bins, type=summary)
+    return end, np.array([np.nan if score is None else score for score in scores], dtype=np.float32)
+
+
+# -------------------- Signal pyramids --------------------
+
+def max_bins(values, factor):
+    """Max of every factor consecutive values, NaN (no data) ignored unless a whole bin is NaN."""
+    padded = np.pad(values, (0, -len(values) % factor), constant_values=np.nan)
+    return np.fmax.reduce(padded.reshape(-1, factor), axis=1)
+
+
+def build_signal_pyramid(bigwig_path, pyramid_dir, levels=PYRAMID_LEVELS):
+    """
+    Max signal of a bigWig in bins of every level, one float32 .npy per level
+    with all chromosomes concatenated, plus meta.json with their offsets and
+    the sha256 of the source (the name of its object in bigwigStore).
+    """
+    bw = pyBigWig.open(bigwig_path)
+    chroms = bw.chroms()
+    per_level = {level: [] for level in levels}
+    for chrom, size in chroms.items():
+        finest = []
+        for start in range(0, size, PYRAMID_CHUNK):
+            values = bw.values(chrom, start, min(start + PYRAMID_CHUNK, size), numpy=True)
+            finest.append(max_bins(values, levels[0]))
+        binned = np.concatenate(finest).astype(np.float32)
+        per_level[levels[0]].append(binned)
+        # coarser levels are maxima of the finest, no further bigWig reads
+        for level in levels[1:]:
+            per_level[level].append(max_bins(binned, level // levels[0]))
+    bw.close()
+
+    os.makedirs(pyramid_dir, exist_ok=True)
+    meta = {
+        "sha256": os.path.basename(bigwig_path).split(".")[0],
+        "levels": levels,
+        "chroms": chroms,
+        "offsets": {},
+    }
+    for level, arrays in per_level.items():
+        np.save(os.path.join(pyramid_dir, f"{level}.npy"), np.concatenate(arrays))
+        meta["offsets"][str(level)] = dict(zip(chroms, np.cumsum([0] + [len(a) for a in arrays[:-1]]).tolist()))
+    with open(os.path.join(pyramid_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def load_signal_pyramid(pyramid_dir):
+    """Memory-mapped pyramid written by build_signal_pyramid: {"sha256", "chroms", "levels": {level: {chrom: bins}}}."""
+    with open(os.path.join(pyramid_dir, "meta.json")) as f:
+        meta = json.load(f)
+    levels = {}
+    for level in meta["levels"]:
+        values = np.load(os.path.join(pyramid_dir, f"{level}.npy"), mmap_mode="r")
+        offsets = meta["offsets"][str(level)]
+        levels[level] = {
+            chrom: values[offsets[chrom]:offsets[chrom] - (-size // level)]
+            for chrom, size in meta["chroms"].items()
+        }
+    return {"sha256": meta["sha256"], "chroms": meta["chroms"], "levels": levels}
+
+
+def pyramid_signal(pyramid, chrom, start, end, n_bins):
+    """
+    binned_signal from a pyramid: the coarsest level with at least
+    PYRAMID_BINS_PER_PIXEL bins per plot bin is sliced and maxed into n_bins,
+    so a bounded number of values per plot bin is read whatever the window size.
+    """
+    chrom_size = pyramid["chroms"].get(chrom)
+    start = max(0, int(start))
+    if chrom_size is None or start >= chrom_size:
+        return end, np.full(n_bins, np.nan, dtype=np.float32)
+    end = min(int(end), chrom_size)
+    n_bins = max(1, min(n_bins, end - start))
+    bin_width = (end - start) / n_bins
+    levels = sorted(pyramid["levels"])
+    level = max([level for level in levels if level * PYRAMID_BINS_PER_PIXEL <= bin_width], default=levels[0])
+
+    first = start // level
+    window = np.asarray(pyramid["levels"][level][chrom][first:-(-end // level)])
+    # first level bin of every plot bin, repeated where plot bins are narrower than the level
+    edges = (start + np.arange(n_bins) * bin_width).astype(np.int64) // level - first
+    return end, np.fmax.reduceat(window, edges).astype(np.float32)
+
+
+def load_signal_pyramids(manifest, pyramid_dir=PYRAMID_DIR):
+    """
+    {key: pyramid} of the manifest tracks whose pyramid was built from the
+    bigWig the manifest or store currently holds for them. Tracks never
+    provisioned here use whatever pyramid was shipped.
+    """
+    pyramids = {}
+    for entry in manifest:
+        track_dir = os.path.join(pyramid_dir, entry["key"])
+        if not os.path.exists(os.path.join(track_dir, "meta.json")):
+            continue
+        pyramid = load_signal_pyramid(track_dir)
+        if bigwigStore.expected_digest(entry) in (None, pyramid["sha256"]):
+            pyramids[entry["key"]] = pyramid
+    return pyramids
+
+
+# -------------------- Worker pool --------------------
+
+# bigwig handles of the current process, by path, opened on first use
+_worker_handles = {}
+
+
+def _worker_signal(path, chrom, start, end, n_bins):
+    if path not in _worker_handles:
+        _worker_handles[path] = pyBigWig.open(path)
+    return binned_signal(_worker_handles[path], chrom, start, end, n_bins)
+
+
+def start_signal_pool(n_workers=len(SIGNAL_TRACKS)):
+    """
+    Worker processes that open each bigWig the first time they read it, one
+    worker per track so all tracks of a query are read at the same time.
+    Nothing is started or opened until the first read.
+    """
+    pool = ProcessPoolExecutor(
+        max_workers=n_workers,
+        # spawn, forking the server process would copy its threads and locks
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    # a render worker joins its children at exit before the pool would stop them, so the pool
+    # is shut down first, ahead of the finalizers that close its queues (priority 10)
+    multiprocessing.util.Finalize(pool, pool.shutdown, exitpriority=20)
+    return pool
+
+
+def submit_signals(pool, bigwig_paths, chrom, start, end, n_bins):
+    """Start reading binned_signal of every track of bigwig_paths ({key: path}) on pool. Returns {key: future}."""
+    return {key: pool.submit(_worker_signal, path, chrom, start, end, n_bins) for key, path in bigwig_paths.items()}
+
+
+def fetch_signals(pool, bigwig_paths, chrom, start, end, n_bins):
+    """binned_signal of every track of bigwig_paths, read in parallel on pool. Returns {key: (end, scores)}."""
+    futures = submit_signals(pool, bigwig_paths, chrom, start, end, n_bins)
+    return {key: future.result() for key, future in futures.items()}
+
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Provisioning of bigwigStore against a local HTTP stand-in for the download
+sources: resuming with Range requests, hash mismatches, the offline seed
+directory and several provisioners of one key at the same time.
+"""
+
+import hashlib
+import http.server
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import bigwigStore
+
+CONTENT = bytes(range(256)) * 4096
+
+
+class StandIn(http.server.BaseHTTPRequestHandler):
+    """Serves files[path] with Range support unless ranges is False, and records every request."""
+    files = {}
+    ranges = True
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("Range")))
+        body = self.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        status, first = 200, 0
+        byte_range = self.headers.get("Range")
+        if byte_range and self.ranges:
+            first = int(byte_range.split("=")[1].split("-")[0])
+            if first >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        self.send_response(status)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {first}-{len(body) - 1}/{len(body)}")
+        self.send_header("Content-Length", str(len(body) - first))
+        self.end_headers()
+        self.wfile.write(body[first:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StandIn.files, StandIn.ranges, StandIn.requests = {}, True, []
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(bigwigStore, "STORE_DIR", str(tmp_path / "store"))
+    return tmp_path / "store"
+
+
+def pinned_entry(sources, content=CONTENT):
+    return {"key": "h3k27ac", "sources": sources, "size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_resumes_partial_file(server):
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT
+    entry = pinned_entry([f"{server}/h3k27ac.bigWig"])
+    partial = bigwigStore.partial_path(entry["key"], entry["sources"][0])
+    os.makedirs(os.path.dirname(partial))
+    with open(partial, "wb") as f:
+        f.write(CONTENT[:1000])
+
+    path = bigwigStore.provision(entry, offline=False, seed_dir=None)
+
+    assert read(path) == CONTENT
+    assert path == bigwigStore.object_path(entry["sha256"])
+    assert StandIn.requests == [("/h3k27ac.bigWig", "bytes=1000-")]
+    assert not os.path.exists(partial)
+    assert bigwigStore.resolve(entry) == path
+
+
+def test_download_starts_over_without_range_support(server):
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT
+    StandIn.ranges = False
+    entry = pinned_entry([f"{server}/h3k27ac.bigWig"])
+    partial = bigwigStore.partial_path(entry["key"], entry["sources"][0])
+    os.makedirs(os.path.dirname(partial))
+    with open(partial, "wb") as f:
+        f.write(b"x" * 1000)
+
+    assert read(bigwigStore.provision(entry, offline=False, seed_dir=None)) == CONTENT
+
+
+def test_complete_partial_file_is_committed_on_416(server):
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT
+    entry = pinned_entry([f"{server}/h3k27ac.bigWig"])
+    partial = bigwigStore.partial_path(entry["key"], entry["sources"][0])
+    os.makedirs(os.path.dirname(partial))
+    with open(partial, "wb") as f:
+        f.write(CONTENT)
+
+    assert read(bigwigStore.provision(entry, offline=False, seed_dir=None)) == CONTENT
+
+
+def test_hash_mismatch_falls_back_to_next_source(server):
+    StandIn.files["/corrupt.bigWig"] = CONTENT[::-1]
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT
+    entry = pinned_entry([f"{server}/corrupt.bigWig", f"{server}/h3k27ac.bigWig"])
+
+    assert read(bigwigStore.provision(entry, offline=False, seed_dir=None)) == CONTENT
+    # the corrupt download is discarded, not resumed by a later attempt
+    assert not os.path.exists(bigwigStore.partial_path(entry["key"], entry["sources"][0]))
+
+
+def test_hash_mismatch_of_every_source_fails(server, store):
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT[::-1]
+    entry = pinned_entry([f"{server}/h3k27ac.bigWig"])
+
+    with pytest.raises(OSError, match="every source failed"):
+        bigwigStore.provision(entry, offline=False, seed_dir=None)
+    assert bigwigStore.resolve(entry) is None
+    assert not os.listdir(store / "partial")
+
+
+def test_unpinned_download_checked_against_server_size(monkeypatch):
+    # the connection closes cleanly before the size the server announced, the partial file is kept for a resume
+    entry = {"key": "h3k27ac", "sources": ["https://example.invalid/h3k27ac.bigWig"], "size": None, "sha256": None}
+
+    class Truncated:
+        status_code = 200
+        headers = {"Content-Length": str(len(CONTENT))}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, size):
+            yield CONTENT[:1000]
+
+    monkeypatch.setattr(bigwigStore.requests, "get", lambda *args, **kwargs: Truncated())
+    with pytest.raises(bigwigStore.requests.RequestException, match="1000 of"):
+        bigwigStore.download(entry, entry["sources"][0])
+    assert os.path.getsize(bigwigStore.partial_path(entry["key"], entry["sources"][0])) == 1000
+
+
+def test_offline_imports_seed(tmp_path):
+    seed_dir = tmp_path / "seed"
+    seed_dir.mkdir()
+    (seed_dir / "ENCFF087YCU.bigWig").write_bytes(CONTENT)
+    entry = pinned_entry(["https://example.invalid/files/ENCFF087YCU.bigWig"])
+
+    path = bigwigStore.provision(entry, offline=True, seed_dir=str(seed_dir))
+
+    assert read(path) == CONTENT
+    assert bigwigStore.read_ref(entry["key"])["sha256"] == entry["sha256"]
+    # the seed itself is left in place
+    assert (seed_dir / "ENCFF087YCU.bigWig").exists()
+
+
+def test_offline_skips_seed_with_wrong_hash(tmp_path):
+    seed_dir = tmp_path / "seed"
+    seed_dir.mkdir()
+    (seed_dir / "h3k27ac.bigWig").write_bytes(CONTENT[::-1])
+    entry = pinned_entry(["https://example.invalid/files/ENCFF087YCU.bigWig"])
+
+    with pytest.raises(FileNotFoundError):
+        bigwigStore.provision(entry, offline=True, seed_dir=str(seed_dir))
+
+
+def test_concurrent_provisioners_download_once(server):
+    StandIn.files["/h3k27ac.bigWig"] = CONTENT
+    entry = pinned_entry([f"{server}/h3k27ac.bigWig"])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(lambda __: bigwigStore.provision(entry, offline=False, seed_dir=None), range(4)))
+
+    assert len(set(paths)) == 1
+    assert read(paths[0]) == CONTENT
+    assert len(StandIn.requests) == 1
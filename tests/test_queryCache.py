@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+Disk tier of queryCache.LRUCache: entries it cannot read are misses.
+"""
+
+import os
+import pytest
+import queryCache
+
+# a pickle of a class from a module that is not installed, as other library versions can leave behind
+FOREIGN_PICKLE = b"\x80\x04\x95\x1a\x00\x00\x00\x00\x00\x00\x00\x8c\x0bno_such_mod\x94\x8c\x03Foo\x94\x93\x94."
+
+
+@pytest.mark.parametrize("content", [FOREIGN_PICKLE, b"\x80\x04\x95", b"not a pickle"])
+def test_unreadable_disk_entry_is_a_miss(tmp_path, content):
+    cache = queryCache.LRUCache(2**20, str(tmp_path), 2**20)
+    cache.put("key", b"value")
+    path = cache._disk_path("key")
+    with open(path, "wb") as f:
+        f.write(content)
+
+    # a new process: nothing in memory, the unreadable file is dropped
+    cache = queryCache.LRUCache(2**20, str(tmp_path), 2**20)
+    assert cache.get("key") is None
+    assert not os.path.exists(path)
+    cache.put("key", b"value")
+    assert queryCache.LRUCache(2**20, str(tmp_path), 2**20).get("key") == b"value"
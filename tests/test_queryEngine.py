@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+The indexed lookups of queryEngine (gene and region queries, the CRE
+targets and the merged 10k union) against the row-wise pandas scans the app
+ran before loopIndex, on a small synthetic loop table, with the lookup files
+parsed from the .tab and prebuilt by buildData.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import buildData
+import loopIndex
+import queryEngine
+
+CHROMS = ["1", "2", "X"]
+GENES = [f"G{i:02d}" for i in range(40)]
+LOOP_COLUMNS = ["chr1", "start1", "end1", "chr2", "start2", "end2",
+                "annotCanon", "annotAll", "genesCanon", "genesAll", "loopSource"]
+SOURCES_10K = [*loopIndex.SUBTYPE_SOURCES.values(), "merged_10k"]
+# (subChoice, res) of every loop set the app queries
+LOOP_SETS = [(0, "10k"), (0, "1k"), *[(subChoice, "10k") for subChoice in loopIndex.SUBTYPE_SOURCES]]
+WINDOWS = [(chrom, start, end) for chrom in CHROMS for start, end in [(0, 500_000), (300_000, 1_200_000), (1_000_000, 2_000_000)]]
+
+
+def random_loops(rng, n, bin_size):
+    """n loops of bin_size anchors, mostly cis, with "no" or 1-3 target genes per promoter set."""
+    rows = []
+    for __ in range(n):
+        chrom1 = str(rng.choice(CHROMS))
+        chrom2 = chrom1 if rng.random() < 0.9 else str(rng.choice(CHROMS))
+        start1, start2 = (int(rng.integers(0, 2_000_000 // bin_size)) * bin_size for __ in range(2))
+        genes_all = "no" if rng.random() < 0.4 else ",".join(rng.choice(GENES, int(rng.integers(1, 4)), replace=False))
+        genes_canon = "no" if genes_all == "no" or rng.random() < 0.3 else genes_all.split(",")[0]
+        annot_all = "CRE" if rng.random() < 0.6 else "noCRE"
+        annot_canon = annot_all if rng.random() < 0.8 else "noCRE"
+        rows.append([chrom1, start1, start1 + bin_size, chrom2, start2, start2 + bin_size,
+                     annot_canon, annot_all, genes_canon, genes_all])
+    return rows
+
+
+@pytest.fixture(scope="module", params=["parsed", "prebuilt"])
+def loop_table(request, tmp_path_factory):
+    """The .tab (as the old app read it), with queryEngine pointed at it and its lookup files prebuilt or not."""
+    data_dir = tmp_path_factory.mktemp(request.param)
+    rng = np.random.default_rng(7)
+    # the 10k sources share loops, so the merged 10k map has loops in several of them
+    shared = random_loops(rng, 300, 10_000)
+    rows = []
+    for source in SOURCES_10K:
+        picked = [shared[i] for i in rng.choice(len(shared), 60, replace=False)] + random_loops(rng, 10, 10_000)
+        # a loop listed twice within one source
+        picked.append(picked[0])
+        rows += [[*row, source] for row in picked]
+    rows += [[*row, "merged_1k"] for row in random_loops(rng, 80, 1_000)]
+    tab_path = data_dir / "concat_loops_v2.tab"
+    pd.DataFrame(rows, columns=LOOP_COLUMNS).to_csv(tab_path, sep="\t", index=False)
+    genes_path = data_dir / "coding_genes2"
+    pd.DataFrame({"V1": "1", "V2": range(0, 40_000, 1_000), "V3": range(500, 40_500, 1_000), "V4": GENES,
+                  "V5": 100, "V6": "+", "color": "0,0,255"}).to_csv(genes_path, sep="\t", index=False)
+
+    saved = {name: getattr(queryEngine, name) for name in [
+        "coding_genes_path", "all_loops_path", "loop_store_path", "gene_index_path", "loop_union_path",
+        "overview_path", "QUERY_CACHE_DIR", "QUERY_CACHE_MAX_MB",
+    ]}
+    queryEngine.coding_genes_path, queryEngine.all_loops_path = str(genes_path), str(tab_path)
+    queryEngine.loop_store_path = str(data_dir / "loops_store")
+    queryEngine.gene_index_path = str(data_dir / "gene_index.npz")
+    queryEngine.loop_union_path = str(data_dir / "loop_union.npz")
+    queryEngine.overview_path = str(data_dir / "overview_aggregates.npz")
+    # every query is looked up
+    queryEngine.QUERY_CACHE_DIR, queryEngine.QUERY_CACHE_MAX_MB = None, 0
+    if request.param == "prebuilt":
+        build_dirs = buildData.DATA_DIR, buildData.all_loops_path
+        buildData.DATA_DIR, buildData.all_loops_path = str(data_dir), str(tab_path)
+        buildData.loop_table.cache_clear()
+        try:
+            buildData.build_loop_store()
+            buildData.build_gene_index()
+        finally:
+            buildData.DATA_DIR, buildData.all_loops_path = build_dirs
+            buildData.loop_table.cache_clear()
+    clear_resources()
+    # the prebuilt case must not fall back to building the lookups from the .tab
+    assert all(queryEngine.is_prebuilt(path) for path in [queryEngine.loop_union_path, queryEngine.gene_index_path]) \
+        == (request.param == "prebuilt")
+    yield pd.read_csv(tab_path, sep="\t", header=0)
+    for name, value in saved.items():
+        setattr(queryEngine, name, value)
+    clear_resources()
+
+
+def clear_resources():
+    for value in vars(queryEngine).values():
+        if callable(value) and hasattr(value, "is_loaded"):
+            value.clear()
+
+
+# -------------------- Scans --------------------
+
+def scan_loop_set(all_loops, subChoice, res):
+    """The loops geneAnalyzer and locAnalyzer scanned."""
+    if subChoice == 0 and res == "10k":
+        return all_loops[~all_loops['loopSource'].isin(["merged_1k"])].drop_duplicates()
+    source = f"merged_{res}" if subChoice == 0 else loopIndex.SUBTYPE_SOURCES[subChoice]
+    return all_loops[all_loops['loopSource'] == source]
+
+
+def as_tuples(frame):
+    return {tuple(str(value) for value in row) for row in frame.itertuples(index=False, name=None)}
+
+
+def scan_gene(all_loops, gene, subChoice, res, cre_index):
+    """(links, regions) of geneAnalyzer."""
+    df = scan_loop_set(all_loops, subChoice, res)
+    hits = df[df.iloc[:, 9 - cre_index].astype(str).str.split(",").apply(lambda genes: gene in genes)]
+    links = hits.iloc[:, [3, 4, 5, 0, 1, 2]]
+    regions = "chr" + hits.iloc[:, 0].astype(str) + ":" + hits.iloc[:, 1].astype(str) + "-" + hits.iloc[:, 2].astype(str)
+    return as_tuples(links), set(regions)
+
+
+def scan_region(all_loops, chrom, start, end, subChoice, res, cre_index):
+    """(CRE links, {CRE: target genes}, other loops) of locAnalyzer."""
+    df = scan_loop_set(all_loops, subChoice, res)
+    inside1 = (df.iloc[:, 0].astype(str) == chrom) & (df.iloc[:, 1] >= start) & (df.iloc[:, 2] <= end)
+    inside2 = (df.iloc[:, 3].astype(str) == chrom) & (df.iloc[:, 4] >= start) & (df.iloc[:, 5] <= end)
+    hits = df[inside1 | inside2]
+    targets, types = hits.iloc[:, 9 - cre_index].astype(str), hits.iloc[:, 7 - cre_index]
+    cres = hits[(types == "CRE") & (targets != "no")]
+    cre_genes = {}
+    for row, genes in zip(cres.iloc[:, [0, 1, 2]].itertuples(index=False, name=None), cres.iloc[:, 9 - cre_index]):
+        cre_genes.setdefault(tuple(str(value) for value in row), set()).update(str(genes).split(","))
+    others = hits[(targets == "no") & (types != "CRE")]
+    return as_tuples(cres.iloc[:, :6]), cre_genes, as_tuples(others.iloc[:, :6])
+
+
+# -------------------- Tests --------------------
+
+@pytest.mark.parametrize("cre_index", [0, 1])
+@pytest.mark.parametrize("subChoice, res", LOOP_SETS)
+def test_gene_query_matches_scan(loop_table, subChoice, res, cre_index):
+    for gene in GENES:
+        hits = queryEngine.gene_query(gene, subChoice, res, cre_index)
+        links, regions = scan_gene(loop_table, gene, subChoice, res, cre_index)
+        assert as_tuples(hits.links[queryEngine.LINK_COLUMNS]) == links, gene
+        assert set(hits.links['target']) <= {gene}
+        assert set(hits.regions) == regions, gene
+        # a region once, in lookup order
+        assert len(hits.regions) == len(regions)
+
+
+@pytest.mark.parametrize("cre_index", [0, 1])
+@pytest.mark.parametrize("subChoice, res", LOOP_SETS)
+def test_region_query_matches_scan(loop_table, subChoice, res, cre_index):
+    for chrom, start, end in WINDOWS:
+        result = queryEngine.region_query(chrom, start, end, subChoice, res, cre_index)
+        links, cre_genes, others = scan_region(loop_table, chrom, start, end, subChoice, res, cre_index)
+        window = (chrom, start, end)
+        assert as_tuples(result.links) == links, window
+        assert as_tuples(result.other_loops[queryEngine.LINK_COLUMNS]) == others, window
+        cre_targets = result.cre_targets()
+        assert {
+            tuple(str(value) for value in cre): set(target.split(", "))
+            for cre, target in zip(cre_targets[['chr', 'start', 'end']].itertuples(index=False, name=None), cre_targets['target'])
+        } == cre_genes, window
+
+
+def test_loop_union_is_the_distinct_10k_loops(loop_table):
+    union = queryEngine.loop_union()
+    loops = queryEngine.loops()
+    members = loop_table[loop_table['loopSource'].isin(SOURCES_10K)]
+    key_columns = LOOP_COLUMNS[:-1]
+    sources_of = {}
+    for row in members.itertuples(index=False, name=None):
+        sources_of.setdefault(tuple(str(value) for value in row[:-1]), set()).add(row[-1])
+
+    union_loops = [tuple(str(value) for value in row) for row in loops.iloc[union["rows"]][key_columns].itertuples(index=False, name=None)]
+    # every distinct loop once
+    assert len(union_loops) == len(set(union_loops)) == len(sources_of)
+    assert set(union_loops) == set(sources_of)
+    for loop, provenance in zip(union_loops, queryEngine.loop_provenance(union["rows"])):
+        assert set(provenance) == sources_of[loop]
+    # the loops shared between sources are what the union exists for
+    assert any(len(sources) > 1 for sources in sources_of.values())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+buildData's track index covers every bed and links file the shipped .ini
+files read, wherever PlotTracks resolves them.
+"""
+
+import glob
+import os
+import buildData
+import trackRenderer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_shipped_tracks_indexed(tmp_path, monkeypatch):
+    # the build writes next to the track files, so it runs on links to them
+    tracks_dir = tmp_path / "tracks"
+    tracks_dir.mkdir()
+    for path in glob.glob(os.path.join(REPO_DIR, "tracks", "*")):
+        if not path.endswith((".gz", ".tbi")):
+            os.symlink(path, tracks_dir / os.path.basename(path))
+    os.symlink(os.path.join(REPO_DIR, "promoters.bed"), tmp_path / "promoters.bed")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(buildData, "TRACKS_DIR", str(tracks_dir))
+
+    ini_paths = sorted(glob.glob(str(tracks_dir / "*.ini")))
+    assert not trackRenderer.tracks_indexed(str(tracks_dir / "tracks_10k_all.ini"))
+    buildData.build_track_index()
+    for path in ini_paths:
+        assert trackRenderer.tracks_indexed(path), path
+    # the .ini files name promoters.bed, which resolves to the repository root first
+    assert trackRenderer.tabix_path("promoters.bed") is not None
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 18, 2026
+@author: Efe Aydın
+
+In-process genome track rendering with pyGenomeTracks' own track classes.
+Static .ini tracks are parsed once and kept resident, per-query tracks are
+built from in-memory data and both are drawn into one figure.
+"""
+
+import copy
+import io
+import os
+import threading
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pysam
+import queryMetrics
+from intervaltree import IntervalTree, Interval
+from pygenometracks.readBed import ReadBed
+from pygenometracks.tracksClass import PlotTracks, DEFAULT_MARGINS
+from pygenometracks.utilities import count_lines, change_chrom_names
+from pygenometracks.tracks.GenomeTrack import GenomeTrack
+from pygenometracks.tracks.BigWigTrack import BigWigTrack
+from pygenometracks.tracks.BedTrack import BedTrack, AROUND_REGION
+from pygenometracks.tracks.LinksTrack import LinksTrack
+
+# -------------------- Configuration --------------------
+
+# pyGenomeTracks CLI defaults
+FIG_WIDTH = 40
+TRACK_LABEL_FRACTION = 0.05
+DEFAULT_DPI = 72
+
+# formats render_tracks can encode to
+IMAGE_FORMATS = ["png", "svg", "webp"]
+
+# whole-genome "region" so resident tracks keep every chromosome
+GENOME_REGIONS = [(str(chrom), 0, 3_000_000_000) for chrom in list(range(1, 23)) + ["X", "Y"]]
+
+# pyplot keeps global figure state, so only one figure is drawn at a time
+_render_lock = threading.Lock()
+
+
+# -------------------- Track classes --------------------
+
+class SignalArrayTrack(BigWigTrack):
+    """
+    bigwig track drawn from scores the caller already binned, so signal never
+    goes through a file. Plots exactly like file_type = bigwig.
+    """
+    SUPPORTED_ENDINGS = []
+    TRACK_TYPE = "signal_array"
+
+    def __init__(self, properties_dict, region_end=None, scores=None):
+        # BigWigTrack.__init__ would open properties['file'] with pyBigWig
+        GenomeTrack.__init__(self, properties_dict)
+        self.bw = None
+        self.bw2 = None
+        self.region_end = region_end
+        self.scores = scores
+
+    def get_scores(self, bw_var, bw_file, chrom_region, start_region, end_region):
+        return self.region_end, len(self.scores), self.scores.copy()
+
+
+class BedTextTrack(BedTrack):
+    """bed track parsed from BED text held in memory instead of a file."""
+    SUPPORTED_ENDINGS = []
+    TRACK_TYPE = "bed_text"
+
+    def __init__(self, properties_dict, bed_text=""):
+        # BedTrack.__init__ parses the bed right away
+        self.bed_bytes = bed_text.encode()
+        BedTrack.__init__(self, properties_dict)
+
+    def get_bed_handler(self, plot_regions=None):
+        return ReadBed(io.BytesIO(self.bed_bytes)), count_lines(io.BytesIO(self.bed_bytes), asBed=True)
+
+
+class LinksFrameTrack(LinksTrack):
+    """
+    links track built from rows of (chrom1, start1, end1, chrom2, start2, end2, score)
+    held in memory. Only cis links are kept, as LinksTrack does without region2.
+    """
+    SUPPORTED_ENDINGS = []
+    TRACK_TYPE = "links_frame"
+
+    def __init__(self, properties_dict, links=()):
+        # LinksTrack builds its interval tree while setting the defaults
+        self.links = links
+        LinksTrack.__init__(self, properties_dict)
+
+    def process_link_file(self, plot_regions):
+        interval_tree = {}
+        for chrom1, start1, end1, chrom2, start2, end2, score in self.links:
+            if chrom1 != chrom2:
+                continue
+            if start2 < start1:
+                start1, end1, start2, end2 = start2, end2, start1, end1
+            if self.properties['use_middle']:
+                interval = Interval((start1 + end1) / 2, (start2 + end2) / 2, [start1, end1, start2, end2, score])
+            else:
+                interval = Interval(start1, max(end1, end2), [start1, end1, start2, end2, score])
+            interval_tree.setdefault(str(chrom1), IntervalTree()).add(interval)
+        scores = [link[6] for link in self.links] or [np.nan]
+        return interval_tree, min(scores), max(scores), True
+
+
+class TabixBedTrack(BedTrack):
+    """
+    bed track that reads only the plotted regions (plus the margin BedTrack
+    itself uses) from the bgzipped, tabix indexed copy of its file, if built.
+    """
+    SUPPORTED_ENDINGS = []
+    TRACK_TYPE = "bed_tabix"
+
+    def get_bed_handler(self, plot_regions=None):
+        indexed_path = tabix_path(self.properties['file'])
+        if indexed_path is None or plot_regions is None or self.properties['global_max_row']:
+            return BedTrack.get_bed_handler(self, plot_regions)
+        bed_bytes = "".join(f"{line}\n" for line in tabix_lines(indexed_path, plot_regions, AROUND_REGION)).encode()
+        return ReadBed(io.BytesIO(bed_bytes)), count_lines(io.BytesIO(bed_bytes), asBed=True)
+
+
+class TabixLinksTrack(LinksFrameTrack):
+    """
+    links track that reads only the links overlapping the plotted regions from
+    the tabix indexed copy of its file (indexed on the span of both anchors),
+    if built, and the whole file otherwise.
+    """
+    SUPPORTED_ENDINGS = []
+    TRACK_TYPE = "links_tabix"
+
+    def process_link_file(self, plot_regions):
+        indexed_path = tabix_path(self.properties['file'])
+        if indexed_path is None or plot_regions is None:
+            return LinksTrack.process_link_file(self, plot_regions)
+        self.links = []
+        for line in tabix_lines(indexed_path, plot_regions):
+            fields = line.split("\t")
+            score = float(fields[6]) if len(fields) > 6 else 1.0
+            self.links.append((fields[0], int(fields[1]), int(fields[2]), fields[3], int(fields[4]), int(fields[5]), score))
+        return LinksFrameTrack.process_link_file(self, plot_regions)
+
+
+class WindowPlotTracks(PlotTracks):
+    """PlotTracks whose bed and links tracks use the tabix indexed copies of their files."""
+
+    def parse_tracks(self, tracks_file, plot_regions=None):
+        PlotTracks.parse_tracks(self, tracks_file, plot_regions=plot_regions)
+        window_classes = {BedTrack: TabixBedTrack, LinksTrack: TabixLinksTrack}
+        for properties in self.track_list:
+            properties['track_class'] = window_classes.get(properties['track_class'], properties['track_class'])
+
+
+# -------------------- Functions --------------------
+
+def tabix_path(path):
+    """path.gz if it was built with a tabix index and is not older than path, else None."""
+    indexed_path = f"{path}.gz"
+    if not os.path.exists(f"{indexed_path}.tbi"):
+        return None
+    if os.path.exists(path) and os.path.getmtime(indexed_path) < os.path.getmtime(path):
+        return None
+    return indexed_path
+
+
+def tabix_lines(indexed_path, plot_regions, margin=0):
+    """Lines of a tabix indexed file overlapping any of plot_regions, each once, in file order."""
+    lines = {}
+    with pysam.TabixFile(indexed_path) as tabix_file:
+        contigs = set(tabix_file.contigs)
+        for chrom, start, end in plot_regions:
+            for contig in (chrom, change_chrom_names(chrom)):
+                if contig in contigs:
+                    lines.update(dict.fromkeys(tabix_file.fetch(contig, max(0, int(start) - margin), int(end) + margin)))
+                    break
+    return list(lines)
+
+
+def window_track_files(tracks_file):
+    """
+    {path: is_links} of the bed and links files of a .ini, resolved as
+    PlotTracks does: relative to the working directory, else to the .ini.
+    """
+    tracks = PlotTracks.__new__(PlotTracks)
+    tracks.available_tracks = PlotTracks.get_available_tracks()
+    tracks.available_types = PlotTracks.get_available_types()
+    tracks.parse_tracks(tracks_file)
+    return {properties['file']: issubclass(properties['track_class'], LinksTrack) for properties in tracks.track_list
+            if issubclass(properties['track_class'], (BedTrack, LinksTrack))}
+
+
+def tracks_indexed(tracks_file):
+    """True if every bed/links file of a .ini has an up to date tabix index."""
+    return all(tabix_path(path) is not None for path in window_track_files(tracks_file))
+
+
+def plot_width_pixels(dpi=DEFAULT_DPI):
+    """Width in pixels of the data area of a rendered figure."""
+    width_ratios = (0.01, 1 - TRACK_LABEL_FRACTION, TRACK_LABEL_FRACTION)
+    width_cm = FIG_WIDTH * (DEFAULT_MARGINS['right'] - DEFAULT_MARGINS['left']) / (1 + 2 / 3 * 0.01) \
+        * width_ratios[1] / sum(width_ratios)
+    return int(width_cm / 2.54 * dpi)
+
+
+def get_genomic_range(df):
+    """Span of all anchors of a links frame (start/end, interStart/interEnd) padded by 100 kb."""
+    min_start = min(df['start'].min(), df['interStart'].min())
+    max_end = max(df['end'].max(), df['interEnd'].max())
+    return min_start - 100_000, max_end + 100_000
+
+
+def memory_track_properties(track_type, title, **properties):
+    """Properties dict of an in-memory track, as parse_tracks would produce it."""
+    return {
+        "section_name": title or track_type,
+        "file": title or track_type,
+        "file_type": track_type,
+        "title": title,
+        "overlay_previous": "no",
+        "region": None,
+        **properties,
+    }
+
+
+def signal_track(title, color, max_value, region_end, scores):
+    """Track object for scores binned over [region start, region_end]."""
+    return SignalArrayTrack(memory_track_properties(
+        SignalArrayTrack.TRACK_TYPE, title,
+        color=color, height=4, min_value=0, max_value=max_value,
+    ), region_end, scores)
+
+
+def load_tracks(tracks_file, plot_regions=None):
+    """Parse a .ini file into track objects, for the whole genome unless plot_regions is given."""
+    return PlotTracks(
+        tracks_file,
+        FIG_WIDTH,
+        dpi=DEFAULT_DPI,
+        track_label_width=TRACK_LABEL_FRACTION,
+        plot_regions=plot_regions if plot_regions is not None else GENOME_REGIONS,
+    )
+
+
+def load_window_tracks(tracks_file, chrom, start, end):
+    """Parse a .ini for one region only, reading indexed track files for that region alone."""
+    return WindowPlotTracks(
+        tracks_file,
+        FIG_WIDTH,
+        dpi=DEFAULT_DPI,
+        track_label_width=TRACK_LABEL_FRACTION,
+        plot_regions=[(chrom, start, end)],
+    )
+
+
+def render_tracks(base, track_objs, chrom, start, end, dpi=DEFAULT_DPI, image_format="png"):
+    """
+    Draw track_objs, in order, into a single figure laid out like base
+    (a PlotTracks from load_tracks) and return it encoded as image_format.
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"image_format must be one of {IMAGE_FORMATS}, got {image_format}")
+
+    figure = copy.copy(base)
+    figure.track_obj_list = list(track_objs)
+    figure.track_list = [track.properties for track in figure.track_obj_list]
+    figure.type_list, figure.type_obj_list = [], []
+    figure.dpi = dpi
+
+    buffer = io.BytesIO()
+    with _render_lock, matplotlib.rc_context({"savefig.format": image_format}), queryMetrics.span("draw"):
+        fig = figure.plot(buffer, chrom, start, end)
+        plt.close(fig)
+    return buffer.getvalue()